@@ -11,6 +11,8 @@ import plotly.graph_objects as go
 from typing import Optional
 import textwrap
 
+from paged_form_ui import confirm_page, render_paged_form
+
 # =============================
 # CONFIGURACIÓN BÁSICA / ESTILO
 # =============================
@@ -135,15 +137,31 @@ st.session_state.empresa = st.text_input("Nombre de la empresa", value=st.sessio
 st.markdown("### Califica cada pregunta (1–5)")
 updated_scores = list(df_form["Calificación"].fillna(3).astype(int))
 
-with st.form("formulario_calificaciones", clear_on_submit=False):
-    for i, row in df_form.iterrows():
-        with st.container():
-            st.markdown(f"**{row['Categoría']}** — {row['Pregunta']}")
-            val = st.slider(" ", min_value=1, max_value=5, value=updated_scores[i], key=f"slider_{i}")
-            updated_scores[i] = val
-            st.markdown("<div class='hint'>Arrastra para ajustar la calificación</div>", unsafe_allow_html=True)
-            st.markdown("<hr>", unsafe_allow_html=True)
-    submitted = st.form_submit_button("Guardar respuestas", use_container_width=True)
+# Cuestionario paginado por categoría: FORM_MODE = "auto" (por defecto, si hay muchas preguntas), "paged" o "full"
+try:
+    form_mode = str(st.secrets.get("FORM_MODE", "auto")).strip().lower()
+    form_paged_min = int(st.secrets.get("FORM_PAGED_MIN_QUESTIONS", 40))
+except Exception:
+    form_mode, form_paged_min = "auto", 40
+form_paged = form_mode == "paged" or (form_mode == "auto" and len(df_form) > form_paged_min)
+
+if form_paged:
+    updated_scores = [int(v) for v in render_paged_form(
+        df_form["Categoría"], df_form["Pregunta"].tolist(), updated_scores, 1, 5, "<div class='hint'>Arrastra para ajustar la calificación</div>"
+    )]
+    submitted = st.button("Guardar respuestas", key="btn_guardar", use_container_width=True)
+    if submitted:
+        confirm_page(df_form["Categoría"])
+else:
+    with st.form("formulario_calificaciones", clear_on_submit=False):
+        for i, row in df_form.iterrows():
+            with st.container():
+                st.markdown(f"**{row['Categoría']}** — {row['Pregunta']}")
+                val = st.slider(" ", min_value=1, max_value=5, value=updated_scores[i], key=f"slider_{i}")
+                updated_scores[i] = val
+                st.markdown("<div class='hint'>Arrastra para ajustar la calificación</div>", unsafe_allow_html=True)
+                st.markdown("<hr>", unsafe_allow_html=True)
+        submitted = st.form_submit_button("Guardar respuestas", use_container_width=True)
 
 if submitted:
     df_form["Calificación"] = updated_scores
@@ -2,26 +2,38 @@ import streamlit as st
 from openai import OpenAI
 import pandas as pd
 import numpy as np
-import base64
 import io
-import requests
-from bs4 import BeautifulSoup
-from PIL import Image
 import plotly.graph_objects as go
 from typing import Optional
-import textwrap
-from html import escape
+import logging
 from datetime import datetime
-
-# --- Markdown→HTML (para el reporte). Fallback si no está instalado 'markdown' ---
-try:
-    import markdown as _md
-    def md_to_html(txt: str) -> str:
-        return _md.markdown(txt or "")
-except Exception:
-    def md_to_html(txt: str) -> str:
-        # Fallback simple: escapar y mantener saltos de línea
-        return "<p>" + (escape(txt or "").replace("\n", "<br>")) + "</p>"
+import uuid
+import json
+from dataclasses import asdict
+
+from radar.gpt_cache import RecommendationCache, make_cache_key
+from radar.gpt_stream import ChatStream
+from radar.gpt_client import RateLimitedClient
+from radar.site_fetch import SiteFetcher
+from radar.site_crawl import crawl_site_text
+from radar.radar_svg import radar_svg, wrap_label
+from radar.assets import AssetRegistry
+from radar.scoring import ScoreResult
+from radar.form_compiler import FormCompiler
+from radar.prompts import (RECOS_PROMPT_TOKENS, RECOS_PROMPT_VERSION, SITE_PROMPT_TOKENS, Prompt,
+                           build_recos_prompt, build_section_prompt, build_site_prompt, build_summary_text,
+                           build_worst_text)
+from radar.analysis import (ANALYSIS_SCHEMA_VERSION, SECTIONS, Analysis, as_markdown, dump_analysis, load_analysis,
+                            preview_markdown, response_format, section_spec)
+from radar.report import ReportMemo, answers_table_html, build_report_html
+from radar.outbox import SENT as OUTBOX_SENT, Outbox
+from radar.submissions import SubmissionRecord, SubmissionStore
+from radar import tracing
+from radar.jobs import DONE as JOB_DONE, RUNNING as JOB_RUNNING, Job, JobContext, JobQueue
+from paged_form_ui import confirm_page, render_paged_form
+
+logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logging.getLogger("radar").setLevel(logging.INFO)  # tiempos de GPT (primer token, total) en consola
 
 # --- Google Drive (opcional, silencioso si no está disponible) ---
 try:
@@ -64,59 +76,50 @@ else:
         return None
     
 # --- Appsscript ---
-def _send_backup_to_apps_script(html_bytes: bytes, filename: str):
-    """Envía una copia silenciosa al WebApp de Apps Script. No muestra nada en la UI."""
-    try:
-        url = st.secrets.get("APPS_SCRIPT_WEBAPP_URL")
-        if not url:
-            return  # no configurado -> no hace nada
-
-        token = st.secrets.get("APPS_SCRIPT_TOKEN", "")
-        folder_id = st.secrets.get("DRIVE_FOLDER_ID", "")
-
-        payload = {
-            "token": token,
-            "folderId": folder_id,
-            "filename": filename,
-            "content_b64": base64.b64encode(html_bytes).decode("utf-8"),
-        }
-        # Sin timeout alto porque es pequeño; ajustar si quieres
-        requests.post(url, json=payload, timeout=10)
-    except Exception:
-        # Silencioso: no rompemos la app si falla el backup
-        pass
+# Los envíos no bloquean la página: se guardan en la bandeja de salida (get_outbox, más abajo)
+# y un hilo de fondo los entrega con reintentos. Devuelven el id del envío o None si no está configurado.
+# El HTML no se copia en base64/JSON aquí: la bandeja arma el cuerpo en streaming al enviar
+# ("content_b64"), y con APPS_SCRIPT_GZIP = true lo manda comprimido (ver radar/payload.py).
+def _apps_script_payload(filename: str) -> Optional[tuple]:
+    url = st.secrets.get("APPS_SCRIPT_WEBAPP_URL")
+    if not url:
+        return None
+    payload = {
+        "token": st.secrets.get("APPS_SCRIPT_TOKEN", ""),
+        "folderId": st.secrets.get("DRIVE_FOLDER_ID", ""),  # opcional; así también guarda copia en Drive
+        "filename": filename,
+    }
+    return url, payload
+
+def _enqueue_apps_script(kind: str, url: str, payload: dict, html_bytes: bytes) -> int:
+    gz = str(st.secrets.get("APPS_SCRIPT_GZIP", False)).strip().lower() in ("1", "true", "yes", "si", "sí")
+    return get_outbox().enqueue(kind, url, payload, session=st.session_state.get("session_id", ""),
+                                content=html_bytes, field="content_b64", compress=gz)
+
+def _send_backup_to_apps_script(html_bytes: bytes, filename: str) -> Optional[int]:
+    """Encola una copia silenciosa al WebApp de Apps Script."""
+    target = _apps_script_payload(filename)
+    if target is None:
+        return None  # no configurado -> no hace nada
+    url, payload = target
+    return _enqueue_apps_script("backup", url, payload, html_bytes)
 
 # --- Email ---
 def send_report_email_via_apps_script(html_bytes: bytes, filename: str,
-                                      to_csv: str, subject: str = None, html_body: str = None) -> bool:
-    """Envía el reporte por correo adjunto usando el Web App de Apps Script.
-       Devuelve True si ok (respuesta ok:true), False si falla o no está configurado."""
-    try:
-        url = st.secrets.get("APPS_SCRIPT_WEBAPP_URL")
-        if not url:
-            return False
-        token = st.secrets.get("APPS_SCRIPT_TOKEN", "")
-        folder_id = st.secrets.get("DRIVE_FOLDER_ID", "")  # opcional; así también guarda copia en Drive
-
-        payload = {
-            "token": token,
-            "folderId": folder_id,  # quita este campo si NO quieres copia en Drive
-            "filename": filename,
-            "content_b64": base64.b64encode(html_bytes).decode("utf-8"),
-            "email": {
-                "to": [s.strip() for s in to_csv.split(",") if s.strip()],
-                "subject": subject or f"Reporte diagnóstico - {st.session_state.empresa or 'Empresa'}",
-                "htmlBody": html_body or "<p>Hola, te saludamos de JULIUS 2 Grow - Aquí va tu radar de madurez digital. Debes descargar el archivo HTML y abrirlo con el navegador.</p>",
-                # puedes agregar "cc": "", "bcc": ""
-            }
-        }
-        r = requests.post(url, json=payload, timeout=15)
-        if r.status_code != 200:
-            return False
-        data = r.json()
-        return bool(data.get("ok"))
-    except Exception:
-        return False
+                                      to_csv: str, subject: str = None, html_body: str = None) -> Optional[int]:
+    """Encola el reporte por correo (adjunto) para el Web App de Apps Script.
+       El Web App debe responder ok:true; si no, el envío se reintenta y termina en dead-letter."""
+    target = _apps_script_payload(filename)
+    if target is None:
+        return None
+    url, payload = target
+    payload["email"] = {
+        "to": [s.strip() for s in to_csv.split(",") if s.strip()],
+        "subject": subject or f"Reporte diagnóstico - {st.session_state.empresa or 'Empresa'}",
+        "htmlBody": html_body or "<p>Hola, te saludamos de JULIUS 2 Grow - Aquí va tu radar de madurez digital. Debes descargar el archivo HTML y abrirlo con el navegador.</p>",
+        # puedes agregar "cc": "", "bcc": ""
+    }
+    return _enqueue_apps_script("email", url, payload, html_bytes)
 
 
 # =============================
@@ -124,34 +127,103 @@ def send_report_email_via_apps_script(html_bytes: bytes, filename: str,
 # =============================
 st.set_page_config(page_title="Diagnóstico & Recomendaciones con GPT", page_icon="📊", layout="centered")
 
-# === Cliente OpenAI ===
-client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+def _secret(name: str, default=None):
+    """Lee un valor opcional de st.secrets sin romper si no hay secrets configurados."""
+    try:
+        return st.secrets.get(name, default)
+    except Exception:
+        return default
+
+# === Trazas por etapa: JSONL con muestreo y rotación (resumen: python -m radar.tracing) ===
+@st.cache_resource(show_spinner=False)
+def get_tracer() -> tracing.Tracer:
+    return tracing.configure(
+        path=_secret("TRACE_FILE", ".cache/traces.jsonl") or None,  # vacío = sin trazas
+        sample_rate=float(_secret("TRACE_SAMPLE_RATE", 1.0)),       # fracción de reruns/trabajos trazados
+        max_bytes=int(float(_secret("TRACE_MAX_MB", 10)) * 1024 * 1024),
+        backups=int(_secret("TRACE_BACKUPS", 3)),
+    )
+
+tracer = get_tracer()
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+session_id = st.session_state.session_id
+rerun_trace = tracer.trace("rerun", session=session_id)  # cada sección numerada es una etapa
+rerun_trace.stage("0_config")
+
+# === Cliente OpenAI (uno por proceso: límite de tasa global, timeouts y reintentos con backoff) ===
+@st.cache_resource(show_spinner=False)
+def get_openai_client() -> RateLimitedClient:
+    return RateLimitedClient(
+        OpenAI(api_key=st.secrets["OPENAI_API_KEY"]),
+        rpm=float(_secret("OPENAI_RPM", 500)),        # 0 = sin límite
+        tpm=float(_secret("OPENAI_TPM", 30000)),
+        timeout_s=float(_secret("OPENAI_TIMEOUT_S", 60)),
+        max_retries=int(_secret("OPENAI_MAX_RETRIES", 5)),
+    )
+
+client = get_openai_client()
+
+GPT_MODEL = "gpt-4o"
+GPT_TEMPERATURE = 0.2
+
+# Streaming: el texto se pinta a medida que llega (desactivar con GPT_STREAMING = false)
+GPT_STREAMING = str(_secret("GPT_STREAMING", True)).strip().lower() not in ("0", "false", "no")
+
+# Salida estructurada: los análisis llegan como JSON (esquema por secciones) y cada sección
+# se guarda en caché y se puede regenerar sola (desactivar con GPT_STRUCTURED = false: markdown libre)
+GPT_STRUCTURED = str(_secret("GPT_STRUCTURED", True)).strip().lower() not in ("0", "false", "no")
+
+# Presupuesto de tokens por prompt: cada sección se compacta/recorta para caber (ver radar.prompts)
+RECOS_PROMPT_TOKENS = int(_secret("GPT_RECOS_PROMPT_TOKENS", RECOS_PROMPT_TOKENS))
+SITE_PROMPT_TOKENS = int(_secret("GPT_SITE_PROMPT_TOKENS", SITE_PROMPT_TOKENS))
+
+# === Caché de recomendaciones (compartida por todas las sesiones del proceso) ===
+@st.cache_resource(show_spinner=False)
+def get_reco_cache() -> RecommendationCache:
+    return RecommendationCache(
+        max_entries=int(_secret("GPT_CACHE_MAX_ENTRIES", 256)),
+        ttl_seconds=float(_secret("GPT_CACHE_TTL_S", 7 * 24 * 3600)),
+        persist_dir=_secret("GPT_CACHE_DIR") or None,  # p. ej. ".cache/gpt"; vacío = solo memoria
+        max_disk_entries=int(_secret("GPT_CACHE_MAX_DISK_ENTRIES", 2000)),
+    )
+
+# === Bandeja de salida para Apps Script (respaldo y correo), persistente y compartida ===
+@st.cache_resource(show_spinner=False)
+def get_outbox() -> Outbox:
+    return Outbox(
+        db_path=_secret("OUTBOX_DB", ".cache/outbox.sqlite3"),
+        max_attempts=int(_secret("OUTBOX_MAX_ATTEMPTS", 6)),
+        timeout_s=float(_secret("OUTBOX_TIMEOUT_S", 15)),
+    )
+
+# === Almacén de envíos (SQLite WAL, escritor en segundo plano), compartido por el proceso ===
+@st.cache_resource(show_spinner=False)
+def get_submission_store() -> Optional[SubmissionStore]:
+    db_path = _secret("SUBMISSIONS_DB", ".cache/submissions.sqlite3")  # vacío = no guardar envíos
+    return SubmissionStore(db_path) if db_path else None
 
 # === Marca / assets ===
 logo_path_top = "logo-grupo-epm (1).png"
 logo_path_bottom = "logo-julius.png"
 background_path = "fondo-julius-epm.png"
 
-def img_to_b64(path: str) -> Optional[str]:
-    try:
-        img = Image.open(path)
-        buf = io.BytesIO()
-        fmt = "PNG" if path.lower().endswith("png") else "JPEG"
-        img.save(buf, format=fmt)
-        return base64.b64encode(buf.getvalue()).decode()
-    except Exception:
-        return None
+# Los archivos se leen una vez por proceso (no en cada rerun) y se sirven con sus bytes originales
+@st.cache_resource(show_spinner=False)
+def get_asset_registry() -> AssetRegistry:
+    return AssetRegistry()
 
-b64_logo_top = img_to_b64(logo_path_top)
-b64_logo_bottom = img_to_b64(logo_path_bottom)
-b64_background = img_to_b64(background_path)
+assets = get_asset_registry()
+uri_logo_top = assets.data_uri(logo_path_top)
+uri_logo_bottom = assets.data_uri(logo_path_bottom)
+uri_background = assets.data_uri(background_path)
 
 # Encabezado con logo centrado
-if b64_logo_top:
+if uri_logo_top:
     st.markdown(
         f"""
         <div style='position: absolute; top: 20px; left: 50%; transform: translateX(-50%); z-index: 9999;'>
-            <img src="data:image/png;base64,{b64_logo_top}" width="233px"/>
+            <img src="{uri_logo_top}" width="233px"/>
         </div>
         <div style='margin-top: 220px;'></div>
         """,
@@ -159,7 +231,7 @@ if b64_logo_top:
     )
 
 # CSS y fondo dinámico
-background_css = (f"background-image: url('data:image/jpeg;base64,{b64_background}');" if b64_background else "")
+background_css = (f"background-image: url('{uri_background}');" if uri_background else "")
 custom_css = f"""
 <style>
 @import url('https://fonts.googleapis.com/css2?family=Montserrat:wght@300;400;600;700&display=swap');
@@ -193,7 +265,7 @@ st.markdown("""
 # STATE
 # =============================
 defaults = {
-    "empresa": "", "df_form": None, "gpt_analysis": None, "site_analysis": None, "site_url": "",
+    "empresa": "", "form": None, "saved_scores": None, "gpt_analysis": None, "site_analysis": None, "site_url": "",
     "habeas_aceptado": False, "nombre_persona": "", "celular": "", "ventas_mes": 0.0
 }
 for k, v in defaults.items():
@@ -203,28 +275,36 @@ for k, v in defaults.items():
 # =============================
 # FORMULARIO XLSX
 # =============================
-@st.cache_data(show_spinner=False)
-def load_form(path: str = "Formulario.xlsx") -> pd.DataFrame:
-    df = pd.read_excel(path, sheet_name="Formulario")
-    categoria_col = next((c for c in df.columns if str(c).strip().lower().startswith("categor")), None)
-    pregunta_col = next((c for c in df.columns if str(c).strip().lower().startswith("pregun")), None)
-    calif_col    = next((c for c in df.columns if str(c).strip().lower().startswith("calif")), None)
-    if not (categoria_col and pregunta_col):
-        raise ValueError("La hoja 'Formulario' debe tener columnas 'Categoría' y 'Pregunta'.")
-    if not calif_col:
-        df["Calificación"] = np.nan
-        calif_col = "Calificación"
-    df = df.rename(columns={categoria_col: "Categoría", pregunta_col: "Pregunta", calif_col: "Calificación"})
-    return df[["Categoría", "Pregunta", "Calificación"]]
-
-if st.session_state.df_form is None:
+rerun_trace.stage("1_formulario")
+
+# Formularios compilados por contenido (.npz en FORM_CACHE_DIR): el libro se lee solo
+# la primera vez que aparece un contenido nuevo, en cualquier proceso
+@st.cache_resource(show_spinner=False)
+def get_form_compiler() -> FormCompiler:
+    return FormCompiler(cache_dir=_secret("FORM_CACHE_DIR", ".cache/forms") or None)
+
+# Varios formularios lado a lado: [FORMS] nombre = "archivo.xlsx" en secrets y ?form=nombre en la URL
+forms = dict(_secret("FORMS", None) or {"Formulario": "Formulario.xlsx"})
+form_name = st.query_params.get("form", next(iter(forms)))
+if form_name not in forms:
+    form_name = next(iter(forms))
+form_path = forms[form_name]
+
+# La sesión guarda solo una referencia al formulario compilado (inmutable, compartido por
+# todas las sesiones con la misma versión) y sus calificaciones en int8. Se queda con la
+# versión con la que empezó; las sesiones nuevas toman el libro vigente.
+if st.session_state.form is None or st.session_state.form.name != form_name:
     try:
-        st.session_state.df_form = load_form("Formulario.xlsx")
+        with tracing.span("form.load", form=form_name) as _sp:
+            st.session_state.form = get_form_compiler().load(form_path, name=form_name)
+            st.session_state.saved_scores = None
+            _sp.set(rows=st.session_state.form.n_questions, version=st.session_state.form.version)
     except Exception as e:
-        st.error(f"No se pudo cargar 'Formulario.xlsx'. Detalle: {e}")
+        st.error(f"No se pudo cargar '{form_path}'. Detalle: {e}")
         st.stop()
 
-df_form = st.session_state.df_form.copy()
+form = st.session_state.form
+form_index = form.index  # códigos y pesos precalculados, compartidos
 
 # =============================
 # DATOS GENERALES + HABEAS DATA
@@ -250,201 +330,467 @@ st.session_state.habeas_aceptado = st.checkbox(
 st.markdown("### Califica cada pregunta (1–3)")
 st.caption("**1 = No · 2 = Parcialmente · 3 = Sí**")
 
-# Valor por defecto = 2
-initial_scores = list(df_form["Calificación"].fillna(2).clip(1, 3).astype(int))
-
-with st.form("formulario_calificaciones", clear_on_submit=False):
-    live_scores = initial_scores.copy()
-    for i, row in df_form.iterrows():
-        st.markdown(f"**{row['Categoría']}** — {row['Pregunta']}")
-        val = st.slider(" ", min_value=1, max_value=3, step=1, value=live_scores[i], key=f"slider_{i}")
-        live_scores[i] = val
-        st.markdown("<div class='hint'>1=No · 2=Parcialmente · 3=Sí</div>", unsafe_allow_html=True)
-        st.markdown("<hr>", unsafe_allow_html=True)
-    submitted = st.form_submit_button("Guardar respuestas", use_container_width=True, disabled=not st.session_state.habeas_aceptado)
-
-# --- DF para cálculos SIEMPRE reflejando el estado actual de los sliders (aunque no se haya pulsado Guardar) ---
-df_calc = df_form.copy()
-for i in range(len(df_calc)):
-    df_calc.at[df_calc.index[i], "Calificación"] = st.session_state.get(f"slider_{i}", initial_scores[i])
-df_calc["Calificación"] = df_calc["Calificación"].astype(float)
+# Valor por defecto = 2 (o lo último guardado en la sesión)
+initial_scores = st.session_state.saved_scores if st.session_state.saved_scores is not None else form.initial_scores()
+
+# Modo de cuestionario: "full" (todas las preguntas), "paged" (una categoría a la vez) o
+# "auto" (paginado cuando el formulario supera FORM_PAGED_MIN_QUESTIONS preguntas)
+FORM_MODE = str(_secret("FORM_MODE", "auto")).strip().lower()
+form_paged = FORM_MODE == "paged" or (
+    FORM_MODE == "auto" and form.n_questions > int(_secret("FORM_PAGED_MIN_QUESTIONS", 40))
+)
+
+if form_paged:
+    paged_scores = render_paged_form(form.question_categories, form.questions, initial_scores, 1, 3,
+                                     "<div class='hint'>1=No · 2=Parcialmente · 3=Sí</div>", version=form.version)
+    submitted = st.button("Guardar respuestas", key="btn_guardar", use_container_width=True, disabled=not st.session_state.habeas_aceptado)
+    if submitted:
+        confirm_page(form.question_categories)
+else:
+    with st.form("formulario_calificaciones", clear_on_submit=False):
+        for i, (categoria, pregunta) in enumerate(zip(form.question_categories, form.questions)):
+            st.markdown(f"**{categoria}** — {pregunta}")
+            st.slider(" ", min_value=1, max_value=3, step=1, value=int(initial_scores[i]), key=f"slider_{i}")
+            st.markdown("<div class='hint'>1=No · 2=Parcialmente · 3=Sí</div>", unsafe_allow_html=True)
+            st.markdown("<hr>", unsafe_allow_html=True)
+        submitted = st.form_submit_button("Guardar respuestas", use_container_width=True, disabled=not st.session_state.habeas_aceptado)
+
+# --- Vector de calificaciones SIEMPRE reflejando el estado actual de los sliders (aunque no se haya pulsado Guardar) ---
+if form_paged:
+    score_vec = paged_scores.copy()
+else:
+    score_vec = np.array([st.session_state.get(f"slider_{i}", initial_scores[i]) for i in range(form.n_questions)],
+                         dtype=np.int8)
+
+def answers_frame() -> pd.DataFrame:
+    """Formulario con las calificaciones actuales; solo para las vistas que necesitan tabla."""
+    return form.to_frame(score_vec)
+
+# Un solo cálculo (promedios por categoría, promedio general, peores preguntas) para radar, prompt y reporte
+score_result = form_index.score(score_vec)
 
 if submitted:
-    st.session_state.df_form = df_calc.copy()
+    st.session_state.saved_scores = score_vec.copy()
+    st.session_state.submission_saved = True
     st.success("¡Respuestas guardadas en la sesión!")
 
-def _wrap_label(text: str, max_len: int = 18) -> str:
-    words = str(text).split()
-    lines, curr = [], []
-    for w in words:
-        if sum(len(x) for x in curr) + len(curr) + len(w) <= max_len:
-            curr.append(w)
-        else:
-            lines.append(" ".join(curr))
-            curr = [w]
-    if curr:
-        lines.append(" ".join(curr))
-    return "<br>".join(lines) if lines else str(text)
+tracing.annotate(questions=form.n_questions, paged=form_paged, submitted=bool(submitted))
 
+rerun_trace.stage("2_radar")
 st.markdown("### 2) Radar de promedios por categoría")
-radar_df = df_calc.groupby("Categoría", dropna=False)["Calificación"].mean().reset_index()
-categories = radar_df["Categoría"].tolist()
-values = radar_df["Calificación"].round(2).tolist()
+categories = list(score_result.categories)
+values = np.round(score_result.category_means, 2).tolist()
 
-wrapped = [_wrap_label(c, 14) for c in categories]
+wrapped = [wrap_label(c, 14) for c in categories]
 categories_closed = wrapped + [wrapped[0]] if wrapped else []
 values_closed = values + [values[0]] if values else []
 
+# Comparación con otras empresas: histogramas por categoría que el almacén mantiene en
+# cada envío (los percentiles no recorren los envíos guardados), sin el envío de esta sesión
+store = get_submission_store()
+peers = None
+if store is not None and categories:
+    try:
+        peers = store.peer_stats(form.digest, exclude_key=session_id)
+    except Exception as e:
+        logging.warning("No se pudo leer la comparación con pares: %s", e)
+    if peers is not None and (peers.categories != categories
+                              or peers.n.min() < int(_secret("PEER_MIN_SUBMISSIONS", 5))):
+        peers = None
+
 if wrapped:
-    fig = go.Figure(data=[go.Scatterpolar(r=values_closed, theta=categories_closed, fill="toself", name="Promedio")])
-    fig.update_layout(
-        polar=dict(
-            radialaxis=dict(
-                visible=True,
-                range=[0, 3],
-                showticklabels=False,  # ← quita los números del eje radial
-                ticks=''               # ← sin marcas de tick
+    with tracing.span("radar.plotly", categories=len(wrapped), peers=int(peers.n.min()) if peers else 0):
+        fig = go.Figure()
+        if peers is not None:
+            p25, p50, p75 = (q.tolist() for q in peers.quantiles([0.25, 0.5, 0.75]))
+            # Banda p25–p75: contorno del p75 y, de regreso, el del p25 (un solo polígono)
+            fig.add_trace(go.Scatterpolar(
+                r=p75 + p75[:1] + p25[:1] + p25[::-1], theta=categories_closed + categories_closed[::-1],
+                fill="toself", fillcolor="rgba(128,128,128,0.25)", line=dict(width=0), name="Pares p25–p75",
+            ))
+            fig.add_trace(go.Scatterpolar(r=p50 + p50[:1], theta=categories_closed, mode="lines",
+                                          line=dict(dash="dash", color="gray"), name="Mediana de pares"))
+        fig.add_trace(go.Scatterpolar(r=values_closed, theta=categories_closed, fill="toself", name="Promedio"))
+        fig.update_layout(
+            polar=dict(
+                radialaxis=dict(
+                    visible=True,
+                    range=[0, 3],
+                    showticklabels=False,  # ← quita los números del eje radial
+                    ticks=''               # ← sin marcas de tick
+                ),
+                angularaxis=dict(tickfont=dict(size=12)),
             ),
-            angularaxis=dict(tickfont=dict(size=12)),
-        ),
-        font=dict(size=18),
-        showlegend=False,
-        margin=dict(t=60, b=60, l=60, r=60),
-        height=600,
-        paper_bgcolor="rgba(0,0,0,0)",
-        plot_bgcolor="rgba(0,0,0,0)",
-    )
-    
-    # Bloquear zoom/drag y ocultar la barra de herramientas
-    st.plotly_chart(
-        fig,
-        use_container_width=True,
-        theme=None,
-        config={"staticPlot": True, "displayModeBar": False}
-    )
+            font=dict(size=18),
+            showlegend=peers is not None,
+            legend=dict(orientation="h", y=-0.1, font=dict(size=12)),
+            margin=dict(t=60, b=60, l=60, r=60),
+            height=600,
+            paper_bgcolor="rgba(0,0,0,0)",
+            plot_bgcolor="rgba(0,0,0,0)",
+        )
+
+        # Bloquear zoom/drag y ocultar la barra de herramientas
+        st.plotly_chart(
+            fig,
+            use_container_width=True,
+            theme=None,
+            config={"staticPlot": True, "displayModeBar": False}
+        )
+    if peers is not None:
+        pct = peers.percentile_of(score_result.category_means)
+        st.caption(f"Frente a {int(peers.n.min())} envíos de otras sesiones: " + " · ".join(
+            f"{c}: percentil {p:.0f}" for c, p in zip(categories, pct) if not np.isnan(p)))
 else:
     st.info("No hay categorías para graficar.")
 
 # =============================
 # ANÁLISIS CON GPT (solo 3 secciones) – Markdown en la APP
 # =============================
+rerun_trace.stage("3_analisis")
 st.markdown("### 3) Análisis de resultados")
 
-def build_summary_text(df: pd.DataFrame) -> str:
-    by_cat = df.groupby("Categoría")["Calificación"].agg(["count", "mean"]).round(2)
-    lines = [f"Empresa: {st.session_state.empresa or 'N/A'}", "Resumen por categoría:"]
-    for idx, r in by_cat.iterrows():
-        lines.append(f"- {idx}: n={int(r['count'])}, promedio={r['mean']}")
-    global_mean = df["Calificación"].mean().round(2)
-    lines.append(f"Promedio general: {global_mean}")
-    lines.append(f"Nombre: {st.session_state.nombre_persona or 'N/D'}")
-    lines.append(f"Celular: {st.session_state.celular or 'N/D'}")
-    lines.append(f"Promedio de ventas/mes: {st.session_state.ventas_mes}")
-    return "\n".join(lines)
+# Cliente HTTP compartido por todas las sesiones: keep-alive + GET condicional + caché de texto
+@st.cache_resource(show_spinner=False)
+def get_site_fetcher() -> SiteFetcher:
+    return SiteFetcher(
+        cache_dir=_secret("SITE_CACHE_DIR", ".cache/site") or None,
+        max_entries=int(_secret("SITE_CACHE_MAX_ENTRIES", 500)),
+    )
 
-if st.button("Generar recomendaciones", key="btn_gpt_recos", use_container_width=True, disabled=not st.session_state.habeas_aceptado):
+# Palabras de las categorías del formulario: dan prioridad a pasajes relacionados al rastrear
+crawl_keywords = sorted({w.lower() for c in categories for w in str(c).split() if len(w) > 4})
+
+def fetch_website_text(target_url: str, timeout: int = 15, fetcher: Optional[SiteFetcher] = None,
+                       crawl: bool = False, keywords=()) -> str:
     try:
-        summary = build_summary_text(df_calc)
-        worst = df_calc.sort_values("Calificación").head(5)
-        worst_lines = [f"- ({r['Categoría']}) {r['Pregunta']} -> {r['Calificación']}" for _, r in worst.iterrows()]
-        worst_text = "\n".join(worst_lines)
-        prompt = textwrap.dedent(
-            f"""
-            Eres un consultor experto. Con base en el diagnóstico (escala 1–3: 1=No, 2=Parcialmente, 3=Sí), entrega SOLO:
-            1) Hallazgos clave (máx. 6 bullets)
-            2) Recomendaciones accionables priorizadas (3–5 ítems; justifica prioridad)
-            3) Riesgos si no se actúa (máx. 5)
-
-            Contexto cuantitativo:
-            {summary}
-
-            Preguntas con peores puntajes:
-            {worst_text}
-            """
-        ).strip()
-        with st.spinner("Analizando…"):
-            resp = client.chat.completions.create(
-                model="gpt-4o",
-                temperature=0.2,
-                messages=[{"role": "user", "content": prompt}],
+        fetcher = fetcher or get_site_fetcher()
+        if crawl:
+            return crawl_site_text(
+                fetcher, target_url,
+                max_pages=int(_secret("SITE_CRAWL_MAX_PAGES", 6)),
+                deadline_s=float(_secret("SITE_CRAWL_DEADLINE_S", 5)),
+                keywords=keywords,
             )
-        st.session_state.gpt_analysis = resp.choices[0].message.content
-        st.success("Informe generado.")
+        return fetcher.fetch_text(target_url, timeout=timeout)
+    except Exception as ex:
+        return f"[ERROR] No se pudo obtener el contenido: {ex}"
+
+def prompt_caption(prompt: Prompt, usage=None) -> str:
+    tokens = getattr(usage, "prompt_tokens", None) or prompt.tokens
+    text = f"Prompt: {tokens} tokens de {prompt.budget}"
+    return text + (f" (recortado: {', '.join(prompt.trimmed)})" if prompt.trimmed else "")
+
+def run_chat(ctx: JobContext, prompt: Prompt, label: str, kind: Optional[str] = None,
+             only: Optional[str] = None) -> str:
+    """Llama a GPT desde un hilo de la cola; en modo streaming va guardando el texto parcial.
+       Con ``kind`` pide salida estructurada (el análisis completo o solo la sección ``only``)."""
+    with tracing.span("gpt.chat", label=label, job=ctx.key[:12], section=only, stream=GPT_STREAMING,
+                      prompt_tokens=prompt.tokens, bytes_out=len(prompt.text.encode("utf-8"))) as sp:
+        text, usage = _chat(ctx, prompt, label, kind, only)
+        sp.set(bytes_in=len((text or "").encode("utf-8")), ttft_s=round(ctx.meta.get("ttft_s") or 0, 3),
+               api_prompt_tokens=getattr(usage, "prompt_tokens", None),
+               api_completion_tokens=getattr(usage, "completion_tokens", None))
+        return text
+
+def _chat(ctx: JobContext, prompt: Prompt, label: str, kind: Optional[str], only: Optional[str]) -> tuple:
+    """La llamada en sí: devuelve (texto, usage de la API o None)."""
+    ctx.meta.update(prompt_tokens=prompt.tokens, prompt_budget=prompt.budget,
+                    prompt_sections=prompt.sections, prompt_trimmed=list(prompt.trimmed))
+    fmt = response_format(kind, only) if kind else None
+    if not GPT_STREAMING:
+        resp = client.chat.completions.create(
+            model=GPT_MODEL,
+            temperature=GPT_TEMPERATURE,
+            messages=[{"role": "user", "content": prompt.text}],
+            **({"response_format": fmt} if fmt else {}),
+        )
+        usage = getattr(resp, "usage", None)
+        if usage is not None:
+            ctx.meta.update(api_prompt_tokens=usage.prompt_tokens, api_completion_tokens=usage.completion_tokens)
+        ctx.meta.update(caption=prompt_caption(prompt, usage))
+        return resp.choices[0].message.content, usage
+    stream = ChatStream(client, prompt.text, GPT_MODEL, GPT_TEMPERATURE, label=label, response_format=fmt)
+    parts = []
+    for delta in stream:
+        parts.append(delta)
+        ctx.progress(lambda: preview_markdown(kind, "".join(parts)) if kind else "".join(parts))
+    if stream.usage is not None:
+        ctx.meta.update(api_prompt_tokens=stream.usage.prompt_tokens,
+                        api_completion_tokens=stream.usage.completion_tokens)
+    ctx.meta.update(caption=" · ".join(c for c in (stream.timing_caption(), prompt_caption(prompt, stream.usage)) if c),
+                    ttft_s=stream.ttft_s)
+    return stream.text, stream.usage
+
+def section_cache_key(cache_key: str, name: str) -> str:
+    return make_cache_key(cache_key, ANALYSIS_SCHEMA_VERSION, name)
+
+def cached_result(kind: str, cache_key: str):
+    """Resultado en caché: texto libre, o ``Analysis`` si están todas sus secciones."""
+    cache = get_reco_cache()
+    if not GPT_STRUCTURED:
+        return cache.get(cache_key)
+    sections = {}
+    for spec in SECTIONS[kind]:
+        raw = cache.get(section_cache_key(cache_key, spec.name))
+        if raw is None:
+            return None
+        sections[spec.name] = json.loads(raw)
+    return Analysis(kind, sections)
+
+def run_analysis(ctx: JobContext, prompt: Prompt, kind: str, label: str, cache: RecommendationCache) -> str:
+    """Completa el análisis (o regenera la sección ``payload["section"]``) y lo guarda en caché por sección."""
+    p = ctx.payload
+    if not GPT_STRUCTURED:
+        text = run_chat(ctx, prompt, label)
+        cache.put(p["cache_key"], text)
+        return text
+    only = p.get("section")
+    if only:
+        current = Analysis.from_json(p["current"])
+        spec = section_spec(kind, only)
+        prompt = build_section_prompt(prompt, spec.title, spec.instruction, current.to_markdown(), model=GPT_MODEL)
+    parsed = Analysis.parse(kind, run_chat(ctx, prompt, label, kind=kind, only=only), only=only)
+    for name, items in parsed.sections.items():
+        cache.put(section_cache_key(p["cache_key"], name), json.dumps(items, ensure_ascii=False))
+    return (current.with_section(only, parsed.sections[only]) if only else parsed).to_json()
+
+# === Cola de trabajos GPT: persistente y compartida por todas las sesiones del proceso ===
+# Los botones solo encolan; un rerun o una reconexión no corta ni repite la llamada, y dos
+# envíos con las mismas entradas (misma llave) se fusionan en un solo trabajo.
+@st.cache_resource(show_spinner=False)
+def get_job_queue() -> JobQueue:
+    reco_cache, fetcher = get_reco_cache(), get_site_fetcher()
+    queue = JobQueue(
+        db_path=_secret("JOB_QUEUE_DB", ".cache/jobs.sqlite3"),
+        workers=int(_secret("JOB_WORKERS", 4)),
+        retention_s=float(_secret("JOB_RETENTION_S", 24 * 3600)),
+        lease_s=float(_secret("JOB_LEASE_S", 60)),  # sin latido por más de esto = proceso caído
+    )
+
+    def recos_job(ctx: JobContext) -> str:
+        return run_analysis(ctx, Prompt(**ctx.payload["prompt"]), "recos", "recomendaciones", reco_cache)
+
+    def site_job(ctx: JobContext) -> str:
+        p = ctx.payload
+        # La descarga corre mientras el diagnóstico (si se pidió en el mismo clic) sigue en curso
+        with tracing.span("site.fetch", job=ctx.key[:12], crawl=p["crawl"]) as sp:
+            raw_site_text = fetch_website_text(p["url"], fetcher=fetcher, crawl=p["crawl"], keywords=p["keywords"])
+            sp.set(chars=len(raw_site_text), failed=raw_site_text.startswith("[ERROR]"))
+        base_analysis = p.get("base_analysis")
+        if p.get("after"):
+            dep = ctx.wait_for(p["after"])
+            if dep.status != JOB_DONE:
+                raise RuntimeError(f"el diagnóstico falló: {dep.error}")
+            base_analysis = as_markdown(load_analysis(dep.result))
+        prompt = build_site_prompt(raw_site_text, base_analysis, empresa=p["empresa"],
+                                   budget_tokens=SITE_PROMPT_TOKENS, model=GPT_MODEL)
+        return run_analysis(ctx, prompt, "site", "sitio", reco_cache)
+
+    queue.register("recos", recos_job)
+    queue.register("site", site_job)
+    return queue
+
+JOB_POLL_S = float(_secret("JOB_POLL_S", 1.0))
+jobs = get_job_queue()
+
+def submit_job(kind: str, key: str, payload: dict, result_key: str) -> Job:
+    """Encola (o se une a) un trabajo; si ya estaba terminado, deja el resultado de una vez."""
+    job = jobs.submit(kind, key, payload)
+    if job.status == JOB_DONE:
+        st.session_state[result_key] = load_analysis(job.result)
+    else:
+        st.session_state[f"job_{result_key}"] = job.key
+    return job
+
+@st.fragment(run_every=JOB_POLL_S)
+def watch_job(result_key: str, heading: str, done_msg: str) -> None:
+    """Muestra el avance del trabajo pendiente; al terminar guarda el resultado y recarga la página."""
+    key = st.session_state.get(f"job_{result_key}")
+    job = jobs.get(key) if key else None
+    if job is not None and job.pending:
+        st.markdown(heading)
+        if job.progress:
+            st.markdown(job.progress + " ▌")
+        elif job.status == JOB_RUNNING:
+            st.info("Analizando…")
+        else:
+            ahead = jobs.ahead(job.key)
+            st.info(f"En cola ({ahead} trabajos antes)…" if ahead else "En cola…")
+        api = client.stats()
+        if api["waiting"] or api["retries"]:
+            # Throttling visible: solicitudes esperando cupo de la API y reintentos por 429/errores
+            st.caption(f"API saturada: {api['waiting']} solicitudes esperando cupo · espera media "
+                       f"{api['wait_avg_s']:.1f} s (máx. {api['wait_max_s']:.1f} s) · {api['retries']} reintentos")
+        return
+    st.session_state.pop(f"job_{result_key}", None)
+    if job is None:
+        return
+    if job.status == JOB_DONE:
+        st.session_state[result_key] = load_analysis(job.result)
+        caption = (job.meta or {}).get("caption")
+        st.session_state[f"flash_{result_key}"] = ("success", f"{done_msg} {caption}" if caption else done_msg)
+    else:
+        st.session_state[f"flash_{result_key}"] = ("error", f"No fue posible completar el análisis: {job.error}")
+    st.rerun()  # para que el resultado aparezca en su sección y en el reporte
+
+def show_flash(result_key: str) -> None:
+    flash = st.session_state.pop(f"flash_{result_key}", None)
+    if flash:
+        getattr(st, flash[0])(flash[1])
+
+def recos_request(df: pd.DataFrame, result: ScoreResult) -> tuple:
+    """(llave, prompt) del análisis de resultados; la llave es la misma de la caché."""
+    summary = build_summary_text(result, empresa=st.session_state.empresa, nombre=st.session_state.nombre_persona,
+                                 celular=st.session_state.celular, ventas_mes=st.session_state.ventas_mes)
+    worst_text = build_worst_text(df, result)
+    cache_key = make_cache_key(summary, worst_text, RECOS_PROMPT_VERSION, RECOS_PROMPT_TOKENS,
+                               GPT_MODEL, GPT_TEMPERATURE)
+    return cache_key, build_recos_prompt(summary, worst_text, budget_tokens=RECOS_PROMPT_TOKENS, model=GPT_MODEL)
+
+def request_recommendations(df: pd.DataFrame, result: ScoreResult) -> Optional[str]:
+    """Usa la caché si puede; si no, encola el trabajo. Devuelve la llave del trabajo pendiente (o None)."""
+    cache_key, prompt = recos_request(df, result)
+    cached = cached_result("recos", cache_key)
+    tracing.annotate(cache_hit=cached is not None, prompt_tokens=prompt.tokens)
+    if cached is not None:
+        st.session_state.gpt_analysis = cached
+        st.session_state.flash_gpt_analysis = ("success", "Informe generado (desde caché).")
+        return None
+    job = submit_job("recos", cache_key, {"prompt": asdict(prompt), "cache_key": cache_key}, "gpt_analysis")
+    return job.key if job.pending else None
+
+if st.button("Generar recomendaciones", key="btn_gpt_recos", use_container_width=True, disabled=not st.session_state.habeas_aceptado):
+    try:
+        with tracing.span("recos.request"):
+            request_recommendations(answers_frame(), score_result)
     except Exception as e:
         st.error(f"Error al generar análisis: {e}")
 
+def regenerate_recos_section(name: str) -> None:
+    """Rehace solo una sección del informe (las demás se conservan); nueva llave en cada clic."""
+    cache_key, prompt = recos_request(answers_frame(), score_result)
+    payload = {"prompt": asdict(prompt), "cache_key": cache_key, "section": name,
+               "current": st.session_state.gpt_analysis.to_json()}
+    submit_job("recos", make_cache_key(cache_key, name, uuid.uuid4().hex), payload, "gpt_analysis")
+
+def show_analysis(result_key: str, regenerate, plain: bool = False) -> None:
+    """Pinta el análisis por secciones (cada una con su botón para regenerarla) o el texto libre."""
+    value = st.session_state[result_key]
+    if not isinstance(value, Analysis):
+        (st.text if plain else st.markdown)(value)
+        return
+    busy = bool(st.session_state.get(f"job_{result_key}"))
+    for spec in value.specs:
+        c_title, c_btn = st.columns([4, 1])
+        c_title.markdown(f"**{spec.title}**")
+        if c_btn.button("↻ Regenerar", key=f"regen_{result_key}_{spec.name}", use_container_width=True,
+                        disabled=busy or not st.session_state.habeas_aceptado):
+            try:
+                regenerate(spec.name)
+                st.rerun()
+            except Exception as e:
+                st.error(f"No fue posible regenerar la sección: {e}")
+        st.markdown(value.section_markdown(spec.name))
+
+if st.session_state.get("job_gpt_analysis"):
+    watch_job("gpt_analysis", "#### Informe", "Informe generado.")
+show_flash("gpt_analysis")
+
 # Mostrar SIEMPRE (Markdown dentro de la app)
 if st.session_state.gpt_analysis:
     st.markdown("#### Informe")
-    st.markdown(st.session_state.gpt_analysis)
+    show_analysis("gpt_analysis", regenerate_recos_section)
+    _cs = get_reco_cache().stats()
+    st.caption(f"Caché de recomendaciones: {_cs['hits']} aciertos · {_cs['misses']} fallos · {_cs['entries']} en memoria")
 
 # =============================
 # Análisis de sitio
 # =============================
+rerun_trace.stage("4_sitio")
 st.markdown("### 4) Análisis de sitio web (opcional)")
 st.session_state.site_url = st.text_input("Pega la URL del sitio web a analizar", value=st.session_state.site_url)
 
-def fetch_website_text(target_url: str, timeout: int = 15) -> str:
-    try:
-        r = requests.get(target_url, timeout=timeout, headers={"User-Agent": "Mozilla/5.0"})
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
-        for tag in soup(["script", "style", "noscript"]):
-            tag.decompose()
-        text = " ".join(soup.get_text(separator=" ").split())
-        return text[:8000]
-    except Exception as ex:
-        return f"[ERROR] No se pudo obtener el contenido: {ex}"
+site_crawl = st.checkbox(
+    "Leer varias páginas del sitio (sitemap y enlaces del home)", key="site_crawl",
+    help="Descarga en paralelo hasta unas pocas páginas del mismo dominio (≈5 s) y envía a GPT los pasajes más útiles.",
+)
 
-if st.button("Analizar sitio con GPT", key="btn_gpt_site", use_container_width=True, disabled=not st.session_state.habeas_aceptado):
+c_site, c_all = st.columns([1, 1])
+with c_site:
+    btn_site = st.button("Analizar sitio con GPT", key="btn_gpt_site", use_container_width=True, disabled=not st.session_state.habeas_aceptado)
+with c_all:
+    # Modo en paralelo: descarga del sitio y diagnóstico GPT al mismo tiempo
+    btn_all = st.button("Diagnóstico + sitio (en paralelo)", key="btn_gpt_all", use_container_width=True, disabled=not st.session_state.habeas_aceptado)
+
+def site_request(base_analysis, after: Optional[str] = None) -> tuple:
+    """(llave, payload) del análisis del sitio; con ``after`` usa como base el resultado de ese trabajo."""
+    base_analysis = as_markdown(base_analysis) or None
+    payload = {
+        "url": st.session_state.site_url, "crawl": bool(site_crawl), "keywords": crawl_keywords,
+        "empresa": st.session_state.empresa, "base_analysis": None if after else base_analysis, "after": after,
+    }
+    key = make_cache_key("site", payload["url"], payload["crawl"], payload["empresa"],
+                         after or base_analysis or "", GPT_MODEL, GPT_TEMPERATURE)
+    payload["cache_key"] = key
+    return key, payload
+
+def request_site_analysis(base_analysis=None, after: Optional[str] = None) -> None:
+    key, payload = site_request(base_analysis, after)
+    cached = None if after else cached_result("site", key)
+    tracing.annotate(cache_hit=cached is not None)
+    if cached is not None:
+        st.session_state.site_analysis = cached
+        st.session_state.flash_site_analysis = ("success", "Análisis del sitio generado (desde caché).")
+        return
+    submit_job("site", key, payload, "site_analysis")
+
+def regenerate_site_section(name: str) -> None:
+    key, payload = site_request(st.session_state.gpt_analysis)
+    payload.update(section=name, current=st.session_state.site_analysis.to_json())
+    submit_job("site", make_cache_key(key, name, uuid.uuid4().hex), payload, "site_analysis")
+
+if btn_site or btn_all:
     if not st.session_state.site_url:
         st.warning("Por favor ingresa una URL válida.")
     else:
-        raw_site_text = fetch_website_text(st.session_state.site_url)
-        base_analysis = st.session_state.gpt_analysis or "(Aún no hay análisis base. Usa el botón del paso 3.)"
-        prompt_site = textwrap.dedent(
-            f"""
-            Eres un consultor digital. Toma el diagnóstico cuantitativo y cualitativo previo y contrástalo con el contenido del sitio.
-            Entrega:
-            - Señales de alineación/desalineación entre el diagnóstico y el sitio.
-            - Recomendaciones de UX, contenido y confianza (trust signals).
-            - 5 acciones web priorizadas (impacto vs. esfuerzo).
-
-            [Empresa]
-            {st.session_state.empresa or 'N/A'}
-
-            [Diagnóstico IA previo]
-            {base_analysis}
-
-            [Contenido del sitio]
-            {raw_site_text}
-            """
-        ).strip()
-        with st.spinner("Analizando el sitio…"):
-            try:
-                resp2 = client.chat.completions.create(
-                    model="gpt-4o",
-                    temperature=0.2,
-                    messages=[{"role": "user", "content": prompt_site}],
-                )
-                st.session_state.site_analysis = resp2.choices[0].message.content
-                st.success("Análisis del sitio generado.")
-            except Exception as e:
-                st.error(f"No fue posible analizar el sitio: {e}")
+        try:
+            if btn_all:
+                with tracing.span("recos.request"):
+                    recos_key = request_recommendations(answers_frame(), score_result)
+            else:
+                recos_key = None
+            with tracing.span("site.request"):
+                request_site_analysis(base_analysis=st.session_state.gpt_analysis, after=recos_key)
+            if btn_all:
+                st.rerun()  # el diagnóstico (o su avance) se muestra en su sección (paso 3)
+        except Exception as e:
+            st.error(f"No fue posible analizar el sitio: {e}")
+
+if st.session_state.get("job_site_analysis"):
+    watch_job("site_analysis", "#### Hallazgos del sitio", "Análisis del sitio generado.")
+show_flash("site_analysis")
 
 # En la app lo dejamos en texto plano (o cámbialo a markdown si lo prefieres)
 if st.session_state.site_analysis:
     st.markdown("#### Hallazgos del sitio")
-    st.text(st.session_state.site_analysis)
+    show_analysis("site_analysis", regenerate_site_section, plain=True)
 
 # =============================
 # 5) DESCARGA DEL CONTENIDO EN HTML (análisis convertidos a HTML) + COPIA SILENCIOSA EN DRIVE
 # =============================
+rerun_trace.stage("5_reporte")
 st.markdown("### 5) Descargar reporte en HTML")
 
-# Radar exportable (misma escala 0–3 y etiquetas envueltas)
-radar_html = ""
-if wrapped:
+# Radar exportable (misma escala 0–3 y etiquetas envueltas).
+# "svg" (por defecto): SVG estático de pocos KB; "plotly": gráfico interactivo con plotly.js embebido (varios MB)
+REPORT_RADAR_MODE = str(_secret("REPORT_RADAR_MODE", "svg")).strip().lower()
+
+def build_radar_html() -> str:
+    if wrapped and REPORT_RADAR_MODE != "plotly":
+        return radar_svg(wrapped, values, max_value=3)
+    if not wrapped:
+        return ""
     fig_export = go.Figure(data=[go.Scatterpolar(r=values_closed, theta=categories_closed, fill='toself', name='Promedio')])
     fig_export.update_layout(
         polar=dict(
@@ -457,113 +803,145 @@ if wrapped:
         paper_bgcolor='rgba(0,0,0,0)',
         plot_bgcolor='rgba(0,0,0,0)',
     )
-    radar_html = fig_export.to_html(full_html=False, include_plotlyjs='inline')
-
-# Tabla con los valores ACTUALES (df_calc)
-styled_table = (
-    df_calc.copy()
-    .assign(Calificación=lambda d: d["Calificación"].fillna("").astype(str))
-    .to_html(index=False, classes="table", border=0)
+    return fig_export.to_html(full_html=False, include_plotlyjs='inline')
+
+# El reporte solo se arma cuando se descarga o se envía, y se memoriza por hash de sus
+# entradas: mover un slider o cualquier rerun sin descarga ya no paga el render completo.
+report_inputs = dict(
+    nombre=st.session_state.nombre_persona,
+    celular=st.session_state.celular,
+    empresa=st.session_state.empresa,
+    ventas_mes=st.session_state.ventas_mes,
+    habeas_aceptado=st.session_state.habeas_aceptado,
+    gpt_analysis=st.session_state.gpt_analysis,
+    site_analysis=st.session_state.site_analysis,
+    site_url=st.session_state.site_url,
 )
+report_key = make_cache_key(REPORT_RADAR_MODE, form.version, score_vec.tobytes().hex(), *report_inputs.values())
+# Envío guardado en el almacén local: una fila por sesión con las respuestas tal como se
+# guardaron (no el estado vivo de los sliders); se reenvía solo si se vuelve a guardar
+# algo distinto o llegan los análisis (la escritura va por la cola, no bloquea)
+saved_scores = st.session_state.saved_scores
+submission_key = (make_cache_key(form.digest, saved_scores.tobytes().hex(), *report_inputs.values())
+                  if saved_scores is not None else None)
+if (store is not None and st.session_state.habeas_aceptado and st.session_state.get("submission_saved")
+        and submission_key is not None and st.session_state.get("submission_digest") != submission_key):
+    try:
+        saved_result = score_result if np.array_equal(saved_scores, score_vec) else form_index.score(saved_scores)
+        store.register_form(form.digest, form.question_categories, form.questions,
+                            saved_result.categories)
+        store.submit(SubmissionRecord(
+            key=session_id, form_id=form.digest, scores=saved_scores,
+            category_means=saved_result.category_means, global_mean=float(saved_result.global_mean),
+            empresa=st.session_state.empresa, nombre=st.session_state.nombre_persona,
+            celular=st.session_state.celular, ventas_mes=st.session_state.ventas_mes,
+            site_url=st.session_state.site_url, habeas=True,
+            gpt_analysis=dump_analysis(st.session_state.gpt_analysis),
+            site_analysis=dump_analysis(st.session_state.site_analysis),
+        ))
+        st.session_state.submission_digest = submission_key
+    except Exception as e:
+        logging.warning("No se pudo guardar el envío: %s", e)
 
-# CONVERSIÓN a HTML (NO markdown) para el reporte
-analysis_html = md_to_html(st.session_state.gpt_analysis or "Aún no generado.")
-site_html = md_to_html(st.session_state.site_analysis or "Aún no generado.")
-
-html_css = """
-<style>
-body { font-family: Montserrat, Arial, sans-serif; padding: 24px; background: #f8f5fb; }
-h1, h2, h3 { color: #240531; }
-.badge { display:inline-block; background:#ff5722; color:white; padding:6px 12px; border-radius:16px; font-weight:700; }
-.table { width:100%; border-collapse: collapse; }
-.table th { background:#ff5722; color:#fff; padding:8px; text-align:left; }
-.table td { background:#ffffff; border:1px solid #eee; padding:8px; vertical-align: top; }
-.section { background:#fff; border:1px solid #eee; border-radius:12px; padding:16px; margin-bottom:16px; }
-</style>
-"""
-
-report_html = f"""
-<!DOCTYPE html>
-<html lang='es'>
-<head>
-<meta charset='utf-8'>
-<title>Reporte Diagnóstico</title>
-{html_css}
-</head>
-<body>
-<h1>Reporte de Diagnóstico</h1>
-
-<div class='section'>
-  <h2>Datos generales</h2>
-  <p><strong>Nombre:</strong> {escape(st.session_state.nombre_persona or 'N/D')}</p>
-  <p><strong>Celular:</strong> {escape(st.session_state.celular or 'N/D')}</p>
-  <p><strong>Empresa:</strong> {escape(st.session_state.empresa or 'N/D')}</p>
-  <p><strong>Promedio de ventas/mes:</strong> {st.session_state.ventas_mes}</p>
-  <p><strong>Habeas data aceptado:</strong> {"Sí" if st.session_state.habeas_aceptado else "No"}</p>
-</div>
-
-<div class='section'>
-  <h2>Respuestas por pregunta</h2>
-  {styled_table}
-</div>
-
-<div class='section'>
-  <h2>Radar de promedios por categoría</h2>
-  {radar_html}
-</div>
-
-<div class='section'>
-  <h2>Informe</h2>
-  {analysis_html}
-</div>
-
-<div class='section'>
-  <h2>Hallazgos del sitio</h2>
-  <p><strong>URL:</strong> {escape(st.session_state.site_url or 'N/D')}</p>
-  {site_html}
-</div>
+if "report_memo" not in st.session_state:
+    st.session_state.report_memo = ReportMemo()
+report_memo = st.session_state.report_memo
 
-<footer>
-  <p style='color:#666'>Reporte generado automáticamente.</p>
-</footer>
-</body>
-</html>
-"""
+def build_report_bytes() -> bytes:
+    # Corre dentro de la etapa 5: al preparar la descarga, al enviar el correo o el respaldo
+    with tracing.span("report.render", session=session_id, radar=REPORT_RADAR_MODE) as sp:
+        # Tabla con los valores ACTUALES
+        report_html = build_report_html(table_html=answers_table_html(answers_frame()), radar_html=build_radar_html(),
+                                        **report_inputs)
+        data = report_html.encode("utf-8")
+        sp.set(bytes_out=len(data))
+        return data
 
-html_bytes = report_html.encode("utf-8")
+report_memo.bind(report_key, build_report_bytes)
+get_report_bytes = report_memo.get
 
 # Nombre con timestamp
 ts = datetime.now().strftime("%Y%m%d_%H%M%S")
 filename = f"diagnostico_reporte_{ts}.html"
 
-clicked = st.download_button(
-    label="Descargar reporte (HTML)",
-    data=html_bytes,                # <- tu report_html.encode("utf-8")
-    file_name=filename,
-    mime="text/html",
-    use_container_width=True,
-    disabled=not st.session_state.habeas_aceptado
-)
+# El reporte se arma al pulsar "Preparar reporte" (no en cada rerun) y la descarga lleva
+# esos bytes. Con un callable diferido el archivo generado no queda asociado a la sesión y
+# la limpieza de huérfanos (al terminar reruns de otras sesiones) lo borraba antes del GET.
+# Si cambian las respuestas o los análisis, vuelve a aparecer "Preparar reporte".
+report_slot = st.empty()
+if not report_memo.ready and report_slot.button("Preparar reporte (HTML)", key="btn_prepare_report",
+                                                use_container_width=True,
+                                                disabled=not st.session_state.habeas_aceptado):
+    get_report_bytes()
+clicked = False
+if report_memo.ready:
+    clicked = report_slot.download_button(
+        label="Descargar reporte (HTML)",
+        data=get_report_bytes(),        # memorizado por report_key
+        file_name=filename,
+        mime="text/html",
+        key="btn_download_report",      # id estable aunque cambie el nombre con la hora
+        use_container_width=True,
+        disabled=not st.session_state.habeas_aceptado
+    )
 
-# Envío silencioso al WebApp (backend); sin mostrar nada en UI
+# Copia de respaldo al WebApp (backend): se encola y se entrega en segundo plano
 if clicked and st.session_state.habeas_aceptado:
-    _send_backup_to_apps_script(html_bytes, filename)
+    st.session_state.backup_delivery = _send_backup_to_apps_script(get_report_bytes(), filename)
 
 # Envío por email
 dest_por_defecto = st.secrets.get("")
 to_input = st.text_input("Escribe el email donde llegará el reporte", value=dest_por_defecto)
 
 if st.button("Enviar reporte por correo", use_container_width=True, disabled=not st.session_state.habeas_aceptado):
-    ok_mail = send_report_email_via_apps_script(html_bytes, filename, to_input)
-    st.success("📧 Reporte enviado por correo.")
+    if not [s for s in to_input.split(",") if s.strip()]:
+        st.warning("Escribe al menos un email.")
+    else:
+        st.session_state.mail_delivery = send_report_email_via_apps_script(get_report_bytes(), filename, to_input)
+        if st.session_state.mail_delivery is None:
+            st.error("El envío por correo no está configurado.")
+
+def delivery_status(state_key: str, sent_msg: str, label: str, quiet: bool = False) -> None:
+    """Estado real de un envío de la bandeja de salida (enviado, reintentando o fallido).
+       ``quiet``: solo una línea discreta (la copia de respaldo no es asunto del usuario)."""
+    delivery = get_outbox().get(st.session_state[state_key]) if st.session_state.get(state_key) else None
+    if delivery is None:
+        return
+    if delivery.status == OUTBOX_SENT:
+        (st.caption if quiet else st.success)(sent_msg)
+    elif delivery.pending:
+        retry_note = f" (intento {delivery.attempts + 1}; último error: {delivery.last_error})" if delivery.last_error else ""
+        (st.caption if quiet else st.info)(f"{label}: enviando…{retry_note}")
+    else:
+        (st.caption if quiet else st.error)(f"{label}: no se pudo entregar tras {delivery.attempts} intentos ({delivery.last_error}).")
+        if st.button("Reintentar envío", key=f"retry_{state_key}", use_container_width=True):
+            get_outbox().retry(delivery.id)
+            st.rerun()
+
+@st.fragment(run_every=JOB_POLL_S)
+def watch_delivery(state_key: str, sent_msg: str, label: str, quiet: bool = False) -> None:
+    delivery_status(state_key, sent_msg, label, quiet)
+    delivery = get_outbox().get(st.session_state[state_key])
+    if delivery is not None and not delivery.pending:
+        st.rerun()  # estado final: deja de consultar
+
+for _key, _sent, _label, _quiet in (("mail_delivery", "📧 Reporte enviado por correo.", "Correo", False),
+                                    ("backup_delivery", "Copia de respaldo guardada.", "Copia de respaldo", True)):
+    _d = get_outbox().get(st.session_state[_key]) if st.session_state.get(_key) else None
+    if _d is not None and _d.pending:
+        watch_delivery(_key, _sent, _label, _quiet)
+    elif _d is not None:
+        delivery_status(_key, _sent, _label, _quiet)
 
 # === Footer brand ===
-if b64_logo_bottom:
+if uri_logo_bottom:
     st.markdown(
         f"""
         <div style='display: flex; justify-content: center; align-items: center; margin-top: 60px; margin-bottom: 40px;'>
-            <img src="data:image/png;base64,{b64_logo_bottom}" width="96" height="69"/>
+            <img src="{uri_logo_bottom}" width="96" height="69"/>
         </div>
         """,
         unsafe_allow_html=True,
     )
+
+rerun_trace.end()
@@ -0,0 +1 @@
+"""Benchmarks offline del Radar (se ejecutan con ``python -m benchmarks.<modulo>``)."""
@@ -0,0 +1,70 @@
+"""Costo por rerun de preparar los logos/fondo: PIL + base64 (antes) vs. AssetRegistry.
+
+Uso:  python -m benchmarks.assets [--sessions 1 20 100] [--reruns 50]
+
+Simula N sesiones concurrentes (un hilo por sesión, como Streamlit) que hacen
+``--reruns`` reruns cada una y reporta el tiempo medio por rerun y el total.
+"""
+import argparse
+import base64
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from PIL import Image
+
+from radar.assets import AssetRegistry
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSETS = [os.path.join(ROOT, p) for p in ("logo-grupo-epm (1).png", "logo-julius.png", "fondo-julius-epm.png")]
+
+
+def img_to_b64(path: str) -> Optional[str]:
+    """Copia de la versión anterior de la app (decodifica y recodifica con PIL)."""
+    try:
+        img = Image.open(path)
+        buf = io.BytesIO()
+        fmt = "PNG" if path.lower().endswith("png") else "JPEG"
+        img.save(buf, format=fmt)
+        return base64.b64encode(buf.getvalue()).decode()
+    except Exception:
+        return None
+
+
+def run(rerun, sessions: int, reruns: int) -> dict:
+    def session(_):
+        t = time.perf_counter()
+        for _ in range(reruns):
+            rerun()
+        return time.perf_counter() - t
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        per_session = list(pool.map(session, range(sessions)))
+    wall = time.perf_counter() - t0
+    return {"ms_per_rerun": 1000 * sum(per_session) / (sessions * reruns), "wall_s": wall}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sessions", type=int, nargs="+", default=[1, 20, 100])
+    ap.add_argument("--reruns", type=int, default=50)
+    args = ap.parse_args()
+
+    registry = AssetRegistry()
+    engines = {
+        "PIL (antes)": lambda: [img_to_b64(p) for p in ASSETS],
+        "registro": lambda: [registry.data_uri(p) for p in ASSETS],
+    }
+    print(f"{'sesiones':>8} {'motor':<12} {'ms/rerun':>10} {'total (s)':>10}")
+    for n in args.sessions:
+        for name, fn in engines.items():
+            r = run(fn, n, args.reruns)
+            print(f"{n:>8} {name:<12} {r['ms_per_rerun']:>10.3f} {r['wall_s']:>10.2f}")
+    print(f"lecturas de disco del registro: {registry.loads}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Compara la extracción de texto con BeautifulSoup vs. el extractor en streaming.
+
+Uso:  python -m benchmarks.html_extract [--sizes-mb 0.5 2 8] [--repeat 3]
+
+Las páginas de prueba se generan al vuelo imitando un home de e-commerce grande:
+mucho JSON/JS embebido, estilos en línea y miles de tarjetas de producto.
+"""
+import argparse
+import time
+import tracemalloc
+
+from radar.html_text import _lxml_available, extract_text_fast
+from radar.site_fetch import extract_text
+
+
+def make_page(size_mb: float) -> str:
+    head = (
+        "<html><head><title>Tienda</title>"
+        "<style>" + ".c{color:red;margin:0 auto}" * 2000 + "</style>"
+        "<script>window.__STATE__=" + '{"sku":"ABC","price":1000},' * 5000 + "</script>"
+        "</head><body><nav><a href='/'>Inicio</a> <a href='/ofertas'>Ofertas</a></nav>"
+    )
+    card = (
+        "<div class='card'><img src='p.jpg' alt='producto'/><h3>Zapatos deportivos {i}</h3>"
+        "<p>Envío gratis a todo el país &amp; 12 cuotas sin interés.</p>"
+        "<script>track({i})</script><span class='price'>$ 199.900</span></div>"
+    )
+    parts, size, i = [head], len(head), 0
+    target = int(size_mb * 1024 * 1024)
+    while size < target:
+        c = card.format(i=i)
+        parts.append(c)
+        size += len(c)
+        i += 1
+    parts.append("<footer>Todos los derechos reservados</footer></body></html>")
+    return "".join(parts)
+
+
+def measure(fn, html: str, repeat: int) -> dict:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(html)
+        best = min(best, time.perf_counter() - t)
+    tracemalloc.start()
+    out = fn(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": best, "peak_mb": peak / 1e6, "chars": len(out)}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes-mb", type=float, nargs="+", default=[0.5, 2.0, 8.0])
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--max-chars", type=int, default=8000)
+    args = ap.parse_args()
+
+    engines = {
+        "bs4 (actual)": lambda h: extract_text(h, args.max_chars),
+        "stream stdlib": lambda h: extract_text_fast(h, args.max_chars, backend="stdlib"),
+    }
+    if _lxml_available:
+        engines["stream lxml"] = lambda h: extract_text_fast(h, args.max_chars, backend="lxml")
+
+    print(f"{'página':>8} {'motor':<15} {'tiempo (ms)':>12} {'pico (MB)':>10} {'chars':>6}")
+    for mb in args.sizes_mb:
+        html = make_page(mb)
+        ref = extract_text(html, args.max_chars)
+        for name, fn in engines.items():
+            r = measure(fn, html, args.repeat)
+            same = "" if fn(html) == ref else "  (¡difiere!)"
+            print(f"{mb:>6.1f}MB {name:<15} {r['seconds'] * 1000:>12.1f} {r['peak_mb']:>10.1f} {r['chars']:>6}{same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+"""Prueba de carga: N sesiones simultáneas recorriendo el flujo completo de la app V2.
+
+Uso:  python -m benchmarks.load_test [--sessions 1 5 10 20] [--latency-ms 800] [--chunk-ms 20]
+                                     [--job-workers 4] [--slider-moves 5] [--out carga.json]
+
+Levanta la app con ``streamlit run`` (servidor real, en un subproceso) y cada sesión
+es un cliente websocket que habla el protocolo del navegador: envía ``rerun_script``
+con el estado de los widgets y lee los ``ForwardMsg`` hasta que termina el script.
+No se usa ``streamlit.testing`` (``AppTest``): cada ``run`` cambia variables globales
+(``st.secrets``, el runtime, la configuración), así que varias sesiones en hilos se
+pisan entre sí. El flujo de cada sesión es:
+
+    carga → datos (habeas, empresa) → sliders → guardar → recomendaciones (hasta que
+    llega el resultado) → sitio (hasta que llega el resultado) → reporte (preparar y bajar)
+
+Como en el navegador, mover un slider dentro de ``st.form`` no dispara un rerun (el
+valor viaja con "Guardar respuestas"); en el cuestionario paginado, cada movimiento sí.
+Mientras hay un trabajo pendiente, la sesión repite los reruns del fragmento
+``watch_job`` al intervalo que pide el servidor (``auto_rerun``). El reporte se arma
+con "Preparar reporte" y se baja por HTTP desde la URL del botón de descarga (si el
+botón fuera diferido, antes se pide la URL con ``backend_operation_request``).
+
+OpenAI se reemplaza por ``benchmarks.mock_openai`` (latencia configurable) y el sitio
+por las páginas de ``benchmarks/fixtures`` servidas en local. Cada sesión usa otra
+empresa y otras calificaciones, así que las cachés de GPT no se reutilizan entre sesiones.
+Colas, cachés, envíos, formularios y trazas van a un directorio temporal.
+
+Por nivel de concurrencia se reporta el throughput (flujos completos por minuto) y los
+percentiles p50/p95/p99 por paso y por rerun, más el resumen de las trazas de la app
+(``radar.tracing``) para ver dónde se va el tiempo del lado del servidor.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.Alert_pb2 import Alert
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+from benchmarks.mock_openai import MockOpenAI, fixture_site
+from benchmarks.pipeline import ROOT, environment
+from radar import tracing
+
+try:
+    from websockets.sync.client import connect
+except ImportError:  # opcional: solo lo usa esta prueba
+    connect = None
+
+APP = os.path.join(ROOT, "app_streamlit_formulario_radar_gpt_V2.py")
+STEPS = ("load", "datos", "sliders", "save", "recos", "site", "report")
+_DONE = (ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_WITH_COMPILE_ERROR,
+         ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def write_secrets(path: str, values: dict) -> None:
+    with open(path, "w", encoding="utf-8") as fh:
+        for k, v in values.items():
+            fh.write(f"{k} = {json.dumps(v)}\n")
+
+
+def start_server(port: int, secrets_path: str, log_path: str, env: dict, timeout: float = 60) -> subprocess.Popen:
+    """``streamlit run`` de la app en ``port`` (salida en ``log_path``); vuelve cuando ``/_stcore/health`` responde."""
+    cmd = [sys.executable, "-m", "streamlit", "run", APP, "--server.headless", "true",
+           "--server.port", str(port), "--server.address", "127.0.0.1",
+           "--server.enableXsrfProtection", "false", "--browser.gatherUsageStats", "false",
+           "--secrets.files", secrets_path]
+    with open(log_path, "ab") as log:
+        proc = subprocess.Popen(cmd, cwd=ROOT, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            with open(log_path, encoding="utf-8", errors="replace") as fh:
+                raise RuntimeError(f"streamlit terminó al arrancar: {fh.read()[-2000:]}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as r:
+                if r.status == 200:
+                    return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise TimeoutError(f"streamlit no respondió en {timeout:.0f} s")
+
+
+class BrowserSession:
+    """Cliente websocket de Streamlit: lo mínimo del navegador para recorrer la app.
+
+    Guarda los elementos del último rerun por ruta (``delta_path``), el estado de los
+    widgets que la sesión cambió y los fragmentos con ``auto_rerun`` activos.
+    """
+
+    def __init__(self, ws, base_url: str, timeout: float):
+        self.ws = ws
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session_id = ""
+        self.elements: Dict[tuple, object] = {}
+        self.states: Dict[str, WidgetState] = {}
+        self.fragments: Dict[str, float] = {}  # fragment_id -> intervalo (s)
+        self.reruns: List[float] = []
+
+    # --- mensajes ---
+    def send(self, msg: BackMsg) -> None:
+        self.ws.send(msg.SerializeToString())
+
+    def recv(self, deadline: float) -> ForwardMsg:
+        data = self.ws.recv(timeout=max(0.01, deadline - time.monotonic()))
+        msg = ForwardMsg()
+        msg.ParseFromString(data)
+        kind = msg.WhichOneof("type")
+        if kind == "new_session":
+            if msg.new_session.initialize.session_id:
+                self.session_id = msg.new_session.initialize.session_id
+            if not msg.new_session.fragment_ids_this_run:  # rerun completo: la página se vuelve a armar
+                self.elements.clear()
+                self.fragments.clear()
+        elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+            self.elements[tuple(msg.metadata.delta_path)] = msg.delta.new_element
+        elif kind == "auto_rerun":
+            self.fragments[msg.auto_rerun.fragment_id] = msg.auto_rerun.interval
+        elif kind == "stop_auto_rerun":
+            self.fragments.clear()
+        return msg
+
+    def rerun(self, fragment_id: str = "") -> None:
+        """Un rerun (o el de un fragmento) con los widgets actuales; vuelve cuando termina el script."""
+        msg = BackMsg()
+        rs = msg.rerun_script
+        rs.query_string = ""
+        rs.page_script_hash = ""
+        rs.widget_states.widgets.extend(self.states.values())
+        if fragment_id:
+            rs.fragment_id = fragment_id
+            rs.is_auto_rerun = True
+        # Los triggers (botones) valen solo para este rerun
+        self.states = {k: s for k, s in self.states.items() if s.WhichOneof("value") != "trigger_value"}
+        t = time.perf_counter()
+        self.send(msg)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            fwd = self.recv(deadline)
+            if fwd.WhichOneof("type") == "script_finished" and fwd.script_finished in _DONE:
+                break
+        self.reruns.append(time.perf_counter() - t)
+        if not fragment_id:
+            live = {w.id for w in self.widgets()}
+            self.states = {k: s for k, s in self.states.items() if k in live}
+        errors = self.errors()
+        if errors:
+            raise RuntimeError(errors[0])
+
+    # --- elementos ---
+    def widgets(self, kind: Optional[str] = None) -> list:
+        out = []
+        for el in self.elements.values():
+            name = el.WhichOneof("type")
+            if (kind is None or name == kind) and hasattr(getattr(el, name), "id"):
+                out.append(getattr(el, name))
+        return out
+
+    def widget(self, kind: str, label: Optional[str] = None, key: Optional[str] = None):
+        for w in self.widgets(kind):
+            if (label is None or w.label.startswith(label)) and (key is None or w.id.endswith(f"-{key}")):
+                return w
+        raise LookupError(f"no hay {kind} {label or key!r} en la página")
+
+    def errors(self) -> List[str]:
+        out = []
+        for el in self.elements.values():
+            name = el.WhichOneof("type")
+            if name == "exception" and not el.exception.is_warning:
+                out.append(f"{el.exception.type}: {el.exception.message}")
+            elif name == "alert" and el.alert.format == Alert.ERROR:
+                out.append(el.alert.body)
+        return out
+
+    def set(self, widget, **value) -> None:
+        state = WidgetState(id=widget.id, **value)
+        self.states[widget.id] = state
+
+    def click(self, widget) -> None:
+        self.set(widget, trigger_value=True)
+        self.rerun()
+
+    def wait_fragments(self) -> None:
+        """Repite los reruns de fragmentos con ``auto_rerun`` (``watch_job``) hasta que no quede ninguno."""
+        deadline = time.monotonic() + self.timeout
+        while self.fragments:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"trabajo sin terminar en {self.timeout:.0f} s")
+            time.sleep(min(self.fragments.values()))
+            for fragment_id in list(self.fragments):
+                if fragment_id in self.fragments:
+                    self.rerun(fragment_id)
+
+    def download(self, widget) -> bytes:
+        """Lo que hace el navegador al pulsar una descarga: baja ``url`` o, si es diferida, pide antes la URL."""
+        url = widget.url
+        if widget.deferred_file_id:
+            msg = BackMsg()
+            req = msg.backend_operation_request
+            req.request_id = uuid.uuid4().hex
+            req.session_id = self.session_id
+            req.deferred_file.file_id = widget.deferred_file_id
+            self.send(msg)
+            deadline = time.monotonic() + self.timeout
+            while True:
+                fwd = self.recv(deadline)
+                if fwd.WhichOneof("type") == "backend_operation_response" and \
+                        fwd.backend_operation_response.request_id == req.request_id:
+                    resp = fwd.backend_operation_response
+                    break
+            if resp.error_msg:
+                raise RuntimeError(f"descarga: {resp.error_msg}")
+            url = resp.deferred_file.url
+        try:
+            with urllib.request.urlopen(url if "://" in url else self.base_url + url, timeout=self.timeout) as r:
+                return r.read()
+        except urllib.error.HTTPError as ex:
+            raise RuntimeError(f"descarga: HTTP {ex.code} al bajar el archivo") from None
+
+
+class SessionFlow:
+    """Una sesión simulada: recorre el flujo y guarda la duración de cada paso y de cada rerun."""
+
+    def __init__(self, name: str, base_url: str, site_url: str, args: argparse.Namespace, seed: int):
+        self.name = name
+        self.base_url = base_url
+        self.site_url = site_url
+        self.args = args
+        self.rng = random.Random(seed)
+        self.steps: Dict[str, float] = {}
+        self.error = None
+        self.browser: Optional[BrowserSession] = None
+
+    @property
+    def reruns(self) -> List[float]:
+        return self.browser.reruns if self.browser else []
+
+    def step(self, name: str, fn) -> None:
+        t = time.perf_counter()
+        fn()
+        self.steps[name] = time.perf_counter() - t
+
+    def wait_job(self, result_key: str) -> None:
+        b = self.browser
+        b.wait_fragments()
+        if not any(f"regen_{result_key}_" in w.id for w in b.widgets("button")):
+            raise RuntimeError(f"{result_key}: sin resultado en la página")
+
+    # --- pasos ---
+    def load(self) -> None:
+        self.browser.rerun()
+
+    def datos(self) -> None:
+        b = self.browser
+        b.set(b.widget("checkbox", "Autorizo"), bool_value=True)
+        b.set(b.widget("text_input", "Nombre de la empresa"), string_value=self.name)
+        b.set(b.widget("text_input", "Nombre"), string_value="Participante")
+        b.rerun()
+
+    def sliders(self) -> None:
+        b = self.browser
+        for _ in range(self.args.slider_moves):
+            slider = self.rng.choice(b.widgets("slider"))
+            b.set(slider, double_array_value={"data": [float(self.rng.randint(1, 3))]})
+            if not slider.form_id:  # dentro de st.form el valor espera al envío
+                b.rerun()
+
+    def save(self) -> None:
+        self.browser.click(self.browser.widget("button", "Guardar respuestas"))
+
+    def recos(self) -> None:
+        self.browser.click(self.browser.widget("button", key="btn_gpt_recos"))
+        self.wait_job("gpt_analysis")
+
+    def site(self) -> None:
+        b = self.browser
+        b.set(b.widget("text_input", "Pega la URL"), string_value=self.site_url)
+        b.click(b.widget("button", key="btn_gpt_site"))
+        self.wait_job("site_analysis")
+
+    def report(self) -> None:
+        b = self.browser
+        b.click(b.widget("button", key="btn_prepare_report"))
+        data = b.download(b.widget("download_button", "Descargar reporte"))
+        if b"<html" not in data[:2000].lower():
+            raise RuntimeError(f"reporte inválido ({len(data)} bytes)")
+
+    def run(self, start: threading.Barrier) -> None:
+        start.wait()
+        try:
+            t = time.perf_counter()
+            with connect(self.base_url.replace("http", "ws", 1) + "/_stcore/stream", subprotocols=["streamlit"],
+                         open_timeout=self.args.timeout, max_size=None) as ws:
+                self.browser = BrowserSession(ws, self.base_url, self.args.timeout)
+                self.steps["connect"] = time.perf_counter() - t
+                for name in STEPS:
+                    self.step(name, getattr(self, name))
+        except Exception as ex:
+            self.error = f"{type(ex).__name__}: {ex}"
+            if self.args.verbose:
+                traceback.print_exc()
+
+
+def percentiles(samples: List[float]) -> dict:
+    if not samples:
+        return {"n": 0}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {"n": len(samples), "p50_ms": round(1000 * p50, 1), "p95_ms": round(1000 * p95, 1),
+            "p99_ms": round(1000 * p99, 1), "max_ms": round(1000 * max(samples), 1),
+            "mean_ms": round(1000 * statistics.fmean(samples), 1)}
+
+
+def run_level(n: int, base_url: str, site_url: str, args: argparse.Namespace, trace_path: str) -> dict:
+    since = time.time()
+    flows = [SessionFlow(f"Empresa carga {n}-{i}", base_url, site_url, args, seed=1000 * n + i) for i in range(n)]
+    start = threading.Barrier(n + 1)
+    threads = [threading.Thread(target=f.run, args=(start,), name=f"sesion-{i}", daemon=True)
+               for i, f in enumerate(flows)]
+    for t in threads:
+        t.start()
+    start.wait()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    ok = [f for f in flows if f.error is None]
+    by_step = defaultdict(list)
+    for f in flows:
+        for name, secs in f.steps.items():
+            by_step[name].append(secs)
+    reruns = [r for f in flows for r in f.reruns]
+    return {
+        "sessions": n, "completed": len(ok), "errors": sorted({f.error for f in flows if f.error}),
+        "wall_s": round(wall, 2), "flows_per_min": round(60 * len(ok) / wall, 1) if wall else None,
+        "reruns_per_s": round(len(reruns) / wall, 1) if wall else None,
+        "steps": {name: percentiles(by_step[name]) for name in ("connect",) + STEPS},
+        "rerun": percentiles(reruns),
+        "server_spans": {k: {m: round(v, 1) if isinstance(v, float) else v for m, v in s.items()}
+                         for k, s in tracing.summarize(tracing.read_spans(trace_path, since)).items()}
+        if os.path.exists(trace_path) else {},
+    }
+
+
+def print_level(r: dict) -> None:
+    print(f"\n== {r['sessions']} sesiones: {r['completed']} completas en {r['wall_s']} s · "
+          f"{r['flows_per_min']} flujos/min · {r['reruns_per_s']} reruns/s", file=sys.stderr)
+    for err in r["errors"]:
+        print(f"   error: {err}", file=sys.stderr)
+    print(f"   {'paso':<10} {'n':>5} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} {'máx (ms)':>10}",
+          file=sys.stderr)
+    for name, s in list(r["steps"].items()) + [("rerun", r["rerun"])]:
+        if s["n"]:
+            print(f"   {name:<10} {s['n']:>5} {s['p50_ms']:>10.1f} {s['p95_ms']:>10.1f} {s['p99_ms']:>10.1f} "
+                  f"{s['max_ms']:>10.1f}", file=sys.stderr)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 20], help="niveles de concurrencia")
+    ap.add_argument("--latency-ms", type=float, default=800, help="mock OpenAI: tiempo hasta el primer token")
+    ap.add_argument("--chunk-ms", type=float, default=20, help="mock OpenAI: pausa entre fragmentos")
+    ap.add_argument("--job-workers", type=int, default=4, help="JOB_WORKERS de la app")
+    ap.add_argument("--rpm", type=float, default=0, help="OPENAI_RPM de la app (0 = sin límite)")
+    ap.add_argument("--form-mode", default="auto", choices=("auto", "full", "paged"), help="FORM_MODE de la app")
+    ap.add_argument("--slider-moves", type=int, default=5, help="sliders que mueve cada sesión")
+    ap.add_argument("--poll-s", type=float, default=0.25, help="JOB_POLL_S de la app (intervalo de watch_job)")
+    ap.add_argument("--timeout", type=float, default=120)
+    ap.add_argument("--page", default="home_pyme.html", help="página de benchmarks/fixtures a analizar")
+    ap.add_argument("--out", help="archivo JSON con los resultados")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args()
+    if connect is None:
+        sys.exit("Esta prueba necesita el paquete 'websockets' (pip install websockets).")
+
+    mock = MockOpenAI(latency_ms=args.latency_ms, chunk_ms=args.chunk_ms).start()
+    site = fixture_site()
+    site_url = f"http://127.0.0.1:{site.server_address[1]}/{args.page}"
+    results = {"env": environment(), "config": {k: v for k, v in vars(args).items() if k != "out"}, "levels": []}
+    server = None
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            trace_path = os.path.join(tmp, "traces.jsonl")
+            secrets_path = os.path.join(tmp, "secrets.toml")
+            write_secrets(secrets_path, {
+                "OPENAI_API_KEY": "sk-load-test", "OPENAI_RPM": args.rpm, "OPENAI_TPM": 0,
+                "JOB_WORKERS": args.job_workers, "JOB_POLL_S": args.poll_s, "FORM_MODE": args.form_mode,
+                "JOB_QUEUE_DB": os.path.join(tmp, "jobs.sqlite3"), "OUTBOX_DB": os.path.join(tmp, "outbox.sqlite3"),
+                "SUBMISSIONS_DB": os.path.join(tmp, "submissions.sqlite3"),
+                "FORM_CACHE_DIR": os.path.join(tmp, "forms"), "TRACE_FILE": trace_path,
+                "GPT_CACHE_DIR": "", "SITE_CACHE_DIR": "",
+            })
+            port = free_port()
+            log_path = os.path.join(tmp, "streamlit.log")
+            server = start_server(port, secrets_path, log_path, {"OPENAI_BASE_URL": mock.base_url})
+            base_url = f"http://127.0.0.1:{port}"
+            for n in args.sessions:
+                print(f"nivel: {n} sesiones…", file=sys.stderr)
+                level = run_level(n, base_url, site_url, args, trace_path)
+                results["levels"].append(level)
+                print_level(level)
+            results["openai_requests"] = mock.requests
+            server.terminate()
+            server.wait(timeout=30)
+    finally:
+        if server is not None and server.poll() is None:
+            server.kill()
+        mock.shutdown()
+        site.shutdown()
+
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Servidor local compatible con la API de OpenAI (chat.completions) y sitio de prueba.
+
+Uso:  python -m benchmarks.mock_openai [--port 8001] [--latency-ms 800] [--chunk-ms 20] [--chunks 40]
+      (y en la app: OPENAI_BASE_URL=http://127.0.0.1:8001/v1)
+
+Responde con streaming (SSE, con el bloque final de ``usage`` si se pide
+``stream_options``) o sin él. Con ``response_format`` de tipo ``json_schema`` genera
+un JSON que cumple el esquema; sin él, viñetas en markdown. La latencia es
+configurable: ``latency_ms`` hasta el primer token (con jitter) y ``chunk_ms`` entre
+fragmentos. ``fixture_site`` sirve ``benchmarks/fixtures`` por HTTP para el análisis
+del sitio.
+"""
+import argparse
+import functools
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def sample_json(schema: dict, name: str = "elemento", n_items: int = 3, _i: int = 0) -> object:
+    """Instancia de un esquema JSON (objetos, arreglos, enums y strings)."""
+    kind = schema.get("type")
+    if kind == "object":
+        return {k: sample_json(v, k, n_items, _i) for k, v in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [sample_json(schema.get("items", {}), name, n_items, i) for i in range(n_items)]
+    if "enum" in schema:
+        return schema["enum"][_i % len(schema["enum"])]
+    return f"{name.capitalize()} de prueba {_i + 1}: texto sintético para medir el flujo completo."
+
+
+def completion_text(body: dict, n_chunks: int) -> str:
+    fmt = body.get("response_format") or {}
+    if fmt.get("type") == "json_schema":
+        return json.dumps(sample_json(fmt["json_schema"]["schema"]), ensure_ascii=False)
+    return "\n".join(f"- **Punto {i + 1}**: recomendación sintética del servidor de prueba." for i in range(n_chunks // 4 or 1))
+
+
+def split_chunks(text: str, n: int) -> list:
+    size = max(1, -(-len(text) // max(1, n)))
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class MockOpenAI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency_ms: float = 800, jitter: float = 0.25, chunk_ms: float = 20,
+                 chunks: int = 40):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency_s = latency_ms / 1000
+        self.jitter = jitter
+        self.chunk_s = chunk_ms / 1000
+        self.chunks = chunks
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def first_token_delay(self) -> float:
+        return max(0.0, self.latency_s * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def start(self) -> "MockOpenAI":
+        threading.Thread(target=self.serve_forever, name="mock-openai", daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MockOpenAI
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _json(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": f"ruta no soportada: {self.path}"}})
+            return
+        srv = self.server
+        with srv._lock:
+            srv.requests += 1
+        text = completion_text(body, srv.chunks)
+        prompt_tokens = len(json.dumps(body.get("messages", []), ensure_ascii=False)) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 4,
+                 "total_tokens": prompt_tokens + len(text) // 4}
+        base = {"id": "chatcmpl-mock", "created": int(time.time()), "model": body.get("model", "mock")}
+        time.sleep(srv.first_token_delay())
+
+        if not body.get("stream"):
+            time.sleep(srv.chunk_s * srv.chunks)
+            self._json(200, {**base, "object": "chat.completion", "usage": usage, "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}]})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def send(payload: dict) -> None:
+            self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        for i, piece in enumerate(split_chunks(text, srv.chunks)):
+            if i:
+                time.sleep(srv.chunk_s)
+            send({**base, "object": "chat.completion.chunk",
+                  "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+        send({**base, "object": "chat.completion.chunk",
+              "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (body.get("stream_options") or {}).get("include_usage"):
+            send({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+class _QuietFiles(SimpleHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+
+def fixture_site(port: int = 0, directory: Optional[str] = None) -> ThreadingHTTPServer:
+    """Servidor HTTP (en segundo plano) de las páginas guardadas; la URL base es ``http://127.0.0.1:<puerto>/``."""
+    handler = functools.partial(_QuietFiles, directory=directory or FIXTURES)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fixture-site", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--port", type=int, default=8001)
+    ap.add_argument("--latency-ms", type=float, default=800, help="tiempo hasta el primer token")
+    ap.add_argument("--jitter", type=float, default=0.25, help="variación relativa de la latencia (±)")
+    ap.add_argument("--chunk-ms", type=float, default=20, help="pausa entre fragmentos del streaming")
+    ap.add_argument("--chunks", type=int, default=40)
+    ap.add_argument("--site-port", type=int, default=0, help="si > 0, sirve también benchmarks/fixtures")
+    args = ap.parse_args()
+    if args.site_port:
+        fixture_site(args.site_port)
+        print(f"sitio de prueba: http://127.0.0.1:{args.site_port}/home_pyme.html")
+    server = MockOpenAI(args.port, args.latency_ms, args.jitter, args.chunk_ms, args.chunks)
+    print(f"OPENAI_BASE_URL={server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Latencia de rerun del cuestionario: modo lista vs. paginado por categoría.
+
+Uso:  python -m benchmarks.paged_form [--questions 15 100 400 1000] [--reruns 5]
+
+Genera un Formulario.xlsx sintético en un directorio temporal, ejecuta la app V2 con
+``streamlit.testing`` (sin navegador ni OpenAI) y mide el tiempo de un rerun y el
+número de elementos enviados al navegador.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app_streamlit_formulario_radar_gpt_V2.py")
+
+
+def write_form(path: str, n_questions: int, per_category: int = 10) -> None:
+    rows = [
+        {"Categoría": f"Categoría {i // per_category + 1}", "Pregunta": f"¿Pregunta sintética número {i + 1}?",
+         "Calificación": None}
+        for i in range(n_questions)
+    ]
+    pd.DataFrame(rows).to_excel(path, sheet_name="Formulario", index=False)
+
+
+def rerun_latency(tmp: str, mode: str, reruns: int) -> dict:
+    st.cache_resource.clear()  # los recursos compartidos apuntan al directorio temporal de esta corrida
+    at = AppTest.from_file(APP, default_timeout=300)
+    at.secrets["OPENAI_API_KEY"] = "sk-bench"
+    at.secrets["FORM_MODE"] = mode
+    at.secrets["SITE_CACHE_DIR"] = ""
+    for name, rel in (("FORM_CACHE_DIR", "forms"), ("SUBMISSIONS_DB", "submissions.sqlite3"),
+                      ("JOB_QUEUE_DB", "jobs.sqlite3"), ("OUTBOX_DB", "outbox.sqlite3"),
+                      ("TRACE_FILE", "traces.jsonl")):
+        at.secrets[name] = os.path.join(tmp, rel)
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    times = []
+    for _ in range(reruns):
+        t = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - t)
+    times.sort()
+    return {"ms_median": 1000 * times[len(times) // 2], "sliders": len(at.slider)}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--questions", type=int, nargs="+", default=[15, 100, 400, 1000])
+    ap.add_argument("--reruns", type=int, default=5)
+    args = ap.parse_args()
+
+    cwd = os.getcwd()
+    print(f"{'preguntas':>9} {'modo':<6} {'ms/rerun':>9} {'sliders':>8}")
+    try:
+        for n in args.questions:
+            with tempfile.TemporaryDirectory() as tmp:
+                write_form(os.path.join(tmp, "Formulario.xlsx"), n)
+                os.chdir(tmp)
+                for mode in ("full", "paged"):
+                    r = rerun_latency(tmp, mode, args.reruns)
+                    print(f"{n:>9} {mode:<6} {r['ms_median']:>9.1f} {r['sliders']:>8}")
+                os.chdir(cwd)
+    finally:
+        os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
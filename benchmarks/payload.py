@@ -0,0 +1,104 @@
+"""Memoria pico y bytes enviados por entrega al Web App: JSON con base64 (antes) vs. streaming/gzip.
+
+Uso:  python -m benchmarks.payload [--radar svg plotly] [--repeat 3]
+
+Arma un reporte como el de la app (tabla de respuestas + radar SVG o plotly con
+plotly.js embebido) y mide, a partir de ``html_bytes``, cuánto cuesta producir el
+cuerpo de la solicitud: el camino anterior (``base64`` → ``json.dumps`` →
+``.encode()``, lo mismo que hace ``requests.post(json=...)``) y ``JsonPayload``
+sin y con gzip. Los bloques se consumen y descartan, como al enviarlos por el socket.
+"""
+import argparse
+import base64
+import gzip
+import json
+import time
+import tracemalloc
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from radar.payload import JsonPayload, gzip_bytes
+from radar.radar_svg import radar_svg
+from radar.report import answers_table_html, build_report_html
+
+META = {"token": "x" * 32, "folderId": "1AbC", "filename": "diagnostico_reporte.html"}
+CATEGORIES = ["Estrategia digital", "Marketing", "Ventas", "Servicio al cliente", "Datos y analítica", "Tecnología"]
+
+
+def make_report(radar: str) -> bytes:
+    rows = [{"Categoría": c, "Pregunta": f"¿Pregunta {i} de {c}?", "Calificación": 1 + i % 3, "Peso": 1.0}
+            for c in CATEGORIES for i in range(10)]
+    values = [1.5, 2.0, 2.5, 1.0, 3.0, 2.2]
+    if radar == "plotly":
+        fig = go.Figure(data=[go.Scatterpolar(r=values + values[:1], theta=CATEGORIES + CATEGORIES[:1], fill="toself")])
+        radar_html = fig.to_html(full_html=False, include_plotlyjs="inline")
+    else:
+        radar_html = radar_svg(CATEGORIES, values, max_value=3)
+    analysis = "\n".join(f"- Hallazgo {i}: texto de ejemplo con **énfasis**." for i in range(30))
+    html = build_report_html(
+        nombre="Ana", celular="300", empresa="Empresa", ventas_mes=1000000, habeas_aceptado=True,
+        table_html=answers_table_html(pd.DataFrame(rows)), radar_html=radar_html,
+        gpt_analysis=analysis, site_analysis=analysis, site_url="https://example.com",
+    )
+    return html.encode("utf-8")
+
+
+def legacy_body(html_bytes: bytes) -> int:
+    payload = dict(META, content_b64=base64.b64encode(html_bytes).decode("utf-8"))
+    body = json.dumps(payload).encode("utf-8")
+    return len(body)
+
+
+def stream_body(html_bytes: bytes, compress: bool) -> int:
+    meta = dict(META, content_encoding="gzip") if compress else META
+    content = gzip_bytes(html_bytes) if compress else html_bytes
+    sent = 0
+    for chunk in JsonPayload(meta, "content_b64", content):
+        sent += len(chunk)
+    return sent
+
+
+def measure(fn, html_bytes: bytes, repeat: int) -> dict:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(html_bytes)
+        best = min(best, time.perf_counter() - t)
+    tracemalloc.start()
+    sent = fn(html_bytes)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": best, "peak_mb": peak / 1e6, "sent": sent}
+
+
+def check_roundtrip(html_bytes: bytes) -> bool:
+    body = b"".join(JsonPayload(dict(META, content_encoding="gzip"), "content_b64", gzip_bytes(html_bytes)))
+    data = json.loads(body)
+    return gzip.decompress(base64.b64decode(data["content_b64"])) == html_bytes
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--radar", nargs="+", default=["svg", "plotly"], choices=["svg", "plotly"])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    paths = {
+        "json+base64 (actual)": legacy_body,
+        "stream": lambda b: stream_body(b, compress=False),
+        "stream+gzip": lambda b: stream_body(b, compress=True),
+    }
+    print(f"{'reporte':>16} {'camino':<21} {'tiempo (ms)':>12} {'pico (MB)':>10} {'enviado (KB)':>13} {'vs. HTML':>9}")
+    for radar in args.radar:
+        html_bytes = make_report(radar)
+        assert check_roundtrip(html_bytes)
+        label = f"{radar} {len(html_bytes) / 1024:.0f}KB"
+        for name, fn in paths.items():
+            r = measure(fn, html_bytes, args.repeat)
+            print(f"{label:>16} {name:<21} {r['seconds'] * 1000:>12.1f} {r['peak_mb']:>10.2f} "
+                  f"{r['sent'] / 1024:>13.0f} {r['sent'] / len(html_bytes):>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
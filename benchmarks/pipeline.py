@@ -0,0 +1,224 @@
+"""Suite de rendimiento del pipeline del radar, sin Streamlit ni OpenAI.
+
+Uso:  python -m benchmarks.pipeline [--questions 20 200 2000] [--repeat 5] [--out resultados.json]
+                                    [--html pagina.html ...] [--compare anterior.json]
+
+Importa las funciones del núcleo (``radar.*``) y mide, para formularios sintéticos
+de N preguntas, el tiempo (mejor y mediana de ``--repeat`` corridas) y la memoria
+pico (``tracemalloc``) de cada etapa: lectura del Excel y del formulario compilado, puntajes (groupby de pandas
+y ``FormIndex``), etiquetas envueltas, radar (figura plotly y SVG), prompts, tabla y
+reporte HTML y ``md_to_html``. La extracción de texto del sitio se mide sobre las
+páginas guardadas en ``benchmarks/fixtures`` (más las de ``--html``) y una página
+sintética grande.
+
+El resultado es un JSON (a ``--out`` o a la salida estándar) con las versiones y el
+commit; con ``--compare`` se imprime además la razón contra una corrida anterior.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+import plotly
+import plotly.graph_objects as go
+
+from benchmarks.html_extract import make_page
+from radar.analysis import Analysis
+from radar.form import read_form
+from radar.form_compiler import CompiledForm, FormCompiler
+from radar.html_text import extract_blocks_stream, extract_text_fast
+from radar.prompts import build_recos_prompt, build_summary_text, build_worst_text
+from radar.radar_svg import radar_svg, wrap_label
+from radar.report import answers_table_html, build_report_html, md_to_html
+from radar.scoring import FormIndex
+from radar.site_fetch import extract_text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures")
+AREAS = ["Estrategia y modelo de negocio digital", "Marketing y presencia en línea", "Ventas y canales",
+         "Servicio al cliente", "Datos y analítica", "Tecnología e infraestructura", "Procesos internos",
+         "Talento y cultura digital"]
+
+
+def write_form(path: str, n_questions: int, per_category: int = 10, seed: int = 7) -> None:
+    """Formulario.xlsx sintético con calificaciones (1–3) y pesos, como lo deja un usuario."""
+    rng = np.random.default_rng(seed)
+    rows = [
+        {"Categoría": f"{AREAS[(i // per_category) % len(AREAS)]} {i // per_category + 1}",
+         "Pregunta": f"¿La empresa cuenta con la práctica sintética número {i + 1} documentada y en uso?",
+         "Calificación": int(rng.integers(1, 4)), "Peso": float(rng.choice([1.0, 1.0, 2.0]))}
+        for i in range(n_questions)
+    ]
+    pd.DataFrame(rows).to_excel(path, sheet_name="Formulario", index=False)
+
+
+def measure(fn: Callable, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"best_ms": round(1000 * min(samples), 3), "median_ms": round(1000 * statistics.median(samples), 3),
+            "peak_kb": round(peak / 1024, 1)}
+
+
+def groupby_scores(df: pd.DataFrame) -> tuple:
+    """El cálculo con pandas de la app original (promedio por categoría, conteos y peores 5)."""
+    by_cat = df.groupby("Categoría", dropna=False)["Calificación"].agg(["count", "mean"])
+    worst = df.sort_values("Calificación").head(5)
+    return by_cat, worst
+
+
+def radar_figure(labels: List[str], values: List[float]) -> go.Figure:
+    fig = go.Figure(data=[go.Scatterpolar(r=values + values[:1], theta=labels + labels[:1], fill="toself")])
+    fig.update_layout(polar=dict(radialaxis=dict(visible=True, range=[0, 3])), showlegend=False, height=600)
+    return fig
+
+
+def form_stages(n: int, tmp: str) -> Dict[str, Callable]:
+    """Etapas del pipeline para un formulario de ``n`` preguntas (las entradas se preparan una vez)."""
+    path = os.path.join(tmp, f"Formulario_{n}.xlsx")
+    write_form(path, n)
+    df = read_form(path)
+    compiler = FormCompiler(os.path.join(tmp, "forms"))
+    compiled = compiler.load(path)
+    sidecar = compiler.sidecar_path(compiled.name, compiled.source_hash)
+    index = FormIndex.from_frame(df)
+    scores = df["Calificación"].to_numpy(dtype=float)
+    result = index.score(scores)
+    labels = [wrap_label(c, 14) for c in result.categories]
+    values = [float(v) for v in result.category_means]
+    summary, worst_text = build_summary_text(result, empresa="Empresa"), build_worst_text(df, result)
+    bullets = "\n".join(f"- **Hallazgo {i}**: la categoría {c} tiene un promedio de {v:.2f}."
+                        for i, (c, v) in enumerate(zip(result.categories, values)))
+    analysis = Analysis("recos", {
+        "hallazgos": [f"{c}: {v:.2f}" for c, v in zip(result.categories, values)],
+        "recomendaciones": [{"accion": f"Mejorar {c}", "prioridad": "alta", "justificacion": "Promedio bajo"}
+                            for c in result.categories[:5]],
+        "riesgos": ["Pérdida de clientes", "Sobrecostos"],
+    })
+    table_html = answers_table_html(df)
+    svg = radar_svg(labels, values, max_value=3)
+
+    def report() -> str:
+        return build_report_html(nombre="Ana", celular="300", empresa="Empresa", ventas_mes=1000000,
+                                 habeas_aceptado=True, table_html=table_html, radar_html=svg,
+                                 gpt_analysis=analysis, site_analysis=bullets, site_url="https://example.com")
+
+    return {
+        "load_form": lambda: read_form(path),
+        "load_sidecar": lambda: CompiledForm.load(sidecar).index,
+        "score_groupby": lambda: groupby_scores(df),
+        "score_index": lambda: FormIndex.from_frame(df).score(scores),
+        "wrap_labels": lambda: [wrap_label(c, 14) for c in result.categories],
+        "radar_figure": lambda: radar_figure(labels, values),
+        "radar_svg": lambda: radar_svg(labels, values, max_value=3),
+        "prompt_recos": lambda: build_recos_prompt(build_summary_text(result, empresa="Empresa"),
+                                                   build_worst_text(df, result)),
+        "answers_table": lambda: answers_table_html(df),
+        "report_html": report,
+        "md_to_html": lambda: md_to_html(bullets),
+        "analysis_html": analysis.to_html,
+        "_inputs": {"categories": len(result.categories), "summary_chars": len(summary),
+                    "worst_chars": len(worst_text), "report_kb": round(len(report().encode("utf-8")) / 1024, 1)},
+    }
+
+
+def html_stages(paths: List[str], synthetic_mb: float) -> Dict[str, Dict[str, Callable]]:
+    pages = {os.path.basename(p): open(p, encoding="utf-8", errors="replace").read() for p in paths}
+    if synthetic_mb > 0:
+        pages[f"sintetica_{synthetic_mb:g}MB"] = make_page(synthetic_mb)
+    return {
+        name: {
+            "extract_bs4": lambda h=html: extract_text(h),
+            "extract_stream": lambda h=html: extract_text_fast(h),
+            "extract_blocks": lambda h=html: extract_blocks_stream([h], base_url="https://example.com"),
+            "_inputs": {"kb": round(len(html.encode("utf-8")) / 1024, 1)},
+        }
+        for name, html in pages.items()
+    }
+
+
+def run_group(stages: Dict[str, Callable], repeat: int) -> dict:
+    out = {"inputs": stages.pop("_inputs", {}), "stages": {}}
+    for name, fn in stages.items():
+        out["stages"][name] = measure(fn, repeat)
+    return out
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"), "commit": commit,
+        "python": platform.python_version(), "platform": platform.platform(),
+        "numpy": np.__version__, "pandas": pd.__version__, "plotly": plotly.__version__,
+    }
+
+
+def compare(current: dict, previous: dict) -> None:
+    """Razón actual/anterior de la mediana y del pico por etapa (>1 = más lento o más memoria)."""
+    print(f"{'grupo':<24} {'etapa':<16} {'mediana (ms)':>13} {'vs. antes':>10} {'pico (KB)':>11} {'vs. antes':>10}",
+          file=sys.stderr)
+    for section in ("forms", "html"):
+        for group, data in current[section].items():
+            before = previous.get(section, {}).get(group, {}).get("stages", {})
+            for stage, r in data["stages"].items():
+                b = before.get(stage)
+                t_ratio = f"{r['median_ms'] / b['median_ms']:.2f}x" if b and b["median_ms"] else "-"
+                m_ratio = f"{r['peak_kb'] / b['peak_kb']:.2f}x" if b and b["peak_kb"] else "-"
+                print(f"{group:<24} {stage:<16} {r['median_ms']:>13.3f} {t_ratio:>10} {r['peak_kb']:>11.1f} "
+                      f"{m_ratio:>10}", file=sys.stderr)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--questions", type=int, nargs="+", default=[20, 200, 2000])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--html", nargs="*", default=[], help="páginas HTML guardadas (además de benchmarks/fixtures)")
+    ap.add_argument("--synthetic-mb", type=float, default=2.0, help="página sintética grande (0 = sin ella)")
+    ap.add_argument("--out", help="archivo JSON de salida (por defecto, la salida estándar)")
+    ap.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    args = ap.parse_args()
+
+    results = {"env": environment(), "repeat": args.repeat, "forms": {}, "html": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.questions:
+            print(f"formulario de {n} preguntas…", file=sys.stderr)
+            results["forms"][f"q{n}"] = run_group(form_stages(n, tmp), args.repeat)
+    paths = sorted(glob.glob(os.path.join(FIXTURES, "*.html"))) + list(args.html)
+    for name, stages in html_stages(paths, args.synthetic_mb).items():
+        print(f"html {name}…", file=sys.stderr)
+        results["html"][name] = run_group(stages, args.repeat)
+
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            compare(results, json.load(fh))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Latencia de rerun con el reporte armado en cada rerun (antes) vs. diferido y memorizado.
+
+Uso:  python -m benchmarks.report_rerun [--questions 15 200] [--reruns 7]
+
+Ejecuta la app V2 con ``streamlit.testing`` en ambos modos de radar del reporte. En
+cada rerun cambia el análisis GPT guardado en la sesión (nueva llave de reporte) y se mide:
+
+- "diferido": el rerun; el reporte no se arma porque nadie lo pidió.
+- "render": armar el reporte de ese estado (lo que antes se sumaba a cada rerun).
+- "memo": pedirlo otra vez sin cambios (la llave no cambió; no se vuelve a armar).
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.paged_form import write_form
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app_streamlit_formulario_radar_gpt_V2.py")
+
+
+def measure(radar_mode: str, reruns: int, tmp: str) -> dict:
+    st.cache_data.clear()
+    st.cache_resource.clear()  # la cola de trabajos apunta al directorio temporal de esta corrida
+    at = AppTest.from_file(APP, default_timeout=300)
+    at.secrets["OPENAI_API_KEY"] = "sk-bench"
+    at.secrets["FORM_MODE"] = "full"
+    at.secrets["SITE_CACHE_DIR"] = ""
+    at.secrets["REPORT_RADAR_MODE"] = radar_mode
+    at.secrets["JOB_QUEUE_DB"] = os.path.join(tmp, "jobs.sqlite3")
+    at.run()
+    at.checkbox[0].check().run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+    lazy, render, memo = [], [], []
+    for i in range(reruns):
+        at.session_state.gpt_analysis = f"- Hallazgo de la corrida {i}"
+        t = time.perf_counter()
+        at.run()
+        lazy.append(time.perf_counter() - t)
+        report = at.session_state.report_memo
+        for samples in (render, memo):
+            t = time.perf_counter()
+            report.get()
+            samples.append(time.perf_counter() - t)
+    report = at.session_state.report_memo
+    return {
+        "diferido": 1000 * statistics.median(lazy),
+        "render": 1000 * statistics.median(render),
+        "memo": 1000 * statistics.median(memo),
+        "renders": report.renders,
+        "kb": len(report.data or b"") / 1024,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--questions", type=int, nargs="+", default=[15, 200])
+    ap.add_argument("--reruns", type=int, default=7)
+    args = ap.parse_args()
+
+    cwd = os.getcwd()
+    print(f"{'preguntas':>9} {'radar':<7} {'reporte (KB)':>12} {'antes (ms)':>11} {'diferido (ms)':>14} "
+          f"{'render (ms)':>12} {'memo (ms)':>10} {'renders':>8}")
+    try:
+        for n in args.questions:
+            with tempfile.TemporaryDirectory() as tmp:
+                write_form(os.path.join(tmp, "Formulario.xlsx"), n)
+                os.chdir(tmp)
+                for mode in ("svg", "plotly"):
+                    r = measure(mode, args.reruns, tmp)
+                    print(f"{n:>9} {mode:<7} {r['kb']:>12.0f} {r['diferido'] + r['render']:>11.1f} "
+                          f"{r['diferido']:>14.1f} {r['render']:>12.1f} {r['memo']:>10.3f} "
+                          f"{r['renders']:>5}/{args.reruns}")
+                os.chdir(cwd)
+    finally:
+        os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
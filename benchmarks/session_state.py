@@ -0,0 +1,108 @@
+"""Memoria por sesión: DataFrame por sesión (antes) vs. int8 + formulario compartido (ahora).
+
+Uso:  python -m benchmarks.session_state [--sessions 100 1000] [--form Formulario.xlsx] [--questions 200]
+
+Simula N sesiones con lo que cada una deja en ``st.session_state`` y mide con
+``tracemalloc`` los bytes retenidos por sesión:
+
+- antes: ``df_form`` propio (``st.cache_data`` entrega una copia deserializada por
+  sesión, con sus propios textos) y un ``FormIndex`` propio;
+- ahora: calificaciones int8 (las guardadas y las del cuestionario paginado) y una
+  referencia al ``CompiledForm`` compartido, que se cuenta una sola vez.
+
+Mide también lo que asigna un rerun: antes ``df_form.copy()`` y ``df_calc``; ahora el
+vector int8 (la tabla solo se arma al generar el reporte o el prompt).
+Se mide el libro de ``--form`` (por defecto Formulario.xlsx; vacío para omitirlo) y,
+además, formularios sintéticos con los tamaños de ``--questions``.
+"""
+import argparse
+import gc
+import os
+import pickle
+import tempfile
+import tracemalloc
+from typing import Callable, List
+
+import numpy as np
+
+from benchmarks.pipeline import ROOT, write_form
+from radar.form_compiler import FormCompiler
+from radar.scoring import FormIndex
+
+
+def traced(fn: Callable) -> tuple:
+    """(resultado, bytes retenidos, pico) de ``fn``."""
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak
+
+
+def sessions_before(df_bytes: bytes, n: int) -> List[dict]:
+    sessions = []
+    for _ in range(n):
+        df = pickle.loads(df_bytes)
+        sessions.append({"df_form": df, "form_index": FormIndex.from_frame(df)})
+    return sessions
+
+
+def sessions_after(form, n: int) -> List[dict]:
+    form.index, form.question_categories  # se crean una vez; cada sesión solo guarda la referencia
+    return [{"form": form, "saved_scores": form.initial_scores(), "form_scores": form.initial_scores()}
+            for _ in range(n)]
+
+
+def rerun_before(session: dict, scores: np.ndarray) -> None:
+    df_form = session["df_form"].copy()
+    df_calc = df_form.copy()
+    df_calc["Calificación"] = scores.astype(float)
+    session["form_index"].score(scores)
+
+
+def rerun_after(session: dict, scores: np.ndarray) -> None:
+    score_vec = np.asarray(scores, dtype=np.int8).copy()
+    session["form"].index.score(score_vec)
+
+
+def run(path: str, n_sessions: List[int], tmp: str) -> dict:
+    form = FormCompiler(os.path.join(tmp, "forms")).load(path)
+    df_bytes = pickle.dumps(form.to_frame())
+    scores = form.initial_scores()
+    out = {"questions": form.n_questions, "sessions": {}}
+    for n in n_sessions:
+        _, before, _ = traced(lambda: sessions_before(df_bytes, n))
+        # El formulario compartido se carga dentro de la medición: su costo se reparte entre las N sesiones
+        _, after, _ = traced(lambda: sessions_after(FormCompiler(os.path.join(tmp, "forms")).load(path), n))
+        out["sessions"][n] = {"before_b": before / n, "after_b": after / n}
+    sess_b, sess_a = sessions_before(df_bytes, 1)[0], sessions_after(form, 1)[0]
+    out["rerun_before_peak_b"] = traced(lambda: rerun_before(sess_b, scores))[2]
+    out["rerun_after_peak_b"] = traced(lambda: rerun_after(sess_a, scores))[2]
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sessions", type=int, nargs="+", default=[100, 1000])
+    ap.add_argument("--form", default=os.path.join(ROOT, "Formulario.xlsx"), help="libro real a medir (vacío = ninguno)")
+    ap.add_argument("--questions", type=int, nargs="*", default=[200], help="tamaños de formularios sintéticos")
+    args = ap.parse_args()
+
+    print(f"{'formulario':<18} {'preguntas':>9} {'sesiones':>8} {'antes (B/sesión)':>17} {'ahora (B/sesión)':>17} {'razón':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [args.form] if args.form else []
+        for q in args.questions:
+            paths.append(os.path.join(tmp, f"Formulario_{q}.xlsx"))
+            write_form(paths[-1], q)
+        for path in paths:
+            r = run(path, args.sessions, tmp)
+            for n, m in r["sessions"].items():
+                print(f"{os.path.basename(path):<18} {r['questions']:>9} {n:>8} {m['before_b']:>17,.0f} {m['after_b']:>17,.0f} "
+                      f"{m['before_b'] / m['after_b']:>6.1f}x")
+            print(f"{'':<18} {'':>9} {'rerun':>8} {r['rerun_before_peak_b']:>17,.0f} {r['rerun_after_peak_b']:>17,.0f} "
+                  f"{r['rerun_before_peak_b'] / r['rerun_after_peak_b']:>6.1f}x   (pico asignado por rerun)")
+
+
+if __name__ == "__main__":
+    main()
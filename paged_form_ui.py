@@ -0,0 +1,103 @@
+"""Cuestionario paginado por categoría (modo asistente).
+
+En el modo lista cada rerun construye un slider por pregunta, así que el costo del
+rerun y del payload por websocket crece con el número de preguntas. Aquí solo se
+construyen los widgets de la categoría activa; las respuestas de las demás viven en
+un arreglo compacto en ``st.session_state`` (int8 + bool de "respondida"). Las
+categorías y preguntas llegan del formulario compartido, sin DataFrame por sesión.
+
+Es código de interfaz (Streamlit), por eso vive junto a las apps y no en ``radar``;
+la agrupación por categoría (``radar.form.category_groups``) sí es del paquete.
+"""
+import hashlib
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import streamlit as st
+
+from radar.form import category_groups
+
+
+def _store_keys(prefix: str) -> Tuple[str, str, str]:
+    return f"{prefix}_scores", f"{prefix}_answered", f"{prefix}_page"
+
+
+def form_version(categories: Sequence, questions: Sequence[str]) -> str:
+    """Hash del contenido (categoría y pregunta de cada fila) para quien no tiene versión compilada."""
+    h = hashlib.sha256()
+    for c, q in zip(categories, questions):
+        h.update(f"{c}\x1f{q}\x1e".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def ensure_store(n: int, initial_scores: Sequence[int], prefix: str = "form", version: str = "") -> None:
+    """Crea (o reinicia si cambió el formulario: otra versión u otro tamaño) el almacén compacto de respuestas."""
+    k_scores, k_answered, k_page = _store_keys(prefix)
+    scores = st.session_state.get(k_scores)
+    if scores is None or len(scores) != n or st.session_state.get(f"{prefix}_version") != version:
+        for i in range(max(n, len(scores) if scores is not None else 0)):
+            st.session_state.pop(f"slider_{i}", None)  # los sliders toman el valor inicial del formulario nuevo
+        st.session_state[k_scores] = np.asarray(initial_scores, dtype=np.int8).copy()
+        st.session_state[k_answered] = np.zeros(n, dtype=bool)
+        st.session_state[k_page] = 0
+        st.session_state[f"{prefix}_version"] = version
+
+
+def confirm_page(categories: Sequence, prefix: str = "form") -> None:
+    """Marca como respondidas las preguntas de la sección activa (p. ej. al guardar)."""
+    k_scores, k_answered, k_page = _store_keys(prefix)
+    if k_answered in st.session_state:
+        _, groups = category_groups(categories)
+        if groups:
+            st.session_state[k_answered][groups[st.session_state.get(k_page, 0)]] = True
+
+
+def render_paged_form(categories: Sequence, questions: Sequence[str], initial_scores: Sequence[int],
+                      min_value: int, max_value: int, hint_html: str, prefix: str = "form",
+                      version: Optional[str] = None) -> np.ndarray:
+    """Pinta solo la categoría activa y devuelve el vector completo de calificaciones (int8).
+
+    ``categories`` y ``questions`` van por pregunta. Los sliders usan las mismas llaves
+    ``slider_{i}`` que el modo lista. Si cambia ``version`` (por defecto, el hash de
+    categorías y preguntas) las respuestas en curso se reinician.
+    """
+    n = len(questions)
+    categories = list(categories)
+    ensure_store(n, initial_scores, prefix, version if version is not None else form_version(categories, questions))
+    k_scores, k_answered, k_page = _store_keys(prefix)
+    scores, answered = st.session_state[k_scores], st.session_state[k_answered]
+    cats, groups = category_groups(categories)
+    if not cats:
+        return scores
+
+    def _on_slider(i: int) -> None:
+        scores[i] = st.session_state[f"slider_{i}"]
+        answered[i] = True
+
+    def _go(delta: int) -> None:
+        page = st.session_state[k_page]
+        answered[groups[page]] = True  # avanzar/retroceder confirma los valores de la sección
+        st.session_state[k_page] = min(max(page + delta, 0), len(cats) - 1)
+
+    done = int(answered.sum())
+    st.progress(done / n if n else 0.0, text=f"{done} de {n} preguntas respondidas")
+    labels = [f"{c} ({int(answered[idx].sum())}/{len(idx)})" for c, idx in zip(cats, groups)]
+    page = st.selectbox("Sección", options=list(range(len(cats))), format_func=lambda k: labels[k], key=k_page)
+
+    cat = cats[page]
+    for i in groups[page]:
+        i = int(i)
+        st.markdown(f"**{cat}** — {questions[i]}")
+        st.slider(" ", min_value=min_value, max_value=max_value, step=1, value=int(scores[i]),
+                  key=f"slider_{i}", on_change=_on_slider, args=(i,))
+        st.markdown(hint_html, unsafe_allow_html=True)
+        st.markdown("<hr>", unsafe_allow_html=True)
+
+    c_prev, c_next = st.columns([1, 1])
+    with c_prev:
+        st.button("← Sección anterior", key=f"{prefix}_prev", on_click=_go, args=(-1,),
+                  disabled=page == 0, use_container_width=True)
+    with c_next:
+        st.button("Siguiente sección →", key=f"{prefix}_next", on_click=_go, args=(1,),
+                  disabled=page == len(cats) - 1, use_container_width=True)
+    return scores
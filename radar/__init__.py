@@ -0,0 +1 @@
+"""Utilidades compartidas del Radar de madurez digital (sin dependencia de Streamlit)."""
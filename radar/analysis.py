@@ -0,0 +1,207 @@
+"""Salida estructurada (JSON schema) de los análisis GPT.
+
+Cada análisis es un conjunto fijo de secciones, y cada sección es una lista de
+elementos (texto u objetos con prioridad/impacto). La respuesta se valida y se
+parsea una sola vez en un ``Analysis``. Desde ese mismo objeto se pinta la app
+(markdown) y el reporte (HTML, sin pasar otra vez por markdown). Cada sección se
+puede guardar en caché y regenerar por separado con un esquema que solo la incluye a ella.
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from html import escape
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+ANALYSIS_SCHEMA_VERSION = "analysis-v1"  # súbelo si cambian las secciones o sus esquemas
+
+_STR = {"type": "string"}
+
+
+def _object(properties: dict) -> dict:
+    # Modo estricto de OpenAI: todas las propiedades requeridas y sin propiedades extra
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+
+@dataclass(frozen=True)
+class SectionSpec:
+    name: str
+    title: str
+    instruction: str                    # qué debe contener (va al prompt al regenerarla sola)
+    item_schema: dict = field(default_factory=lambda: dict(_STR))
+    fmt: Callable[[Union[str, dict]], str] = str    # elemento -> una línea de texto
+
+    @property
+    def schema(self) -> dict:
+        return {"type": "array", "items": self.item_schema}
+
+
+def _fmt_reco(item: dict) -> str:
+    return f"[{item['prioridad'].capitalize()}] {item['accion']} — {item['justificacion']}"
+
+
+def _fmt_signal(item: dict) -> str:
+    return f"{'✔' if item['tipo'] == 'alineado' else '✘'} {item['senal']}"
+
+
+def _fmt_action(item: dict) -> str:
+    return f"{item['accion']} (impacto {item['impacto']}, esfuerzo {item['esfuerzo']})"
+
+
+_LEVEL = {"type": "string", "enum": ["alta", "media", "baja"]}
+
+SECTIONS: Dict[str, Tuple[SectionSpec, ...]] = {
+    "recos": (
+        SectionSpec("hallazgos", "Hallazgos clave", "máximo 6 hallazgos, uno por elemento"),
+        SectionSpec("recomendaciones", "Recomendaciones priorizadas",
+                    "3 a 5 recomendaciones accionables, con prioridad y su justificación",
+                    _object({"accion": _STR, "prioridad": _LEVEL, "justificacion": _STR}), _fmt_reco),
+        SectionSpec("riesgos", "Riesgos si no se actúa", "máximo 5 riesgos"),
+    ),
+    "site": (
+        SectionSpec("alineacion", "Alineación con el diagnóstico",
+                    "señales de alineación o desalineación entre el diagnóstico y el sitio",
+                    _object({"senal": _STR, "tipo": {"type": "string", "enum": ["alineado", "desalineado"]}}),
+                    _fmt_signal),
+        SectionSpec("recomendaciones", "Recomendaciones de UX, contenido y confianza",
+                    "recomendaciones de UX, contenido y señales de confianza (trust signals)"),
+        SectionSpec("acciones_web", "Acciones web priorizadas",
+                    "5 acciones web ordenadas por impacto vs. esfuerzo",
+                    _object({"accion": _STR, "impacto": _LEVEL, "esfuerzo": _LEVEL}), _fmt_action),
+    ),
+}
+
+
+def section_spec(kind: str, name: str) -> SectionSpec:
+    for spec in SECTIONS[kind]:
+        if spec.name == name:
+            return spec
+    raise KeyError(f"{kind}: sección desconocida {name!r}")
+
+
+def response_format(kind: str, only: Optional[str] = None) -> dict:
+    """``response_format`` de chat.completions para el análisis completo o para una sola sección."""
+    specs = [section_spec(kind, only)] if only else SECTIONS[kind]
+    return {"type": "json_schema", "json_schema": {
+        "name": f"{kind}_{only}" if only else kind, "strict": True,
+        "schema": _object({s.name: s.schema for s in specs}),
+    }}
+
+
+class AnalysisError(ValueError):
+    """La respuesta no cumple el esquema (JSON inválido o sección faltante)."""
+
+
+def _check_items(spec: SectionSpec, items) -> list:
+    if not isinstance(items, list):
+        raise AnalysisError(f"la sección {spec.name!r} no es una lista")
+    keys = spec.item_schema.get("required")
+    for item in items:
+        ok = isinstance(item, dict) and all(isinstance(item.get(k), str) for k in keys) if keys else isinstance(item, str)
+        if not ok:
+            raise AnalysisError(f"elemento inválido en {spec.name!r}: {item!r}")
+    return items
+
+
+@dataclass(frozen=True)
+class Analysis:
+    kind: str
+    sections: Dict[str, list]
+
+    @classmethod
+    def parse(cls, kind: str, raw: str, only: Optional[str] = None) -> "Analysis":
+        """Valida la respuesta del modelo (JSON del esquema completo o de la sección ``only``)."""
+        try:
+            data = json.loads(raw)
+        except ValueError as ex:
+            raise AnalysisError(f"respuesta no es JSON: {ex}") from None
+        if not isinstance(data, dict):
+            raise AnalysisError("respuesta no es un objeto JSON")
+        specs = [section_spec(kind, only)] if only else SECTIONS[kind]
+        missing = [s.name for s in specs if s.name not in data]
+        if missing:
+            raise AnalysisError(f"faltan secciones: {', '.join(missing)}")
+        return cls(kind, {s.name: _check_items(s, data[s.name]) for s in specs})
+
+    # --- serialización (resultado de trabajos y caché) ---
+    def to_json(self) -> str:
+        return json.dumps({"kind": self.kind, "sections": self.sections}, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, text: str) -> "Analysis":
+        data = json.loads(text)
+        return cls(data["kind"], data["sections"])
+
+    def with_section(self, name: str, items: list) -> "Analysis":
+        return Analysis(self.kind, {**self.sections, name: items})
+
+    @property
+    def specs(self) -> Tuple[SectionSpec, ...]:
+        return SECTIONS[self.kind]
+
+    # --- render ---
+    def section_markdown(self, name: str) -> str:
+        spec = section_spec(self.kind, name)
+        items = self.sections.get(name) or []
+        return "\n".join(f"- {spec.fmt(item)}" for item in items) or "_Sin elementos._"
+
+    def to_markdown(self, exclude: Optional[str] = None) -> str:
+        return "\n\n".join(f"**{s.title}**\n\n{self.section_markdown(s.name)}"
+                           for s in self.specs if s.name != exclude)
+
+    def to_html(self) -> str:
+        parts = []
+        for s in self.specs:
+            items = "".join(f"<li>{escape(s.fmt(item))}</li>" for item in self.sections.get(s.name) or [])
+            parts.append(f"<h3>{escape(s.title)}</h3>\n<ul>{items}</ul>")
+        return "\n".join(parts)
+
+
+def load_analysis(value: Optional[str]) -> Union[Analysis, str, None]:
+    """Resultado guardado (trabajo o caché) → ``Analysis`` si es JSON de un análisis; si no, el texto tal cual."""
+    if value and value.lstrip().startswith("{"):
+        try:
+            return Analysis.from_json(value)
+        except (ValueError, KeyError, TypeError):
+            pass
+    return value
+
+
+def dump_analysis(value: Union[Analysis, str, None]) -> Optional[str]:
+    """Inverso de ``load_analysis``: ``Analysis`` → JSON; texto libre tal cual."""
+    return value.to_json() if isinstance(value, Analysis) else value
+
+
+def as_markdown(value: Union[Analysis, str, None]) -> str:
+    return value.to_markdown() if isinstance(value, Analysis) else (value or "")
+
+
+_TOKEN_RE = re.compile(r'"((?:[^"\\]|\\.)*)"(\s*:)?|[{}]')
+
+
+def preview_markdown(kind: str, partial: str) -> str:
+    """Vista previa de un JSON a medio llegar (streaming): títulos de sección y elementos ya completos."""
+    titles = {s.name: s.title for s in SECTIONS[kind]}
+    lines: List[str] = []
+    depth, item = 0, []
+    for m in _TOKEN_RE.finditer(partial):
+        tok = m.group(0)
+        if tok == "{":
+            depth += 1
+        elif tok == "}":
+            if depth == 2 and item:
+                lines.append("- " + " · ".join(item))
+                item = []
+            depth -= 1
+        elif m.group(2):  # llave
+            if depth == 1 and m.group(1) in titles:
+                lines.append(f"\n**{titles[m.group(1)]}**\n")
+        else:
+            try:
+                text = json.loads(f'"{m.group(1)}"')
+            except ValueError:
+                text = m.group(1)
+            if depth >= 2:
+                item.append(text)
+            else:
+                lines.append(f"- {text}")
+    return "\n".join(lines).strip()
@@ -0,0 +1,70 @@
+"""Registro de imágenes de marca (logos, fondo) compartido por todo el proceso.
+
+Cada archivo se lee una sola vez y se guarda como data-URI con sus bytes originales
+(sin decodificar/recodificar con PIL). En cada rerun solo se hace un ``os.stat``: si
+cambió el mtime o el tamaño del archivo, se vuelve a leer.
+"""
+import base64
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+_MAGIC_MIME = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+    (b"RIFF", "image/webp"),
+    (b"<svg", "image/svg+xml"),
+    (b"<?xml", "image/svg+xml"),
+)
+_EXT_MIME = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg",
+             ".gif": "image/gif", ".webp": "image/webp", ".svg": "image/svg+xml"}
+
+
+def sniff_mime(data: bytes, path: str = "") -> str:
+    """Tipo MIME por la firma del archivo (más fiable que la extensión); si no, por extensión."""
+    for magic, mime in _MAGIC_MIME:
+        if data.startswith(magic):
+            return mime
+    return _EXT_MIME.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+
+
+class AssetRegistry:
+    """Caché de data-URIs por ruta, invalidada por (mtime, tamaño) del archivo."""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Tuple[int, int], str, str]] = {}  # path -> (firma, b64, data_uri)
+        self._lock = threading.Lock()
+        self.loads = 0  # lecturas reales de disco (para medir)
+
+    def _get(self, path: str) -> Optional[Tuple[Tuple[int, int], str, str]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        sig = (st.st_mtime_ns, st.st_size)
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == sig:
+            return entry
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == sig:
+                return entry
+            try:
+                with open(path, "rb") as fh:
+                    data = fh.read()
+            except OSError:
+                return None
+            b64 = base64.b64encode(data).decode("ascii")
+            entry = (sig, b64, f"data:{sniff_mime(data, path)};base64,{b64}")
+            self._entries[path] = entry
+            self.loads += 1
+            return entry
+
+    def b64(self, path: str) -> Optional[str]:
+        entry = self._get(path)
+        return entry[1] if entry else None
+
+    def data_uri(self, path: str) -> Optional[str]:
+        entry = self._get(path)
+        return entry[2] if entry else None
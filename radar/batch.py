@@ -0,0 +1,329 @@
+"""Diagnóstico por lotes, sin Streamlit.
+
+Lee muchos envíos desde CSV o JSONL, los califica en bloque, genera el análisis GPT
+con un pool de hilos de concurrencia limitada y renderiza los reportes HTML en un
+pool de procesos. Se puede interrumpir y volver a lanzar: los envíos ya escritos en
+``<salida>/manifest.jsonl`` se saltan y los análisis GPT ya pagados se reutilizan
+desde la caché en disco ``<salida>/.gpt_cache``.
+
+Uso:
+    python -m radar.batch envios.csv [otros.jsonl ...] --out reportes/ [--concurrency 4] [--workers 4]
+
+Formato de entrada (mismas columnas que Formulario.xlsx, una fila por pregunta):
+    id, empresa, nombre, celular, ventas_mes, site_url, Categoría, Pregunta, Calificación[, Peso]
+Las filas se agrupan por ``id`` (o por ``empresa`` si no hay id). En JSONL cada línea
+puede ser una de esas filas o un envío completo con la lista ``respuestas``.
+
+La API se configura con OPENAI_API_KEY y, para un servidor compatible local,
+OPENAI_BASE_URL (p. ej. http://127.0.0.1:8000/v1).
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from radar.form import normalize_form_columns
+from radar.gpt_cache import RecommendationCache, make_cache_key
+from radar.gpt_client import RateLimitedClient
+from radar.prompts import (RECOS_PROMPT_TOKENS, RECOS_PROMPT_VERSION, build_recos_prompt, build_summary_text,
+                           build_worst_text)
+from radar.radar_svg import radar_svg, wrap_label
+from radar.report import answers_table_html, build_report_html
+from radar.scoring import FormIndex, ScoreResult
+from radar.submissions import SubmissionRecord, SubmissionStore, form_digest
+
+logger = logging.getLogger(__name__)
+
+META_FIELDS = ("id", "empresa", "nombre", "celular", "ventas_mes", "site_url")
+
+
+@dataclass
+class Submission:
+    id: str
+    form: pd.DataFrame
+    empresa: str = ""
+    nombre: str = ""
+    celular: str = ""
+    ventas_mes: str = ""
+    site_url: str = ""
+    result: Optional[ScoreResult] = field(default=None, repr=False)
+
+
+# =============================
+# LECTURA
+# =============================
+def _meta_column(columns: Iterable, name: str) -> Optional[str]:
+    aliases = {"ventas_mes": ("ventas",), "site_url": ("site_url", "sitio", "url"), "nombre": ("nombre",)}
+    for c in columns:
+        key = str(c).strip().lower()
+        if key == name or any(key.startswith(a) for a in aliases.get(name, ())):
+            return c
+    return None
+
+
+def _submissions_from_rows(rows: pd.DataFrame, source: str) -> List[Submission]:
+    meta_cols = {f: _meta_column(rows.columns, f) for f in META_FIELDS}
+    group_col = meta_cols["id"] or meta_cols["empresa"]
+    if group_col is None:
+        raise ValueError(f"{source}: se necesita una columna 'id' o 'empresa' para agrupar los envíos.")
+    subs = []
+    for key, g in rows.groupby(group_col, sort=False):
+        first = g.iloc[0]
+        meta = {f: ("" if c is None or pd.isna(first[c]) else str(first[c])) for f, c in meta_cols.items()}
+        subs.append(Submission(
+            id=str(key), form=normalize_form_columns(g.drop(columns=[c for c in meta_cols.values() if c])),
+            **{f: meta[f] for f in META_FIELDS if f != "id"},
+        ))
+    return subs
+
+
+def read_submissions(path: str) -> List[Submission]:
+    if path.lower().endswith((".jsonl", ".ndjson")):
+        flat, nested = [], []
+        with open(path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                obj = json.loads(line)
+                if isinstance(obj.get("respuestas"), list):
+                    nested.append(obj)
+                else:
+                    flat.append(obj)
+        subs = _submissions_from_rows(pd.DataFrame(flat), path) if flat else []
+        for i, obj in enumerate(nested):
+            subs.append(Submission(
+                id=str(obj.get("id") or obj.get("empresa") or f"{os.path.basename(path)}-{i + 1}"),
+                form=normalize_form_columns(pd.DataFrame(obj["respuestas"])),
+                **{f: str(obj.get(f) or "") for f in META_FIELDS if f != "id"},
+            ))
+        return subs
+    return _submissions_from_rows(pd.read_csv(path), path)
+
+
+# =============================
+# CALIFICACIÓN EN BLOQUE
+# =============================
+def score_submissions(subs: List[Submission]) -> None:
+    """Califica todos los envíos; los que comparten formulario se calculan en una sola matriz."""
+    layouts: Dict[tuple, List[Submission]] = {}
+    for s in subs:
+        s.form["Calificación"] = pd.to_numeric(s.form["Calificación"], errors="coerce").fillna(2).clip(1, 3).astype(float)
+        key = (tuple(s.form["Categoría"].astype(str)), tuple(s.form["Peso"].astype(float)))
+        layouts.setdefault(key, []).append(s)
+    for group in layouts.values():
+        index = FormIndex.from_frame(group[0].form)
+        batch = index.score(np.vstack([s.form["Calificación"].to_numpy() for s in group]))
+        for i, s in enumerate(group):
+            s.result = batch.row(i)
+
+
+# =============================
+# RENDER (se ejecuta en otro proceso: solo datos simples)
+# =============================
+def render_report(payload: dict) -> dict:
+    form = pd.DataFrame(payload["rows"])
+    labels = [wrap_label(c, 14) for c in payload["categories"]]
+    html = build_report_html(
+        nombre=payload["nombre"], celular=payload["celular"], empresa=payload["empresa"],
+        ventas_mes=payload["ventas_mes"], habeas_aceptado=True,
+        table_html=answers_table_html(form),
+        radar_html=radar_svg(labels, payload["values"], max_value=3),
+        gpt_analysis=payload["analysis"], site_analysis=None, site_url=payload["site_url"],
+    )
+    data = html.encode("utf-8")
+    tmp = payload["path"] + ".tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, payload["path"])
+    return {"id": payload["id"], "path": payload["path"], "bytes": len(data)}
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^\w-]+", "_", text, flags=re.UNICODE).strip("_")[:80] or "envio"
+
+
+# =============================
+# ORQUESTACIÓN
+# =============================
+class Manifest:
+    """Registro append-only de envíos terminados (permite reanudar)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # línea truncada por una interrupción
+                    if rec.get("status") == "ok" and os.path.exists(rec.get("file", "")):
+                        self.done[rec["id"]] = rec
+
+    def append(self, rec: dict) -> None:
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        if rec.get("status") == "ok":
+            self.done[rec["id"]] = rec
+
+
+def store_submissions(store: SubmissionStore, subs: List[Submission], analyses: Dict[str, Optional[str]]) -> int:
+    """Guarda los envíos calificados en el almacén SQLite (una transacción)."""
+    records = []
+    for s in subs:
+        form_id = form_digest(s.form["Categoría"], s.form["Pregunta"], s.form["Peso"])
+        store.register_form(form_id, s.form["Categoría"], s.form["Pregunta"], s.result.categories)
+        records.append(SubmissionRecord(
+            key=f"batch:{s.id}", form_id=form_id, source="batch",
+            scores=s.form["Calificación"].to_numpy(), category_means=s.result.category_means,
+            global_mean=float(s.result.global_mean), empresa=s.empresa, nombre=s.nombre, celular=s.celular,
+            ventas_mes=s.ventas_mes, site_url=s.site_url, habeas=True, gpt_analysis=analyses.get(s.id),
+        ))
+    return store.insert_many(records)
+
+
+def run_batch(inputs: List[str], out_dir: str, concurrency: int = 4, workers: Optional[int] = None,
+              model: str = "gpt-4o", temperature: float = 0.2, use_gpt: bool = True,
+              client=None, limit: Optional[int] = None, rpm: float = 500, tpm: float = 30000,
+              store_path: Optional[str] = None) -> dict:
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(out_dir, "manifest.jsonl"))
+    subs = [s for path in inputs for s in read_submissions(path)]
+    pending = [s for s in subs if s.id not in manifest.done]
+    skipped = len(subs) - len(pending)
+    if limit is not None:
+        pending = pending[:limit]
+    logger.info("%d envíos leídos, %d ya terminados, %d por procesar", len(subs), skipped, len(pending))
+    score_submissions(pending)
+    # Cada envío se guarda en cuanto su reporte queda escrito y antes de marcarlo en el
+    # manifest: una corrida interrumpida no deja envíos terminados fuera del almacén.
+    store = SubmissionStore(store_path) if store_path else None
+
+    cache = RecommendationCache(max_entries=max(256, len(pending)), ttl_seconds=0,
+                                persist_dir=os.path.join(out_dir, ".gpt_cache"))
+    if use_gpt and client is None:
+        from openai import OpenAI
+        client = RateLimitedClient(OpenAI(), rpm=rpm, tpm=tpm)
+
+    def analyze(s: Submission) -> Optional[str]:
+        if not use_gpt:
+            return None
+        summary = build_summary_text(s.result, empresa=s.empresa, nombre=s.nombre, celular=s.celular,
+                                     ventas_mes=s.ventas_mes)
+        worst_text = build_worst_text(s.form, s.result)
+        key = make_cache_key(summary, worst_text, RECOS_PROMPT_VERSION, RECOS_PROMPT_TOKENS, model, temperature)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        resp = client.chat.completions.create(
+            model=model, temperature=temperature,
+            messages=[{"role": "user", "content": build_recos_prompt(summary, worst_text, model=model).text}],
+        )
+        text = resp.choices[0].message.content
+        cache.put(key, text)
+        return text
+
+    t0 = time.perf_counter()
+    ok = errors = 0
+    analyses: Dict[str, Optional[str]] = {}
+    used_names = {os.path.basename(r["file"]) for r in manifest.done.values()}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as gpt_pool, \
+            ProcessPoolExecutor(max_workers=workers) as render_pool:
+        gpt_futs = {gpt_pool.submit(analyze, s): s for s in pending}
+        render_futs = {}
+        for fut in as_completed(gpt_futs):
+            s = gpt_futs[fut]
+            try:
+                analysis = fut.result()
+            except Exception as ex:
+                errors += 1
+                manifest.append({"id": s.id, "status": "error", "stage": "gpt", "error": str(ex), "ts": time.time()})
+                logger.warning("[%s] error GPT: %s", s.id, ex)
+                continue
+            analyses[s.id] = analysis
+            name = f"diagnostico_{_slug(s.id)}.html"
+            n = 2
+            while name in used_names:
+                name = f"diagnostico_{_slug(s.id)}_{n}.html"
+                n += 1
+            used_names.add(name)
+            payload = {
+                "id": s.id, "path": os.path.join(out_dir, name), "rows": s.form.to_dict("records"),
+                "categories": list(s.result.categories),
+                "values": np.round(s.result.category_means, 2).tolist(),
+                "analysis": analysis, "empresa": s.empresa, "nombre": s.nombre, "celular": s.celular,
+                "ventas_mes": s.ventas_mes, "site_url": s.site_url,
+            }
+            render_futs[render_pool.submit(render_report, payload)] = s
+        for fut in as_completed(render_futs):
+            s = render_futs[fut]
+            try:
+                res = fut.result()
+            except Exception as ex:
+                errors += 1
+                manifest.append({"id": s.id, "status": "error", "stage": "render", "error": str(ex), "ts": time.time()})
+                logger.warning("[%s] error al renderizar: %s", s.id, ex)
+                continue
+            if store is not None:
+                try:
+                    store_submissions(store, [s], analyses)
+                except Exception as ex:
+                    errors += 1
+                    manifest.append({"id": s.id, "status": "error", "stage": "store", "error": str(ex),
+                                     "ts": time.time()})
+                    logger.warning("[%s] error al guardar en el almacén: %s", s.id, ex)
+                    continue
+            ok += 1
+            manifest.append({"id": s.id, "status": "ok", "file": res["path"], "bytes": res["bytes"], "ts": time.time()})
+            elapsed = time.perf_counter() - t0
+            logger.info("[%d/%d] %s -> %s (%.1f reportes/min)", ok + errors, len(pending), s.id,
+                        os.path.basename(res["path"]), 60 * ok / elapsed if elapsed else 0.0)
+
+    elapsed = time.perf_counter() - t0
+    stats = {
+        "total": len(subs), "skipped": skipped, "ok": ok, "errors": errors,
+        "seconds": round(elapsed, 2), "reports_per_min": round(60 * ok / elapsed, 1) if elapsed else 0.0,
+        "gpt_cache": cache.stats(),
+    }
+    if isinstance(client, RateLimitedClient):
+        stats["api"] = client.stats()
+    logger.info("Listo: %s", stats)
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Genera reportes de diagnóstico por lotes (sin Streamlit).")
+    ap.add_argument("inputs", nargs="+", help="Archivos CSV o JSONL con los envíos")
+    ap.add_argument("--out", required=True, help="Directorio de salida (reportes + manifest.jsonl)")
+    ap.add_argument("--concurrency", type=int, default=4, help="Llamadas GPT simultáneas")
+    ap.add_argument("--workers", type=int, default=None, help="Procesos para renderizar reportes")
+    ap.add_argument("--model", default="gpt-4o")
+    ap.add_argument("--temperature", type=float, default=0.2)
+    ap.add_argument("--no-gpt", action="store_true", help="Solo puntajes y radar, sin análisis GPT")
+    ap.add_argument("--rpm", type=float, default=500, help="Límite de solicitudes/min a la API (0 = sin límite)")
+    ap.add_argument("--tpm", type=float, default=30000, help="Límite de tokens/min a la API (0 = sin límite)")
+    ap.add_argument("--limit", type=int, default=None, help="Procesa como máximo N envíos pendientes")
+    ap.add_argument("--store", default=None, help="Base SQLite de envíos donde guardar puntajes y análisis")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    stats = run_batch(args.inputs, args.out, concurrency=args.concurrency, workers=args.workers,
+                      model=args.model, temperature=args.temperature, use_gpt=not args.no_gpt, limit=args.limit,
+                      rpm=args.rpm, tpm=args.tpm, store_path=args.store)
+    print(json.dumps(stats, ensure_ascii=False))
+    return 0 if stats["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
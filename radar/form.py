@@ -0,0 +1,44 @@
+"""Lectura del libro Formulario.xlsx (sin Streamlit)."""
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+FORM_COLUMNS = ["Categoría", "Pregunta", "Calificación", "Peso"]
+
+
+def normalize_form_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Detecta las columnas por prefijo (categor*, pregun*, calif*, peso*/pondera*) y las renombra.
+
+    Sin columna de calificación se agrega vacía; sin columna de peso, todas pesan 1.
+    """
+    df = df.copy()
+    categoria_col = next((c for c in df.columns if str(c).strip().lower().startswith("categor")), None)
+    pregunta_col = next((c for c in df.columns if str(c).strip().lower().startswith("pregun")), None)
+    calif_col    = next((c for c in df.columns if str(c).strip().lower().startswith("calif")), None)
+    peso_col     = next((c for c in df.columns if str(c).strip().lower().startswith(("peso", "pondera"))), None)
+    if not (categoria_col and pregunta_col):
+        raise ValueError("La hoja 'Formulario' debe tener columnas 'Categoría' y 'Pregunta'.")
+    if not calif_col:
+        df["Calificación"] = np.nan
+        calif_col = "Calificación"
+    # Peso opcional por pregunta (columna 'Peso'); vacío o sin columna = 1
+    df["Peso"] = pd.to_numeric(df[peso_col], errors="coerce").fillna(1.0) if peso_col else 1.0
+    df = df.rename(columns={categoria_col: "Categoría", pregunta_col: "Pregunta", calif_col: "Calificación"})
+    return df[FORM_COLUMNS]
+
+
+def read_form(path: str = "Formulario.xlsx") -> pd.DataFrame:
+    return normalize_form_columns(pd.read_excel(path, sheet_name="Formulario"))
+
+
+def category_groups(categories: Sequence) -> Tuple[List[str], List[np.ndarray]]:
+    """Categorías en orden de aparición y el arreglo de índices de filas de cada una.
+
+    Las filas sin categoría forman su propio grupo (como en ``FormIndex``), así que
+    ninguna pregunta queda fuera de las secciones.
+    """
+    codes, uniques = pd.factorize(pd.Series(list(categories), dtype=object), sort=False, use_na_sentinel=False)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return [str(u) for u in uniques], [order[bounds[k]:bounds[k + 1]] for k in range(len(uniques))]
@@ -0,0 +1,199 @@
+"""Formularios compilados: del libro .xlsx a un archivo .npz que carga en milisegundos.
+
+Leer Formulario.xlsx pasa por openpyxl y la detección de columnas; el caché de
+Streamlit solo dura lo que el proceso, así que cada arranque, worker o despliegue lo
+volvía a leer. ``FormCompiler`` lo lee una vez por contenido: el sidecar se llama
+``<nombre>-<hash>.npz`` (hash del archivo) y guarda categorías, preguntas, códigos de
+categoría por pregunta, pesos y calificaciones iniciales (sin pickle). Si el libro
+cambia, el hash cambia y se compila una versión nueva; las anteriores quedan al lado,
+así que varios formularios (o versiones) conviven en el mismo directorio.
+
+Precompilar al desplegar:
+    python -m radar.form_compiler Formulario.xlsx [otro.xlsx ...] [--out .cache/forms]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from radar.form import FORM_COLUMNS, read_form
+from radar.scoring import FormIndex
+from radar.submissions import form_digest
+
+logger = logging.getLogger(__name__)
+
+COMPILER_VERSION = 1  # súbelo si cambia lo que se guarda o cómo se lee el libro
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class CompiledForm:
+    """Definición inmutable de un formulario (compartible entre sesiones)."""
+    name: str
+    source_hash: str
+    categories: List[str]
+    questions: List[str]
+    codes: np.ndarray      # (preguntas,) índice en ``categories``
+    weights: np.ndarray    # (preguntas,)
+    defaults: np.ndarray   # (preguntas,) calificación inicial del libro (NaN = vacía)
+
+    @property
+    def version(self) -> str:
+        return f"{self.name}-{self.source_hash}"
+
+    @property
+    def n_questions(self) -> int:
+        return len(self.codes)
+
+    @cached_property
+    def digest(self) -> str:
+        """Id para el almacén de envíos: cambia solo si cambian categorías, preguntas o pesos."""
+        return form_digest(self.question_categories, self.questions, self.weights)
+
+    @cached_property
+    def question_categories(self) -> List[str]:
+        return [self.categories[c] for c in self.codes]
+
+    def initial_scores(self, low: int = 1, high: int = 3, default: int = 2) -> np.ndarray:
+        """Calificaciones iniciales de una sesión (int8): las del libro o ``default`` si están vacías."""
+        return np.clip(np.nan_to_num(self.defaults, nan=default), low, high).astype(np.int8)
+
+    @cached_property
+    def index(self) -> FormIndex:
+        return FormIndex.from_codes(self.categories, self.codes, self.weights)
+
+    def to_frame(self, scores: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """Mismas columnas que ``read_form``; con ``scores``, esas calificaciones en vez de las del libro."""
+        return pd.DataFrame({"Categoría": self.question_categories, "Pregunta": self.questions,
+                             "Calificación": self.defaults if scores is None else scores, "Peso": self.weights},
+                            columns=FORM_COLUMNS)
+
+    # --- sidecar ---
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, name: str, source_hash: str) -> "CompiledForm":
+        index = FormIndex.from_frame(df)
+        return cls(name=name, source_hash=source_hash, categories=index.categories,
+                   questions=[str(q) for q in df["Pregunta"]], codes=index.codes.astype(np.int32),
+                   weights=index.weights.astype(np.float64),
+                   defaults=pd.to_numeric(df["Calificación"], errors="coerce").to_numpy(dtype=np.float64))
+
+    def save(self, path: str) -> None:
+        meta = {"compiler": COMPILER_VERSION, "name": self.name, "source_hash": self.source_hash,
+                "compiled": time.time()}
+        # Escritura atómica: otro worker puede estar leyendo el mismo sidecar
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                np.savez(fh, meta=np.array(json.dumps(meta)), categories=np.array(self.categories, dtype=str),
+                         questions=np.array(self.questions, dtype=str), codes=self.codes, weights=self.weights,
+                         defaults=self.defaults)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledForm":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("compiler") != COMPILER_VERSION:
+                raise ValueError(f"sidecar de otra versión del compilador: {meta.get('compiler')}")
+            return cls(name=meta["name"], source_hash=meta["source_hash"],
+                       categories=[str(c) for c in data["categories"]], questions=[str(q) for q in data["questions"]],
+                       codes=data["codes"], weights=data["weights"], defaults=data["defaults"])
+
+
+class FormCompiler:
+    """Carga formularios por contenido: memoria → sidecar .npz → compilar el .xlsx.
+
+    Revisa el archivo en cada ``load`` con un ``stat`` (tamaño y fecha); solo si
+    cambiaron vuelve a calcular el hash, así que editar el libro se nota sin reiniciar.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = ".cache/forms"):
+        self.cache_dir = cache_dir or None
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._forms: Dict[Tuple[str, str], CompiledForm] = {}  # (nombre, hash)
+        self._stat: Dict[str, Tuple[int, int, str]] = {}  # ruta -> (tamaño, mtime_ns, hash)
+        self.compiled = 0
+
+    def sidecar_path(self, name: str, source_hash: str) -> Optional[str]:
+        return os.path.join(self.cache_dir, f"{name}-{source_hash}.npz") if self.cache_dir else None
+
+    def _hash(self, path: str) -> str:
+        st_ = os.stat(path)
+        key = (st_.st_size, st_.st_mtime_ns)
+        cached = self._stat.get(path)
+        if cached and cached[:2] == key:
+            return cached[2]
+        digest = file_digest(path)
+        self._stat[path] = (*key, digest)
+        return digest
+
+    def load(self, path: str, name: Optional[str] = None) -> CompiledForm:
+        name = name or os.path.splitext(os.path.basename(path))[0]
+        with self._lock:
+            source_hash = self._hash(path)
+            form = self._forms.get((name, source_hash))
+            if form is not None:
+                return form
+            sidecar = self.sidecar_path(name, source_hash)
+            if sidecar and os.path.exists(sidecar):
+                try:
+                    form = CompiledForm.load(sidecar)
+                except (OSError, ValueError, KeyError) as ex:
+                    logger.warning("sidecar %s ilegible (%s); se recompila", sidecar, ex)
+            if form is None:
+                form = CompiledForm.from_frame(read_form(path), name, source_hash)
+                self.compiled += 1
+                if sidecar:
+                    try:
+                        form.save(sidecar)
+                    except OSError as ex:
+                        logger.warning("no se pudo guardar %s: %s", sidecar, ex)
+            self._forms[(name, source_hash)] = form
+            return form
+
+    def versions(self) -> List[str]:
+        """Sidecars compilados en el directorio (``<nombre>-<hash>``), más recientes primero."""
+        if not self.cache_dir:
+            return []
+        files = [f for f in os.listdir(self.cache_dir) if f.endswith(".npz")]
+        files.sort(key=lambda f: -os.path.getmtime(os.path.join(self.cache_dir, f)))
+        return [f[:-4] for f in files]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Compila formularios .xlsx a sidecars .npz por contenido.")
+    ap.add_argument("paths", nargs="+")
+    ap.add_argument("--out", default=".cache/forms")
+    args = ap.parse_args()
+    compiler = FormCompiler(args.out)
+    for path in args.paths:
+        form = compiler.load(path)
+        print(f"{path}: {form.version} ({form.n_questions} preguntas, {len(form.categories)} categorías) -> "
+              f"{compiler.sidecar_path(form.name, form.source_hash)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Caché de respuestas GPT direccionada por contenido.
+
+La llave es un hash del contenido que determina la respuesta (resumen, peores
+preguntas, versión del prompt, modelo y temperatura). Un acierto devuelve el texto
+guardado sin volver a llamar a la API.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+def make_cache_key(*parts) -> str:
+    """Hash estable (sha256) de las partes que determinan la respuesta del modelo."""
+    raw = json.dumps([str(p) for p in parts], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class RecommendationCache:
+    """LRU en memoria con límite de tamaño y TTL, más persistencia opcional en disco.
+
+    El disco también tiene tope (``max_disk_entries``, por defecto 4× el de memoria):
+    al guardar se borran los archivos vencidos y, si sobran, los de uso más antiguo.
+
+    Es seguro entre hilos: Streamlit atiende cada sesión en su propio hilo y la
+    instancia se comparte a nivel de proceso.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 7 * 24 * 3600,
+                 persist_dir: Optional[str] = None, max_disk_entries: Optional[int] = None):
+        self.max_entries = max(1, int(max_entries))
+        self.max_disk_entries = max(1, int(max_disk_entries or 4 * self.max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.persist_dir = persist_dir
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (created_ts, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+
+    # --- disco ---
+    def _path(self, key: str) -> str:
+        return os.path.join(self.persist_dir, f"{key}.json")
+
+    def _load_from_disk(self, key: str) -> Optional[tuple]:
+        if not self.persist_dir:
+            return None
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+            return float(data["created"]), data["value"]
+        except Exception:
+            return None
+
+    def _write_to_disk(self, key: str, created: float, value: str) -> None:
+        if not self.persist_dir:
+            return
+        try:
+            tmp = self._path(key) + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump({"created": created, "value": value}, fh, ensure_ascii=False)
+            os.replace(tmp, self._path(key))
+        except Exception:
+            # Silencioso: la caché en disco es opcional
+            pass
+        self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        """Borra del disco lo vencido y, si aún sobran archivos, los de uso más antiguo (mtime)."""
+        try:
+            files = []
+            for name in os.listdir(self.persist_dir):
+                if name.endswith(".json"):
+                    path = os.path.join(self.persist_dir, name)
+                    files.append((os.path.getmtime(path), path))
+        except OSError:
+            return
+        files.sort()
+        excess = len(files) - self.max_disk_entries
+        now = time.time()
+        for i, (mtime, path) in enumerate(files):
+            # mtime >= created: si ni el último uso cae dentro del TTL, la entrada venció
+            if i >= excess and not (self.ttl_seconds > 0 and now - mtime > self.ttl_seconds):
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _touch(self, key: str) -> None:
+        if not self.persist_dir:
+            return
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+
+    def _remove_from_disk(self, key: str) -> None:
+        if not self.persist_dir:
+            return
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    # --- API ---
+    def _expired(self, created: float) -> bool:
+        return self.ttl_seconds > 0 and (time.time() - created) > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                entry = self._load_from_disk(key)
+                if entry is not None:
+                    self._data[key] = entry
+            if entry is not None and self._expired(entry[0]):
+                self._data.pop(key, None)
+                self._remove_from_disk(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._evict()
+            self._touch(key)  # también en aciertos de memoria: el mtime marca el último uso en disco
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: str) -> None:
+        created = time.time()
+        with self._lock:
+            self._data[key] = (created, value)
+            self._data.move_to_end(key)
+            self._evict()
+        self._write_to_disk(key, created, value)
+
+    def _evict(self) -> None:
+        # Solo se desaloja de memoria; el disco tiene su propio tope (_prune_disk)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            if self.persist_dir:
+                for name in os.listdir(self.persist_dir):
+                    if name.endswith(".json"):
+                        self._remove_from_disk(name[:-5])
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+            }
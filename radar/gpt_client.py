@@ -0,0 +1,237 @@
+"""Cliente OpenAI compartido con límite de tasa global y reintentos con backoff.
+
+Todas las sesiones del proceso pasan por la misma instancia: dos token buckets
+(solicitudes/min y tokens/min) reparten el cupo de la cuenta en orden de llegada, y
+los 429 / errores transitorios se reintentan con backoff exponencial con jitter,
+respetando ``Retry-After`` cuando la API lo envía. ``stats()`` expone la cola de
+espera y los tiempos para ver el throttling en lugar de solo errores.
+
+Se usa igual que el cliente de OpenAI: ``client.chat.completions.create(...)``. Cada
+llamada reserva del TPM lo estimado (prompt + ``max_tokens``) y luego se corrige con
+el consumo real: sin streaming, con ``resp.usage``; en streaming, el ``usage`` llega
+en el último fragmento y quien lee el stream lo devuelve con ``stream.report_usage``.
+"""
+import logging
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Optional
+
+import openai
+
+from radar import tracing
+from radar.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS = (408, 409, 429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """Cupo que se recarga a ``per_minute / 60`` por segundo, hasta ``burst``.
+
+    ``reserve`` descuenta de inmediato (el saldo puede quedar negativo) y devuelve
+    cuánto debe esperar quien reservó; así las esperas salen en orden de llegada.
+    """
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.per_minute = float(per_minute)
+        self.rate = self.per_minute / 60.0
+        self.capacity = float(burst if burst is not None else per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= min(float(amount), self.capacity)  # una sola solicitud nunca espera más que un bucket lleno
+            return max(0.0, -self.tokens) / self.rate
+
+    def adjust(self, delta: float) -> None:
+        """Corrige una reserva con el consumo real (positivo devuelve cupo)."""
+        if not self.enabled or not delta:
+            return
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + delta)
+
+
+def estimate_tokens(messages, max_tokens: Optional[int] = None, completion_guess: int = 800) -> int:
+    """Tokens del prompt (contados en local) más la respuesta esperada, para reservar cupo antes de la llamada."""
+    prompt = sum(count_tokens(str(m.get("content") or "")) for m in messages or [])
+    return prompt + 8 * len(messages or []) + int(max_tokens or completion_guess)
+
+
+def _retry_after(ex: Exception) -> Optional[float]:
+    headers = getattr(getattr(ex, "response", None), "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return max(0.0, float(value) * scale)
+            except ValueError:
+                return None  # fecha HTTP: se usa el backoff normal
+    return None
+
+
+def _is_retryable(ex: Exception) -> bool:
+    if isinstance(ex, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    return isinstance(ex, openai.APIStatusError) and ex.status_code in RETRY_STATUS
+
+
+class MeteredStream:
+    """Stream del SDK con ``report_usage`` para corregir la reserva de TPM al terminar."""
+
+    def __init__(self, stream, settle: Callable):
+        self._stream = stream
+        self._settle = settle
+        self._settled = False
+
+    def __iter__(self):
+        return iter(self._stream)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def report_usage(self, usage) -> None:
+        """Devuelve al bucket lo reservado de más (una sola vez; sin ``usage`` no hace nada)."""
+        if self._settled or usage is None or not getattr(usage, "total_tokens", None):
+            return
+        self._settled = True
+        self._settle(usage)
+
+
+class RateLimitedClient:
+    """Envoltura de ``OpenAI`` con límite global (RPM/TPM), timeouts y reintentos."""
+
+    def __init__(self, client, rpm: float = 500, tpm: float = 30000, timeout_s: float = 60.0,
+                 max_retries: int = 5, base_delay_s: float = 1.0, max_delay_s: float = 30.0):
+        # Los reintentos los maneja esta clase (el SDK reintentaría por su cuenta sin coordinar)
+        self.client = client.with_options(timeout=timeout_s, max_retries=0)
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max(0, int(max_retries))
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._in_flight = 0
+        self._calls = 0
+        self._retries = 0
+        self._throttled = 0  # respuestas 429
+        self._failures = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._last_wait = 0.0
+
+    def _acquire(self, n_tokens: int) -> float:
+        wait = max(self.requests.reserve(1), self.tokens.reserve(n_tokens))
+        if wait > 0:
+            with self._lock:
+                self._waiting += 1
+            logger.info("openai: esperando cupo %.2f s", wait)
+            try:
+                time.sleep(wait)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+        with self._lock:
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            self._last_wait = wait
+        return wait
+
+    def _backoff(self, attempt: int, ex: Exception) -> float:
+        hinted = _retry_after(ex)
+        if hinted is not None:
+            return min(hinted, self.max_delay_s) + random.uniform(0, self.base_delay_s / 2)
+        # Full jitter: evita que todas las sesiones reintenten a la vez
+        return random.uniform(0, min(self.max_delay_s, self.base_delay_s * 2 ** attempt))
+
+    def report_usage(self, reserved: int, usage) -> None:
+        """Corrige una reserva de ``reserved`` tokens con el consumo real."""
+        self.tokens.adjust(reserved - usage.total_tokens)
+
+    def create(self, **kwargs):
+        """Igual que ``chat.completions.create``; en streaming, los reintentos cubren solo la apertura.
+
+        Con ``stream=True`` devuelve un ``MeteredStream``: al terminar de leerlo hay que
+        pasarle el ``usage`` del último fragmento (``report_usage``) para liberar el cupo.
+        """
+        reserved = estimate_tokens(kwargs.get("messages"), kwargs.get("max_tokens"))
+        attempt, waited = 0, 0.0
+        with tracing.span("openai.request", model=kwargs.get("model"), stream=bool(kwargs.get("stream")),
+                          tokens_reserved=reserved) as sp:
+            while True:
+                waited += self._acquire(reserved)
+                with self._lock:
+                    self._in_flight += 1
+                    self._calls += 1
+                try:
+                    resp = self.client.chat.completions.create(**kwargs)
+                except Exception as ex:
+                    retry = _is_retryable(ex) and attempt < self.max_retries
+                    if getattr(ex, "status_code", None) != 429:
+                        # Falló al abrir sin consumir tokens: se devuelve la reserva de este intento
+                        self.tokens.adjust(reserved)
+                    with self._lock:
+                        self._throttled += int(getattr(ex, "status_code", None) == 429)
+                        self._retries += int(retry)
+                        self._failures += int(not retry)
+                    if not retry:
+                        sp.set(attempts=attempt + 1, wait_s=round(waited, 3))
+                        raise
+                    delay = self._backoff(attempt, ex)
+                    logger.warning("openai: %s; reintento %d/%d en %.1f s", type(ex).__name__, attempt + 1,
+                                   self.max_retries, delay)
+                    time.sleep(delay)
+                    waited += delay
+                    attempt += 1
+                    continue
+                finally:
+                    with self._lock:
+                        self._in_flight -= 1
+                sp.set(attempts=attempt + 1, wait_s=round(waited, 3))
+                if kwargs.get("stream"):
+                    return MeteredStream(resp, lambda usage: self.report_usage(reserved, usage))
+                usage = getattr(resp, "usage", None)
+                if usage is not None and getattr(usage, "total_tokens", None):
+                    self.report_usage(reserved, usage)
+                    sp.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+                return resp
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls = self._calls
+            return {
+                "waiting": self._waiting,
+                "in_flight": self._in_flight,
+                "calls": calls,
+                "retries": self._retries,
+                "throttled": self._throttled,
+                "failures": self._failures,
+                "wait_avg_s": round(self._wait_total / calls, 3) if calls else 0.0,
+                "wait_max_s": round(self._wait_max, 3),
+                "last_wait_s": round(self._last_wait, 3),
+                "rpm": self.requests.per_minute,
+                "tpm": self.tokens.per_minute,
+            }
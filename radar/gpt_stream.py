@@ -0,0 +1,66 @@
+"""Respuestas GPT en streaming (fragmento a fragmento) con medición del primer token."""
+import logging
+import time
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ChatStream:
+    """Iterable sobre los fragmentos de texto de un chat.completions en modo stream.
+
+    Pensado para ``st.write_stream``: cada fragmento se pinta en cuanto llega. Al
+    terminar deja el texto completo en ``text``, los tiempos en ``ttft_s`` (tiempo
+    al primer token) y ``total_s`` y, si la API lo informa, el consumo en ``usage``.
+    """
+
+    def __init__(self, client, prompt: str, model: str, temperature: float, label: str = "gpt",
+                 response_format: Optional[dict] = None):
+        self.client = client
+        self.prompt = prompt
+        self.model = model
+        self.temperature = temperature
+        self.label = label
+        self.response_format = response_format  # p. ej. un json_schema (salida estructurada)
+        self.text = ""
+        self.ttft_s: Optional[float] = None
+        self.total_s: Optional[float] = None
+        self.usage = None
+
+    def __iter__(self) -> Iterator[str]:
+        t0 = time.perf_counter()
+        parts = []
+        extra = {"response_format": self.response_format} if self.response_format else {}
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            temperature=self.temperature,
+            messages=[{"role": "user", "content": self.prompt}],
+            stream=True,
+            stream_options={"include_usage": True},
+            **extra,
+        )
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                self.usage = chunk.usage  # llega en el último fragmento, sin choices
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if self.ttft_s is None:
+                self.ttft_s = time.perf_counter() - t0
+                logger.info("%s: primer token en %.2f s", self.label, self.ttft_s)
+            parts.append(delta)
+            yield delta
+        self.text = "".join(parts)
+        self.total_s = time.perf_counter() - t0
+        report = getattr(stream, "report_usage", None)  # RateLimitedClient: libera lo reservado de más
+        if report is not None and self.usage is not None:
+            report(self.usage)
+        logger.info("%s: completado en %.2f s (primer token %.2f s, %d caracteres)",
+                    self.label, self.total_s, self.ttft_s or 0.0, len(self.text))
+
+    def timing_caption(self) -> str:
+        if self.ttft_s is None:
+            return ""
+        return f"Primer token en {self.ttft_s:.1f} s · respuesta completa en {self.total_s or 0:.1f} s"
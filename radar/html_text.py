@@ -0,0 +1,223 @@
+"""Extracción de texto visible de HTML, en streaming y con presupuesto de caracteres.
+
+A diferencia de BeautifulSoup (que construye el árbol completo antes de extraer),
+aquí el HTML se procesa por fragmentos a medida que llega: el contenido de
+script/style/noscript se descarta durante el parseo y el proceso se detiene en
+cuanto se llena el presupuesto, sin leer el resto del documento.
+
+El resultado es el mismo que ``" ".join(soup.get_text(separator=" ").split())[:max_chars]``
+de la versión anterior, también con un script/style/noscript sin cerrar: como en el
+árbol de BeautifulSoup, el cierre de un elemento que lo contiene (``</div>``,
+``</body>``…) termina la parte ignorada. Si ``lxml`` está instalado se usa como backend (más rápido);
+si no, se usa ``html.parser`` de la librería estándar.
+"""
+import codecs
+from collections import Counter
+from html.parser import HTMLParser
+from typing import Iterable, List, Optional, Union
+from urllib.parse import urljoin
+
+try:
+    from lxml import etree as _lxml_etree
+    _lxml_available = True
+except Exception:
+    _lxml_available = False
+
+SKIP_TAGS = frozenset({"script", "style", "noscript"})
+BLOCK_TAGS = frozenset({
+    "address", "article", "aside", "blockquote", "dd", "div", "dl", "dt", "figcaption", "footer",
+    "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "li", "main", "nav", "ol", "p", "section",
+    "table", "td", "th", "title", "tr", "ul",
+})
+FEED_SIZE = 64 * 1024
+
+
+class _BudgetFilled(Exception):
+    """Señal interna para detener el parseo cuando ya hay suficiente texto."""
+
+
+class _Collector:
+    """Acumula palabras fuera de las etiquetas ignoradas hasta llenar el presupuesto."""
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.words: List[str] = []
+        self.length = 0          # longitud de " ".join(words)
+        self.skip_depth = 0
+        self._pending: List[str] = []  # texto del nodo actual (puede llegar partido)
+        self._open: Counter = Counter()   # elementos abiertos fuera de la parte ignorada
+        self._inner: Counter = Counter()  # y dentro de ella
+
+    def start(self, tag: str, attrs: Optional[dict] = None) -> None:
+        self.flush()
+        if self.skip_depth:
+            self._inner[tag] += 1
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif not self.skip_depth:
+            self._open[tag] += 1
+
+    def end(self, tag: str) -> None:
+        self.flush()
+        if tag in SKIP_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+            self._inner[tag] -= 1 if self._inner[tag] else 0
+        elif self.skip_depth and self._inner[tag]:
+            self._inner[tag] -= 1
+        elif self.skip_depth and self._open[tag]:
+            # Cierra un elemento que contiene la parte ignorada: el script/noscript quedó sin cerrar
+            self.skip_depth = 0
+            self._inner.clear()
+            self._open[tag] -= 1
+        elif self._open[tag]:
+            self._open[tag] -= 1
+
+    def data(self, text: str) -> None:
+        if not self.skip_depth:
+            self._pending.append(text)
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        node_text = "".join(self._pending)
+        self._pending = []
+        for w in node_text.split():
+            self.length += len(w) + (1 if self.words else 0)
+            self.words.append(w)
+            if self.length >= self.max_chars:
+                raise _BudgetFilled()
+
+    def text(self) -> str:
+        return " ".join(self.words)[: self.max_chars]
+
+
+class _BlockCollector(_Collector):
+    """Además del texto, separa bloques (párrafos, ítems, títulos…) y recoge enlaces."""
+
+    def __init__(self, max_chars: int, base_url: str = ""):
+        super().__init__(max_chars)
+        self.base_url = base_url
+        self.blocks: List[str] = []
+        self.links: List[str] = []
+        self._block_start = 0  # índice en self.words donde empieza el bloque actual
+
+    def _close_block(self) -> None:
+        if len(self.words) > self._block_start:
+            self.blocks.append(" ".join(self.words[self._block_start:]))
+        self._block_start = len(self.words)
+
+    def start(self, tag: str, attrs: Optional[dict] = None) -> None:
+        super().start(tag, attrs)
+        if tag in BLOCK_TAGS:
+            self._close_block()
+        if tag == "a" and attrs and attrs.get("href"):
+            self.links.append(urljoin(self.base_url, attrs["href"].strip()))
+
+    def end(self, tag: str) -> None:
+        super().end(tag)
+        if tag in BLOCK_TAGS:
+            self._close_block()
+
+    def result(self) -> dict:
+        self._close_block()
+        return {"blocks": self.blocks, "links": self.links}
+
+
+class _StdlibParser(HTMLParser):
+    def __init__(self, collector: _Collector):
+        super().__init__(convert_charrefs=True)
+        self.c = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.c.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.c.flush()  # etiqueta vacía (<br/>): separa nodos de texto, sin abrir nada
+
+    def handle_endtag(self, tag):
+        self.c.end(tag)
+
+    def handle_data(self, data):
+        self.c.data(data)
+
+    def handle_comment(self, data):
+        self.c.flush()
+
+
+class _LxmlTarget:
+    def __init__(self, collector: _Collector):
+        self.c = collector
+
+    def start(self, tag, attrib):
+        self.c.start(tag if isinstance(tag, str) else "", attrib)
+
+    def end(self, tag):
+        self.c.end(tag if isinstance(tag, str) else "")
+
+    def data(self, data):
+        self.c.data(data)
+
+    def comment(self, text):
+        self.c.flush()
+
+    def close(self):
+        return None
+
+
+def _iter_text(chunks: Iterable[Union[str, bytes]], encoding: str):
+    decoder = None
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            chunk = decoder.decode(chunk)
+        if chunk:
+            yield chunk
+    if decoder is not None:
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+
+def _run(collector: _Collector, chunks: Iterable[Union[str, bytes]], encoding: str, backend: str) -> None:
+    use_lxml = backend == "lxml" or (backend == "auto" and _lxml_available)
+    if use_lxml:
+        parser = _lxml_etree.HTMLParser(target=_LxmlTarget(collector), recover=True)
+    else:
+        parser = _StdlibParser(collector)
+    try:
+        for chunk in _iter_text(chunks, encoding):
+            parser.feed(chunk)
+        parser.close()
+        collector.flush()
+    except _BudgetFilled:
+        pass
+
+
+def extract_text_stream(chunks: Iterable[Union[str, bytes]], max_chars: int = 8000,
+                        encoding: str = "utf-8", backend: str = "auto") -> str:
+    """Texto visible a partir de fragmentos de HTML (str o bytes), deteniéndose en ``max_chars``.
+
+    ``backend``: "auto" (lxml si está disponible), "lxml" o "stdlib".
+    """
+    collector = _Collector(max_chars)
+    _run(collector, chunks, encoding, backend)
+    return collector.text()
+
+
+def extract_blocks_stream(chunks: Iterable[Union[str, bytes]], max_chars: int = 8000, base_url: str = "",
+                          encoding: str = "utf-8", backend: str = "auto") -> dict:
+    """Como ``extract_text_stream`` pero devuelve ``{"blocks": [...], "links": [...]}``.
+
+    Los enlaces se resuelven contra ``base_url``; solo se recogen los que aparecen
+    antes de llenar el presupuesto de texto.
+    """
+    collector = _BlockCollector(max_chars, base_url)
+    _run(collector, chunks, encoding, backend)
+    return collector.result()
+
+
+def extract_text_fast(html: str, max_chars: int = 8000, backend: str = "auto") -> str:
+    """Igual que ``extract_text_stream`` pero para un documento ya descargado."""
+    chunks = (html[i:i + FEED_SIZE] for i in range(0, len(html), FEED_SIZE))
+    return extract_text_stream(chunks, max_chars=max_chars, backend=backend)
@@ -0,0 +1,342 @@
+"""Cola de trabajos persistente (SQLite) con hilos de fondo.
+
+Las llamadas largas (GPT, descarga del sitio) no corren en el hilo del script de
+Streamlit: se encolan con una llave derivada de sus entradas y un pool de hilos las
+ejecuta. La página solo consulta el estado, así que un rerun o una reconexión del
+navegador no corta ni repite el trabajo.
+
+- Dos envíos con las mismas entradas (misma llave) se fusionan en un solo trabajo;
+  si ya terminó, se devuelve el resultado guardado mientras no venza la retención.
+- El estado vive en SQLite. Cada trabajo "running" lleva el dueño que lo tomó y un
+  latido que ese proceso renueva; solo los que dejaron de latir por más de
+  ``lease_s`` (proceso caído o reiniciado) vuelven a la cola, nunca los de otro
+  proceso vivo que comparta la base.
+- Los trabajos se toman en orden de llegada (FIFO), de modo que un trabajo puede
+  esperar el resultado de otro encolado antes que él sin bloquear el pool.
+- Los terminados se borran al vencer la retención (los workers purgan cada
+  ``purge_every_s``): payload y resultado llevan datos de la empresa y la persona.
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, ERROR = "queued", "running", "done", "error"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq      INTEGER PRIMARY KEY AUTOINCREMENT,
+    key      TEXT UNIQUE NOT NULL,
+    kind     TEXT NOT NULL,
+    payload  TEXT NOT NULL,
+    status   TEXT NOT NULL,
+    progress TEXT,
+    result   TEXT,
+    meta     TEXT,
+    error    TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created  REAL NOT NULL,
+    started  REAL,
+    finished REAL,
+    owner    TEXT,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, seq);
+DROP TABLE IF EXISTS job_sessions;
+"""
+
+
+@dataclass(frozen=True)
+class Job:
+    key: str
+    kind: str
+    status: str
+    progress: str = ""
+    result: Optional[str] = None
+    meta: Optional[dict] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    created: float = 0.0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    @property
+    def pending(self) -> bool:
+        return self.status in (QUEUED, RUNNING)
+
+
+class JobContext:
+    """Lo que recibe un handler: el payload, avance parcial, metadatos y espera de otros trabajos."""
+
+    def __init__(self, queue: "JobQueue", key: str, payload: dict):
+        self.queue = queue
+        self.key = key
+        self.payload = payload
+        self.meta: dict = {}
+        self._last_progress = 0.0
+
+    def progress(self, text: Union[str, Callable[[], str]], min_interval_s: float = 0.25) -> None:
+        """Guarda texto parcial (p. ej. la respuesta en streaming) para que la página lo muestre.
+
+        ``text`` puede ser una función: solo se evalúa cuando toca escribir, así armar el
+        texto completo no se paga en cada fragmento.
+        """
+        now = time.monotonic()
+        if now - self._last_progress >= min_interval_s:
+            self._last_progress = now
+            self.queue._update(self.key, progress=text() if callable(text) else text)
+
+    def wait_for(self, key: str, timeout: Optional[float] = None) -> Job:
+        """Espera otro trabajo (encolado antes que este) y lo devuelve terminado."""
+        return self.queue.wait(key, timeout)
+
+
+Handler = Callable[[JobContext], str]
+
+
+class JobQueue:
+    """Cola FIFO persistente con ``workers`` hilos; compartida por todas las sesiones del proceso."""
+
+    def __init__(self, db_path: str, workers: int = 4, retention_s: float = 24 * 3600, poll_s: float = 0.5,
+                 purge_every_s: float = 600, lease_s: float = 60):
+        self.db_path = db_path
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_s = float(lease_s)
+        self.workers = max(1, int(workers))
+        self.retention_s = float(retention_s)
+        self.poll_s = poll_s
+        self.purge_every_s = float(purge_every_s)
+        self._purge_lock = threading.Lock()
+        self._next_purge = 0.0
+        self.merged = 0
+        self._handlers: Dict[str, Handler] = {}
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._stop = threading.Event()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        columns = {r["name"] for r in conn.execute("PRAGMA table_info(jobs)")}
+        for col, decl in (("owner", "TEXT"), ("heartbeat", "REAL")):  # bases creadas antes de estas columnas
+            if col not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {col} {decl}")
+        self._requeue_expired()
+        self._maybe_purge()
+        self._threads = [threading.Thread(target=self._worker, name=f"radar-job-{i}", daemon=True)
+                         for i in range(self.workers)]
+        self._threads.append(threading.Thread(target=self._heartbeat, name="radar-job-heartbeat", daemon=True))
+        for t in self._threads:
+            t.start()
+
+    # --- SQLite ---
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _update(self, key: str, **fields) -> None:
+        cols = ", ".join(f"{k}=?" for k in fields)
+        self._conn().execute(f"UPDATE jobs SET {cols} WHERE key=?", (*fields.values(), key))
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> Job:
+        return Job(
+            key=row["key"], kind=row["kind"], status=row["status"], progress=row["progress"] or "",
+            result=row["result"], meta=json.loads(row["meta"]) if row["meta"] else None, error=row["error"],
+            attempts=row["attempts"], created=row["created"], started=row["started"], finished=row["finished"],
+        )
+
+    # --- API ---
+    def register(self, kind: str, handler: Handler) -> None:
+        self._handlers[kind] = handler
+        with self._cond:
+            self._cond.notify_all()
+
+    def submit(self, kind: str, key: str, payload: dict) -> Job:
+        """Encola un trabajo o se une al existente con la misma llave (en curso o terminado)."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT status, finished FROM jobs WHERE key=?", (key,)).fetchone()
+            fresh = row is not None and (
+                row["status"] in (QUEUED, RUNNING)
+                or (row["status"] == DONE and now - (row["finished"] or 0) <= self.retention_s)
+            )
+            if fresh:
+                self.merged += 1
+            else:
+                # Nuevo, fallido o vencido: se (re)encola al final de la cola
+                conn.execute("DELETE FROM jobs WHERE key=?", (key,))
+                conn.execute(
+                    "INSERT INTO jobs (key, kind, payload, status, created) VALUES (?, ?, ?, ?, ?)",
+                    (key, kind, json.dumps(payload, ensure_ascii=False), QUEUED, now),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if not fresh:
+            with self._cond:
+                self._cond.notify()
+        return self.get(key)
+
+    def get(self, key: str) -> Optional[Job]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE key=?", (key,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def wait(self, key: str, timeout: Optional[float] = None) -> Job:
+        """Bloquea hasta que el trabajo termine (con éxito o error)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(key)
+            if job is None:
+                raise KeyError(key)
+            if not job.pending:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"El trabajo {key[:12]} sigue en curso.")
+            with self._cond:
+                self._cond.wait(min(self.poll_s, 0.2))
+
+    def ahead(self, key: str) -> int:
+        """Trabajos en cola antes que este (0 si ya está corriendo o terminó)."""
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status=? AND seq < (SELECT seq FROM jobs WHERE key=? AND status=?)",
+            (QUEUED, key, QUEUED),
+        ).fetchone()
+        return int(row[0] or 0)
+
+    def purge(self) -> int:
+        """Borra trabajos terminados más viejos que la retención."""
+        conn = self._conn()
+        cutoff = time.time() - self.retention_s
+        n = conn.execute("DELETE FROM jobs WHERE status IN (?, ?) AND finished < ?", (DONE, ERROR, cutoff)).rowcount
+        if n:
+            logger.info("jobs: %d trabajos vencidos borrados", n)
+        return n
+
+    def _requeue_expired(self) -> int:
+        """Devuelve a la cola los trabajos "running" cuyo dueño dejó de renovar el latido."""
+        cutoff = time.time() - self.lease_s
+        n = self._conn().execute(
+            "UPDATE jobs SET status=?, progress=NULL, owner=NULL, heartbeat=NULL "
+            "WHERE status=? AND COALESCE(heartbeat, started, 0) < ?",
+            (QUEUED, RUNNING, cutoff),
+        ).rowcount
+        if n:
+            logger.info("jobs: %d trabajos recuperados", n)
+            with self._cond:
+                self._cond.notify_all()
+        return n
+
+    def _maybe_purge(self) -> None:
+        """``purge`` a lo sumo una vez cada ``purge_every_s`` (la llama el worker que llegue primero)."""
+        now = time.monotonic()
+        if now < self._next_purge or not self._purge_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_purge = now + self.purge_every_s
+            self.purge()
+        except sqlite3.Error as ex:
+            logger.warning("jobs: no se pudieron borrar los trabajos vencidos (%s)", ex)
+        finally:
+            self._purge_lock.release()
+
+    def stats(self) -> dict:
+        rows = self._conn().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {r["status"]: r["n"] for r in rows}
+        return {
+            "queued": counts.get(QUEUED, 0), "running": counts.get(RUNNING, 0),
+            "done": counts.get(DONE, 0), "error": counts.get(ERROR, 0),
+            "merged": self.merged, "workers": self.workers,
+        }
+
+    def close(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    # --- workers ---
+    def _claim(self) -> Optional[sqlite3.Row]:
+        kinds = list(self._handlers)
+        if not kinds:
+            return None
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")  # también excluye a otros procesos que compartan la base
+        try:
+            row = conn.execute(
+                f"SELECT * FROM jobs WHERE status=? AND kind IN ({','.join('?' * len(kinds))}) ORDER BY seq LIMIT 1",
+                (QUEUED, *kinds),
+            ).fetchone()
+            if row is not None:
+                now = time.time()
+                conn.execute("UPDATE jobs SET status=?, started=?, owner=?, heartbeat=?, attempts=attempts+1 "
+                             "WHERE key=?", (RUNNING, now, self.owner, now, row["key"]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def _worker(self) -> None:
+        while not self._stop.is_set():
+            self._maybe_purge()
+            try:
+                row = self._claim()
+            except sqlite3.Error as ex:
+                logger.warning("jobs: no se pudo tomar un trabajo (%s)", ex)
+                row = None
+            if row is None:
+                with self._cond:
+                    self._cond.wait(self.poll_s)
+                continue
+            self._run(row)
+
+    def _heartbeat(self) -> None:
+        """Renueva el latido de los trabajos de este proceso y recupera los de procesos caídos."""
+        while not self._stop.wait(self.lease_s / 3):
+            try:
+                self._conn().execute("UPDATE jobs SET heartbeat=? WHERE status=? AND owner=?",
+                                     (time.time(), RUNNING, self.owner))
+                self._requeue_expired()
+            except sqlite3.Error as ex:
+                logger.warning("jobs: no se pudo renovar el latido (%s)", ex)
+
+    def _finish(self, key: str, **fields) -> bool:
+        """Cierra el trabajo solo si sigue siendo de este proceso (pudo recuperarlo otro al vencer)."""
+        cols = ", ".join(f"{k}=?" for k in fields)
+        n = self._conn().execute(f"UPDATE jobs SET {cols}, owner=NULL WHERE key=? AND status=? AND owner=?",
+                                 (*fields.values(), key, RUNNING, self.owner)).rowcount
+        if not n:
+            logger.warning("jobs: %s ya no es de este proceso; se descarta su resultado", key[:12])
+        return bool(n)
+
+    def _run(self, row: sqlite3.Row) -> None:
+        key, kind = row["key"], row["kind"]
+        ctx = JobContext(self, key, json.loads(row["payload"]))
+        t0 = time.perf_counter()
+        try:
+            result = self._handlers[kind](ctx)
+            if self._finish(key, status=DONE, result=result, progress=None, finished=time.time(),
+                            meta=json.dumps(ctx.meta) if ctx.meta else None, error=None):
+                logger.info("jobs: %s %s listo en %.2f s", kind, key[:12], time.perf_counter() - t0)
+        except Exception as ex:
+            self._finish(key, status=ERROR, error=str(ex) or type(ex).__name__, progress=None, finished=time.time())
+            logger.warning("jobs: %s %s falló: %s", kind, key[:12], ex)
+        with self._cond:
+            self._cond.notify_all()
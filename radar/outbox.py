@@ -0,0 +1,240 @@
+"""Bandeja de salida persistente para los envíos al Web App de Apps Script.
+
+Cada envío (copia de respaldo, correo con el reporte) se guarda primero en SQLite
+y un hilo de fondo lo entrega con una sesión HTTP con keep-alive. Si falla, se
+reintenta con backoff exponencial; tras ``max_attempts`` intentos (o un error que
+no tiene arreglo, como un 4xx) queda en estado "dead" con el último error, listo
+para revisarlo o reintentarlo a mano. La página solo encola y consulta el estado.
+"""
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from radar import tracing
+from radar.payload import JsonPayload, gzip_bytes
+
+logger = logging.getLogger(__name__)
+
+PENDING, SENDING, SENT, DEAD = "pending", "sending", "sent", "dead"
+RETRY_STATUS = (408, 425, 429, 500, 502, 503, 504)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deliveries (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind       TEXT NOT NULL,
+    url        TEXT NOT NULL,
+    payload    TEXT,
+    content    BLOB,
+    field      TEXT,
+    session    TEXT,
+    status     TEXT NOT NULL,
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    next_at    REAL NOT NULL,
+    last_error TEXT,
+    created    REAL NOT NULL,
+    sent_at    REAL
+);
+CREATE INDEX IF NOT EXISTS deliveries_due ON deliveries (status, next_at);
+"""
+
+
+class DeliveryError(Exception):
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+@dataclass(frozen=True)
+class Delivery:
+    id: int
+    kind: str
+    status: str
+    attempts: int
+    last_error: Optional[str]
+    created: float
+    next_at: float
+    sent_at: Optional[float]
+
+    @property
+    def pending(self) -> bool:
+        return self.status in (PENDING, SENDING)
+
+
+class Outbox:
+    """Cola de entregas HTTP (JSON) con reintentos y dead-letter; compartida por el proceso."""
+
+    def __init__(self, db_path: str, max_attempts: int = 6, base_delay_s: float = 2.0,
+                 max_delay_s: float = 300.0, timeout_s: float = 15.0, retention_s: float = 7 * 24 * 3600,
+                 poll_s: float = 1.0, session: Optional[requests.Session] = None):
+        self.db_path = db_path
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+        self.timeout_s = timeout_s
+        self.retention_s = retention_s
+        self.poll_s = poll_s
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+            session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+        self.session = session
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+        columns = {r["name"] for r in conn.execute("PRAGMA table_info(deliveries)")}
+        for col, decl in (("content", "BLOB"), ("field", "TEXT")):  # bases creadas antes de estas columnas
+            if col not in columns:
+                conn.execute(f"ALTER TABLE deliveries ADD COLUMN {col} {decl}")
+        conn.execute("UPDATE deliveries SET status=? WHERE status=?", (PENDING, SENDING))  # cortados por un reinicio
+        conn.execute("DELETE FROM deliveries WHERE status=? AND sent_at < ?", (SENT, time.time() - retention_s))
+        self._thread = threading.Thread(target=self._worker, name="radar-outbox", daemon=True)
+        self._thread.start()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_delivery(row: sqlite3.Row) -> Delivery:
+        return Delivery(id=row["id"], kind=row["kind"], status=row["status"], attempts=row["attempts"],
+                        last_error=row["last_error"], created=row["created"], next_at=row["next_at"],
+                        sent_at=row["sent_at"])
+
+    # --- API ---
+    def enqueue(self, kind: str, url: str, payload: dict, session: str = "", content: Optional[bytes] = None,
+                field: str = "content_b64", compress: bool = False) -> int:
+        """Guarda un envío. ``content`` (bytes) viaja en base64 en ``payload[field]`` y se
+        arma en streaming al enviar; con ``compress`` se guarda y envía en gzip
+        (``payload["content_encoding"] = "gzip"``)."""
+        now = time.time()
+        if content is not None and compress:
+            content = gzip_bytes(content)
+            payload = {**payload, "content_encoding": "gzip"}
+        cur = self._conn().execute(
+            "INSERT INTO deliveries (kind, url, payload, content, field, session, status, next_at, created) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (kind, url, json.dumps(payload, ensure_ascii=False), content, field if content is not None else None,
+             session, PENDING, now, now),
+        )
+        self._wake.set()
+        return int(cur.lastrowid)
+
+    def get(self, delivery_id: int) -> Optional[Delivery]:
+        row = self._conn().execute("SELECT * FROM deliveries WHERE id=?", (delivery_id,)).fetchone()
+        return self._to_delivery(row) if row else None
+
+    def retry(self, delivery_id: int) -> None:
+        """Devuelve a la cola un envío en dead-letter (con sus intentos en cero)."""
+        self._conn().execute("UPDATE deliveries SET status=?, attempts=0, next_at=? WHERE id=? AND status=?",
+                             (PENDING, time.time(), delivery_id, DEAD))
+        self._wake.set()
+
+    def dead_letters(self, limit: int = 50) -> List[Delivery]:
+        rows = self._conn().execute("SELECT * FROM deliveries WHERE status=? ORDER BY id DESC LIMIT ?",
+                                    (DEAD, limit)).fetchall()
+        return [self._to_delivery(r) for r in rows]
+
+    def stats(self) -> dict:
+        rows = self._conn().execute("SELECT status, COUNT(*) AS n FROM deliveries GROUP BY status").fetchall()
+        counts = {r["status"]: r["n"] for r in rows}
+        return {s: counts.get(s, 0) for s in (PENDING, SENDING, SENT, DEAD)}
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    # --- entrega ---
+    def _post(self, row: sqlite3.Row) -> None:
+        if row["content"] is not None:
+            body = JsonPayload(json.loads(row["payload"]), row["field"], row["content"])
+        else:
+            body = row["payload"].encode("utf-8")
+        with tracing.span("outbox.post", session=row["session"] or "", kind=row["kind"], bytes_out=len(body),
+                          attempt=row["attempts"] + 1) as sp:
+            try:
+                r = self.session.post(row["url"], data=body, timeout=self.timeout_s,
+                                      headers={"Content-Type": "application/json"})
+            except requests.RequestException as ex:
+                raise DeliveryError(f"{type(ex).__name__}: {ex}")
+            sp.set(http_status=r.status_code)
+        if r.status_code != 200:
+            raise DeliveryError(f"HTTP {r.status_code}", retryable=r.status_code in RETRY_STATUS)
+        try:
+            data = r.json()
+        except ValueError:
+            data = None
+        # El Web App responde {"ok": true} cuando guardó / envió
+        if isinstance(data, dict) and "ok" in data and not data.get("ok"):
+            raise DeliveryError(f"respuesta ok=false: {data.get('error') or data}")
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT * FROM deliveries WHERE status=? AND next_at<=? ORDER BY next_at, id LIMIT 1",
+                               (PENDING, time.time())).fetchone()
+            if row is not None:
+                conn.execute("UPDATE deliveries SET status=?, attempts=attempts+1 WHERE id=?", (SENDING, row["id"]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def _next_wait(self) -> float:
+        row = self._conn().execute("SELECT MIN(next_at) FROM deliveries WHERE status=?", (PENDING,)).fetchone()
+        if row[0] is None:
+            return self.poll_s * 30
+        return min(max(0.05, row[0] - time.time()), self.poll_s * 30)
+
+    def _worker(self) -> None:
+        while not self._stop.is_set():
+            try:
+                row = self._claim()
+                if row is None:
+                    self._wake.wait(self._next_wait())
+                    self._wake.clear()
+                    continue
+                self._deliver(row)
+            except sqlite3.Error as ex:
+                logger.warning("outbox: error de base de datos (%s)", ex)
+                time.sleep(self.poll_s)
+
+    def _deliver(self, row: sqlite3.Row) -> None:
+        attempt = row["attempts"] + 1
+        conn = self._conn()
+        try:
+            self._post(row)
+        except DeliveryError as ex:
+            if ex.retryable and attempt < self.max_attempts:
+                delay = random.uniform(0.5, 1.0) * min(self.max_delay_s, self.base_delay_s * 2 ** (attempt - 1))
+                conn.execute("UPDATE deliveries SET status=?, next_at=?, last_error=? WHERE id=?",
+                             (PENDING, time.time() + delay, str(ex), row["id"]))
+                logger.info("outbox: %s #%d falló (%s); reintento %d en %.1f s",
+                            row["kind"], row["id"], ex, attempt + 1, delay)
+            else:
+                conn.execute("UPDATE deliveries SET status=?, last_error=? WHERE id=?", (DEAD, str(ex), row["id"]))
+                logger.warning("outbox: %s #%d descartado tras %d intentos: %s", row["kind"], row["id"], attempt, ex)
+            return
+        # El contenido ya no hace falta una vez entregado
+        conn.execute("UPDATE deliveries SET status=?, sent_at=?, last_error=NULL, payload=NULL, content=NULL WHERE id=?",
+                     (SENT, time.time(), row["id"]))
+        logger.info("outbox: %s #%d entregado (intento %d)", row["kind"], row["id"], attempt)
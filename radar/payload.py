@@ -0,0 +1,57 @@
+"""Cuerpo JSON de los envíos al Web App, comprimido y generado por bloques.
+
+El camino anterior armaba ``html_bytes`` → ``base64`` (str) → ``json.dumps`` →
+``.encode()``: varias copias completas del reporte en memoria y un 33 % más de
+bytes en la red. Aquí el contenido se comprime con gzip (opcional) y el JSON se
+emite por bloques a partir de un ``memoryview``, sin copias intermedias del
+documento. Como la longitud final se conoce de antemano, ``requests`` envía
+``Content-Length`` (no chunked).
+
+Con ``content_encoding: "gzip"`` el Web App debe descomprimir antes de guardar::
+
+    var bytes = Utilities.base64Decode(data.content_b64);
+    if (data.content_encoding === "gzip") {
+      bytes = Utilities.ungzip(Utilities.newBlob(bytes, "application/x-gzip")).getBytes();
+    }
+"""
+import base64
+import json
+import zlib
+from typing import Iterator
+
+CHUNK_SIZE = 48 * 1024  # múltiplo de 3: el base64 de cada bloque se concatena sin relleno intermedio
+
+
+def gzip_bytes(data: bytes, level: int = 6, chunk_size: int = 256 * 1024) -> bytes:
+    """gzip por bloques (sin búferes del tamaño del original); determinista (mtime=0)."""
+    comp = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    view = memoryview(data)
+    out = [comp.compress(view[i:i + chunk_size]) for i in range(0, len(view), chunk_size)]
+    out.append(comp.flush())
+    return b"".join(out)
+
+
+class JsonPayload:
+    """Cuerpo ``{...meta, field: "<base64 de content>"}`` emitido por bloques.
+
+    Es iterable (bytes) y tiene ``len()``, así que sirve directo como ``data=`` de ``requests``.
+    """
+
+    def __init__(self, meta: dict, field: str, content: bytes, chunk_size: int = CHUNK_SIZE):
+        if chunk_size % 3:
+            raise ValueError("chunk_size debe ser múltiplo de 3")
+        head = json.dumps(meta, ensure_ascii=False, separators=(",", ":"))[:-1]
+        self._prefix = (head + ("," if meta else "") + json.dumps(field) + ':"').encode("utf-8")
+        self._suffix = b'"}'
+        self.content = memoryview(content)
+        self.chunk_size = chunk_size
+
+    def __len__(self) -> int:
+        n = len(self.content)
+        return len(self._prefix) + 4 * ((n + 2) // 3) + len(self._suffix)
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self._prefix
+        for i in range(0, len(self.content), self.chunk_size):
+            yield base64.b64encode(self.content[i:i + self.chunk_size])
+        yield self._suffix
@@ -0,0 +1,66 @@
+"""Comparación con otras empresas (pares) a partir de histogramas por categoría.
+
+La escala es discreta (1–3), así que el promedio de una categoría cae en pocos valores
+posibles: basta un histograma de ``N_BINS`` casillas de ``STEP`` (0.01) por categoría. El
+almacén de envíos lo actualiza en cada escritura (suma el envío nuevo y resta la
+versión anterior si se reemplaza), y los percentiles salen de sumas acumuladas sobre
+esas casillas: el costo depende de las categorías, no de cuántos envíos haya.
+"""
+from dataclasses import dataclass
+from typing import List, Sequence
+
+import numpy as np
+
+LOW, HIGH, STEP = 1.0, 3.0, 0.01
+N_BINS = int(round((HIGH - LOW) / STEP)) + 1
+
+
+def to_bins(values) -> np.ndarray:
+    """Casilla de cada promedio (``-1`` para categorías sin respuestas)."""
+    v = np.asarray(values, dtype=float)
+    bins = np.rint((np.clip(np.nan_to_num(v, nan=LOW), LOW, HIGH) - LOW) / STEP).astype(np.int64)
+    return np.where(np.isnan(v), -1, bins)
+
+
+def bin_values() -> np.ndarray:
+    return LOW + STEP * np.arange(N_BINS)
+
+
+@dataclass(frozen=True)
+class PeerStats:
+    categories: List[str]
+    counts: np.ndarray      # (categorías, N_BINS) envíos por casilla
+
+    @classmethod
+    def empty(cls, categories: Sequence[str]) -> "PeerStats":
+        return cls(list(categories), np.zeros((len(categories), N_BINS), dtype=np.int64))
+
+    @property
+    def n(self) -> np.ndarray:
+        """Envíos con respuesta por categoría."""
+        return self.counts.sum(axis=1)
+
+    def without(self, values) -> "PeerStats":
+        """Los mismos histogramas sin un envío (sus promedios por categoría), p. ej. el propio."""
+        counts = self.counts.copy()
+        bins = to_bins(values)
+        rows = np.flatnonzero(bins >= 0)
+        counts[rows, bins[rows]] = np.maximum(counts[rows, bins[rows]] - 1, 0)
+        return PeerStats(self.categories, counts)
+
+    def quantiles(self, qs: Sequence[float]) -> np.ndarray:
+        """(len(qs), categorías): el valor de la primera casilla cuyo acumulado alcanza ``q·n``."""
+        cum = self.counts.cumsum(axis=1)
+        target = np.asarray(qs, dtype=float)[:, None, None] * self.n[None, :, None]
+        idx = np.minimum((cum[None] < target).sum(axis=-1), N_BINS - 1)
+        out = bin_values()[idx]
+        return np.where(self.n[None] > 0, out, np.nan)
+
+    def percentile_of(self, values) -> np.ndarray:
+        """Percentil (0–100) de cada promedio entre los pares: los de abajo más la mitad de los empates."""
+        bins = to_bins(values)
+        below = np.where(np.arange(N_BINS)[None] < bins[:, None], self.counts, 0).sum(axis=1)
+        ties = np.take_along_axis(self.counts, np.clip(bins, 0, N_BINS - 1)[:, None], axis=1)[:, 0]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            pct = 100.0 * (below + 0.5 * ties) / self.n
+        return np.where((bins < 0) | (self.n == 0), np.nan, pct)
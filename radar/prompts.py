@@ -0,0 +1,197 @@
+"""Textos que se envían a GPT (compartidos por la app y el modo por lotes).
+
+Cada prompt tiene un presupuesto fijo de tokens: el texto fijo de la plantilla se
+descuenta y el resto se reparte entre sus secciones (resumen, peores preguntas,
+diagnóstico previo, contenido del sitio) según su peso. Las secciones que caben en
+su parte se usan completas y el sobrante pasa a las demás; las que no, se compactan
+y se recortan (por líneas completas o al final del texto). Así el costo y la
+latencia por llamada no dependen del tamaño del sitio o del análisis previo.
+"""
+import logging
+import re
+import textwrap
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from radar.scoring import ScoreResult
+from radar.tokens import count_tokens, truncate_tokens
+
+logger = logging.getLogger(__name__)
+
+RECOS_PROMPT_VERSION = "recos-v2"  # súbelo si cambias el texto del prompt de recomendaciones
+RECOS_PROMPT_TOKENS = 1200
+SITE_PROMPT_TOKENS = 3000
+
+
+def build_summary_text(result: ScoreResult, empresa: str = "", nombre: str = "", celular: str = "",
+                       ventas_mes="") -> str:
+    lines = [f"Empresa: {empresa or 'N/A'}", "Resumen por categoría:"]
+    for cat, n, mean in zip(result.categories, result.category_counts, result.category_means):
+        lines.append(f"- {cat}: n={int(n)}, promedio={round(float(mean), 2)}")
+    global_mean = round(float(result.global_mean), 2)
+    lines.append(f"Promedio general: {global_mean}")
+    lines.append(f"Nombre: {nombre or 'N/D'}")
+    lines.append(f"Celular: {celular or 'N/D'}")
+    lines.append(f"Promedio de ventas/mes: {ventas_mes}")
+    return "\n".join(lines)
+
+
+def build_worst_text(df: pd.DataFrame, result: ScoreResult) -> str:
+    """Líneas '- (Categoría) Pregunta -> calificación' de las peores preguntas."""
+    worst = df.iloc[result.worst_idx]
+    return "\n".join(f"- ({r['Categoría']}) {r['Pregunta']} -> {r['Calificación']}" for _, r in worst.iterrows())
+
+
+@dataclass(frozen=True)
+class Section:
+    name: str
+    text: str
+    weight: float = 1.0
+    by_lines: bool = False  # True: se quitan líneas completas del final (listas); False: se corta el texto
+
+
+@dataclass(frozen=True)
+class Prompt:
+    text: str
+    tokens: int                 # conteo local del prompt final
+    budget: int
+    sections: Dict[str, int]    # tokens de cada sección ya ajustada
+    trimmed: Tuple[str, ...]    # secciones que se recortaron
+
+
+_BLANKS_RE = re.compile(r"\n\s*\n+")
+_SPACES_RE = re.compile(r"[ \t]+")
+
+
+def compact(text: str) -> str:
+    """Quita lo que no aporta al modelo: énfasis markdown, espacios repetidos y líneas en blanco extra."""
+    text = (text or "").replace("**", "").replace("__", "")
+    text = "\n".join(_SPACES_RE.sub(" ", line).strip() for line in text.splitlines())
+    return _BLANKS_RE.sub("\n\n", text).strip()
+
+
+def allocate(needs: Dict[str, int], weights: Dict[str, float], total: int) -> Dict[str, int]:
+    """Reparte ``total`` tokens: quien necesita menos que su parte la usa completa y el resto se redistribuye."""
+    alloc, active, remaining = {}, [n for n in needs if needs[n] > 0], max(0, total)
+    for n in needs:
+        alloc[n] = 0
+    while active:
+        wsum = sum(weights[n] for n in active) or 1.0
+        fits = [n for n in active if needs[n] <= remaining * weights[n] / wsum]
+        if not fits:
+            for n in active:
+                alloc[n] = int(remaining * weights[n] / wsum)
+            break
+        for n in fits:
+            alloc[n] = needs[n]
+            remaining -= needs[n]
+            active.remove(n)
+    return alloc
+
+
+def _fit(section: Section, text: str, max_tokens: int, model: str) -> str:
+    if section.by_lines:
+        kept, used = [], 0
+        lines = text.splitlines()
+        for line in lines:
+            cost = count_tokens(line + "\n", model)
+            if used + cost > max_tokens:
+                break
+            kept.append(line)
+            used += cost
+        omitted = len(lines) - len(kept)
+        note = f"(… {omitted} líneas omitidas)"
+        if omitted and kept and used + count_tokens(note, model) > max_tokens:
+            kept.pop()
+            omitted += 1
+            note = f"(… {omitted} líneas omitidas)"
+        return "\n".join(kept + ([note] if omitted else []))
+    return truncate_tokens(text, max(0, max_tokens - 2), model) + " […]"
+
+
+def assemble(template: str, sections: List[Section], budget_tokens: int, model: str = "gpt-4o",
+             label: str = "prompt") -> Prompt:
+    """Llena ``template`` (con ``{nombre}`` por sección) sin pasar de ``budget_tokens``."""
+    overhead = count_tokens(template.format(**{s.name: "" for s in sections}), model)
+    texts = {s.name: compact(s.text) for s in sections}
+    needs = {s.name: count_tokens(texts[s.name], model) for s in sections}
+    alloc = allocate(needs, {s.name: s.weight for s in sections}, budget_tokens - overhead)
+    trimmed = []
+    for s in sections:
+        if needs[s.name] > alloc[s.name]:
+            texts[s.name] = _fit(s, texts[s.name], alloc[s.name], model)
+            trimmed.append(s.name)
+    text = template.format(**texts).strip()
+    prompt = Prompt(
+        text=text, tokens=count_tokens(text, model), budget=budget_tokens,
+        sections={s.name: count_tokens(texts[s.name], model) for s in sections}, trimmed=tuple(trimmed),
+    )
+    logger.info("%s: %d tokens (presupuesto %d)%s", label, prompt.tokens, budget_tokens,
+                f"; recortado: {', '.join(trimmed)}" if trimmed else "")
+    return prompt
+
+
+RECOS_TEMPLATE = textwrap.dedent(
+    """
+    Eres un consultor experto. Con base en el diagnóstico (escala 1–3: 1=No, 2=Parcialmente, 3=Sí), entrega SOLO:
+    1) Hallazgos clave (máx. 6 bullets)
+    2) Recomendaciones accionables priorizadas (3–5 ítems; justifica prioridad)
+    3) Riesgos si no se actúa (máx. 5)
+
+    Contexto cuantitativo:
+    {summary}
+
+    Preguntas con peores puntajes:
+    {worst_text}
+    """
+)
+
+SITE_TEMPLATE = textwrap.dedent(
+    """
+    Eres un consultor digital. Toma el diagnóstico cuantitativo y cualitativo previo y contrástalo con el contenido del sitio.
+    Entrega:
+    - Señales de alineación/desalineación entre el diagnóstico y el sitio.
+    - Recomendaciones de UX, contenido y confianza (trust signals).
+    - 5 acciones web priorizadas (impacto vs. esfuerzo).
+
+    [Empresa]
+    {empresa}
+
+    [Diagnóstico IA previo]
+    {base_analysis}
+
+    [Contenido del sitio]
+    {site_text}
+    """
+)
+
+
+def build_recos_prompt(summary: str, worst_text: str, budget_tokens: int = RECOS_PROMPT_TOKENS,
+                       model: str = "gpt-4o") -> Prompt:
+    return assemble(RECOS_TEMPLATE, [
+        Section("summary", summary, weight=1.0, by_lines=True),
+        Section("worst_text", worst_text, weight=1.0, by_lines=True),
+    ], budget_tokens, model, label="prompt recomendaciones")
+
+
+def build_site_prompt(raw_site_text: str, base_analysis: Optional[str], empresa: str = "",
+                      budget_tokens: int = SITE_PROMPT_TOKENS, model: str = "gpt-4o") -> Prompt:
+    base_analysis = base_analysis or "(Aún no hay análisis base. Usa el botón del paso 3.)"
+    return assemble(SITE_TEMPLATE, [
+        Section("empresa", empresa or "N/A", weight=0.1),
+        Section("base_analysis", base_analysis, weight=1.0, by_lines=True),
+        Section("site_text", raw_site_text, weight=2.0),
+    ], budget_tokens, model, label="prompt sitio")
+
+
+def build_section_prompt(base: Prompt, title: str, instruction: str, others: str,
+                         model: str = "gpt-4o") -> Prompt:
+    """El mismo prompt del análisis, pidiendo solo una sección (para regenerarla sin rehacer las demás)."""
+    text = "\n\n".join([
+        base.text,
+        "Ya tienes este análisis previo (no lo repitas):\n" + (compact(others) or "(vacío)"),
+        f'Responde SOLO la sección "{title}": {instruction}. Propón una versión nueva y distinta de la anterior.',
+    ])
+    return replace(base, text=text, tokens=count_tokens(text, model))
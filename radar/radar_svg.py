@@ -0,0 +1,98 @@
+"""Radar estático en SVG para el reporte HTML (sin JavaScript).
+
+Reemplaza a ``fig.to_html(include_plotlyjs='inline')``, que incrusta todo plotly.js
+(varios MB) en cada reporte. El SVG resultante pesa unos pocos KB y se ve igual en
+cualquier navegador o cliente de correo.
+"""
+import math
+from html import escape
+from typing import List, Sequence
+
+FILL_COLOR = "#636efa"  # mismo color por defecto de plotly
+GRID_COLOR = "#d9d4e0"
+TEXT_COLOR = "#240531"
+
+
+def wrap_label(text: str, max_len: int = 18) -> str:
+    """Inserta saltos <br> para que las etiquetas largas quepan (mismo formato que usa plotly)."""
+    words = str(text).split()
+    lines, curr = [], []
+    for w in words:
+        if sum(len(x) for x in curr) + len(curr) + len(w) <= max_len:
+            curr.append(w)
+        else:
+            lines.append(" ".join(curr))
+            curr = [w]
+    if curr:
+        lines.append(" ".join(curr))
+    return "<br>".join(lines) if lines else str(text)
+
+
+def _fmt(x: float) -> str:
+    return f"{x:.1f}"
+
+
+def radar_svg(labels: Sequence[str], values: Sequence[float], max_value: float = 3.0,
+              size: int = 600, font_size: int = 18, label_margin: int = 130) -> str:
+    """SVG del radar. ``labels`` pueden traer saltos ``<br>`` (como los de ``wrap_label``).
+
+    Igual que el polar de plotly: 0° a la derecha, sentido antihorario, escala radial
+    0–``max_value`` con anillos en cada entero.
+    """
+    n = len(labels)
+    if n == 0:
+        return ""
+    cx = cy = size / 2
+    radius = size / 2 - label_margin
+    angles = [2 * math.pi * i / n for i in range(n)]
+
+    def point(value: float, ang: float):
+        r = radius * max(0.0, min(float(value), max_value)) / max_value
+        return cx + r * math.cos(ang), cy - r * math.sin(ang)
+
+    parts: List[str] = [
+        f"<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 {size} {size}' width='100%' "
+        f"style='max-width:{size}px' role='img' aria-label='Radar de promedios por categoría' "
+        f"font-family='Montserrat, Arial, sans-serif'>"
+    ]
+
+    # Anillos y etiquetas de la escala
+    for tick in range(1, int(max_value) + 1):
+        r = radius * tick / max_value
+        parts.append(f"<circle cx='{_fmt(cx)}' cy='{_fmt(cy)}' r='{_fmt(r)}' fill='none' stroke='{GRID_COLOR}'/>")
+        parts.append(f"<text x='{_fmt(cx + 4)}' y='{_fmt(cy - r - 4)}' font-size='12' fill='#888'>{tick}</text>")
+
+    # Ejes por categoría
+    for ang in angles:
+        x, y = point(max_value, ang)
+        parts.append(f"<line x1='{_fmt(cx)}' y1='{_fmt(cy)}' x2='{_fmt(x)}' y2='{_fmt(y)}' stroke='{GRID_COLOR}'/>")
+
+    # Polígono de valores
+    pts = " ".join(f"{_fmt(x)},{_fmt(y)}" for x, y in (point(v, a) for v, a in zip(values, angles)))
+    parts.append(f"<polygon points='{pts}' fill='{FILL_COLOR}' fill-opacity='0.5' stroke='{FILL_COLOR}' stroke-width='2'/>")
+    for v, a in zip(values, angles):
+        x, y = point(v, a)
+        parts.append(f"<circle cx='{_fmt(x)}' cy='{_fmt(y)}' r='3.5' fill='{FILL_COLOR}'><title>{escape(str(v))}</title></circle>")
+
+    # Etiquetas de categoría (multilínea)
+    line_h = font_size * 1.2
+    for label, ang in zip(labels, angles):
+        lines = str(label).split("<br>")
+        x = cx + (radius + 12) * math.cos(ang)
+        y = cy - (radius + 12) * math.sin(ang)
+        cos_a = math.cos(ang)
+        anchor = "middle" if abs(cos_a) < 0.3 else ("start" if cos_a > 0 else "end")
+        sin_a = math.sin(ang)
+        if sin_a > 0.3:      # arriba: el bloque crece hacia arriba
+            y0 = y - (len(lines) - 1) * line_h
+        elif sin_a < -0.3:   # abajo: el bloque empieza bajo el punto
+            y0 = y + font_size * 0.8
+        else:                # a los lados: centrado vertical
+            y0 = y - (len(lines) - 1) * line_h / 2 + font_size * 0.35
+        tspans = "".join(
+            f"<tspan x='{_fmt(x)}' y='{_fmt(y0 + i * line_h)}'>{escape(line)}</tspan>" for i, line in enumerate(lines)
+        )
+        parts.append(f"<text font-size='{font_size}' fill='{TEXT_COLOR}' text-anchor='{anchor}'>{tspans}</text>")
+
+    parts.append("</svg>")
+    return "\n".join(parts)
@@ -0,0 +1,139 @@
+"""Armado del reporte HTML descargable (sin Streamlit)."""
+import threading
+from html import escape
+from typing import Callable, Optional, Tuple, Union
+
+import pandas as pd
+
+from radar.analysis import Analysis
+
+# --- Markdown→HTML (para el reporte). Fallback si no está instalado 'markdown' ---
+try:
+    import markdown as _md
+    def md_to_html(txt: str) -> str:
+        return _md.markdown(txt or "")
+except Exception:
+    def md_to_html(txt: str) -> str:
+        # Fallback simple: escapar y mantener saltos de línea
+        return "<p>" + (escape(txt or "").replace("\n", "<br>")) + "</p>"
+
+REPORT_CSS = """
+<style>
+body { font-family: Montserrat, Arial, sans-serif; padding: 24px; background: #f8f5fb; }
+h1, h2, h3 { color: #240531; }
+.badge { display:inline-block; background:#ff5722; color:white; padding:6px 12px; border-radius:16px; font-weight:700; }
+.table { width:100%; border-collapse: collapse; }
+.table th { background:#ff5722; color:#fff; padding:8px; text-align:left; }
+.table td { background:#ffffff; border:1px solid #eee; padding:8px; vertical-align: top; }
+.section { background:#fff; border:1px solid #eee; border-radius:12px; padding:16px; margin-bottom:16px; }
+</style>
+"""
+
+
+def answers_table_html(df: pd.DataFrame) -> str:
+    """Tabla de respuestas por pregunta (Categoría, Pregunta, Calificación)."""
+    return (
+        df[["Categoría", "Pregunta", "Calificación"]]
+        .assign(Calificación=lambda d: d["Calificación"].fillna("").astype(str))
+        .to_html(index=False, classes="table", border=0)
+    )
+
+
+def analysis_html(value: Union[Analysis, str, None]) -> str:
+    """Análisis estructurado → HTML directo; texto libre → markdown convertido."""
+    if isinstance(value, Analysis):
+        return value.to_html()
+    return md_to_html(value or "Aún no generado.")
+
+
+def build_report_html(*, nombre: str, celular: str, empresa: str, ventas_mes, habeas_aceptado: bool,
+                      table_html: str, radar_html: str, gpt_analysis: Union[Analysis, str, None],
+                      site_analysis: Union[Analysis, str, None], site_url: str) -> str:
+    # CONVERSIÓN a HTML (NO markdown) para el reporte
+    gpt_html = analysis_html(gpt_analysis)
+    site_html = analysis_html(site_analysis)
+    return f"""
+<!DOCTYPE html>
+<html lang='es'>
+<head>
+<meta charset='utf-8'>
+<title>Reporte Diagnóstico</title>
+{REPORT_CSS}
+</head>
+<body>
+<h1>Reporte de Diagnóstico</h1>
+
+<div class='section'>
+  <h2>Datos generales</h2>
+  <p><strong>Nombre:</strong> {escape(nombre or 'N/D')}</p>
+  <p><strong>Celular:</strong> {escape(celular or 'N/D')}</p>
+  <p><strong>Empresa:</strong> {escape(empresa or 'N/D')}</p>
+  <p><strong>Promedio de ventas/mes:</strong> {ventas_mes}</p>
+  <p><strong>Habeas data aceptado:</strong> {"Sí" if habeas_aceptado else "No"}</p>
+</div>
+
+<div class='section'>
+  <h2>Respuestas por pregunta</h2>
+  {table_html}
+</div>
+
+<div class='section'>
+  <h2>Radar de promedios por categoría</h2>
+  {radar_html}
+</div>
+
+<div class='section'>
+  <h2>Informe</h2>
+  {gpt_html}
+</div>
+
+<div class='section'>
+  <h2>Hallazgos del sitio</h2>
+  <p><strong>URL:</strong> {escape(site_url or 'N/D')}</p>
+  {site_html}
+</div>
+
+<footer>
+  <p style='color:#666'>Reporte generado automáticamente.</p>
+</footer>
+</body>
+</html>
+"""
+
+
+class ReportMemo:
+    """Reporte diferido: cada rerun solo registra la llave de sus entradas y cómo armarlo.
+
+    ``get`` arma el reporte únicamente si la llave cambió desde el último armado; los
+    reruns sin descarga no cuestan nada y el render ocurre a lo sumo una vez por estado
+    distinto. Es seguro entre hilos (el envío por correo o el respaldo pueden pedirlo
+    desde otro hilo).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Optional[Tuple[str, Callable[[], bytes]]] = None
+        self.key: Optional[str] = None
+        self.data: Optional[bytes] = None
+        self.renders = 0
+
+    def bind(self, key: str, build: Callable[[], bytes]) -> None:
+        with self._lock:
+            self._pending = (key, build)
+
+    @property
+    def ready(self) -> bool:
+        """El reporte del estado actual ya está armado (``get`` no vuelve a renderizar)."""
+        with self._lock:
+            return self._pending is not None and self.data is not None and self._pending[0] == self.key
+
+    def get(self) -> bytes:
+        with self._lock:
+            if self._pending is None:
+                raise RuntimeError("ReportMemo.get() antes de bind()")
+            key, build = self._pending
+            if key != self.key or self.data is None:
+                self.data = build()
+                self.key = key
+                self.renders += 1
+            return self.data
@@ -0,0 +1,87 @@
+"""Motor de puntajes vectorizado.
+
+``FormIndex`` precalcula, una vez por formulario, el código de categoría de cada
+pregunta y una matriz de pertenencia ponderada (preguntas × categorías). Con eso,
+promedios por categoría, conteos, promedio general y peores preguntas salen de una
+sola pasada con NumPy, para un vector de calificaciones o para un lote de
+envíos a la vez (matriz envíos × preguntas).
+"""
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class ScoreResult:
+    """Resultado del cálculo. Con un lote, cada arreglo tiene un eje inicial de envíos."""
+    categories: List[str]
+    category_means: np.ndarray   # (n_cat,) o (batch, n_cat); promedio ponderado
+    category_counts: np.ndarray  # (n_cat,) preguntas por categoría
+    global_mean: np.ndarray      # () o (batch,); promedio ponderado de todas las preguntas
+    worst_idx: np.ndarray        # (k,) o (batch, k); índices de las peores preguntas
+
+    def row(self, i: int) -> "ScoreResult":
+        """Resultado individual del envío ``i`` de un lote."""
+        return ScoreResult(self.categories, self.category_means[i], self.category_counts,
+                           self.global_mean[i], self.worst_idx[i])
+
+
+class FormIndex:
+    """Índices precalculados de un formulario (categorías y pesos por pregunta)."""
+
+    def __init__(self, categories, weights=None):
+        cat_series = pd.Series(list(categories), dtype=object)
+        # Mismo orden que groupby("Categoría", dropna=False): alfabético y NaN al final
+        codes, uniques = pd.factorize(cat_series, sort=True, use_na_sentinel=False)
+        self._build([str(u) for u in uniques], codes, weights)
+
+    @classmethod
+    def from_codes(cls, categories, codes, weights=None) -> "FormIndex":
+        """Desde categorías y códigos ya calculados (formulario compilado), sin ``factorize``."""
+        index = cls.__new__(cls)
+        index._build(list(categories), codes, weights)
+        return index
+
+    def _build(self, categories: List[str], codes, weights) -> None:
+        self.categories: List[str] = categories
+        self.codes = np.asarray(codes).astype(np.intp)
+        n = len(self.codes)
+        w = np.ones(n) if weights is None else np.asarray(weights, dtype=float)
+        self.weights = np.clip(np.nan_to_num(w, nan=1.0), 0.0, None)
+        self.n_questions = n
+        membership = np.zeros((n, len(self.categories)))
+        membership[np.arange(n), self.codes] = 1.0
+        self.counts = membership.sum(axis=0).astype(int)
+        self._w_matrix = membership * self.weights[:, None]
+        self._w_per_cat = self._w_matrix.sum(axis=0)
+        self._w_total = self.weights.sum()
+        self.category_rows = [np.flatnonzero(self.codes == k) for k in range(len(self.categories))]
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "FormIndex":
+        """Usa las columnas 'Categoría' y, si existe, 'Peso' (1.0 por defecto)."""
+        weights = df["Peso"].to_numpy(dtype=float) if "Peso" in df.columns else None
+        return cls(df["Categoría"], weights)
+
+    def score(self, scores, k: int = 5) -> ScoreResult:
+        """``scores``: vector (n_preguntas,) o matriz (n_envíos, n_preguntas)."""
+        x = np.asarray(scores, dtype=float)
+        if x.shape[-1] != self.n_questions:
+            raise ValueError(f"Se esperaban {self.n_questions} calificaciones, llegaron {x.shape[-1]}.")
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = (x @ self._w_matrix) / self._w_per_cat
+            global_mean = (x @ self.weights) / self._w_total if self._w_total else np.full(x.shape[:-1], np.nan)
+        # Peores: menor calificación; a igualdad, la de mayor peso y luego el orden del formulario
+        idx = np.broadcast_to(np.arange(self.n_questions), x.shape)
+        neg_w = np.broadcast_to(-self.weights, x.shape)
+        worst = np.lexsort((idx, neg_w, x), axis=-1)[..., :k]
+        return ScoreResult(
+            categories=self.categories,
+            category_means=means,
+            category_counts=self.counts,
+            global_mean=global_mean,
+            worst_idx=worst,
+        )
+
@@ -0,0 +1,205 @@
+"""Rastreo de varias páginas de un sitio para el análisis con GPT.
+
+En lugar de leer solo la URL pegada (cuyo presupuesto de texto suele llenarse con
+menú y footer), se descubren páginas del mismo dominio (sitemap.xml y enlaces del
+home), se descargan varias a la vez con límites por host y un deadline global, se
+eliminan los bloques repetidos entre páginas (boilerplate) y se llena el
+presupuesto con los pasajes más útiles.
+"""
+import functools
+import logging
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List
+from urllib.parse import urlsplit
+
+from radar.html_text import extract_blocks_stream
+from radar.site_fetch import SiteFetcher, normalize_url
+
+logger = logging.getLogger(__name__)
+
+BLOCKS_VERSION = "blocks-v1"
+
+# Rutas que suelen tener información de negocio (más prioridad al elegir qué descargar)
+PRIORITY_PATH_HINTS = (
+    "nosotros", "quienes", "about", "empresa", "servicio", "producto", "solucion", "catalogo",
+    "tienda", "shop", "contacto", "contact", "preguntas", "faq", "envio", "garantia", "blog",
+)
+# Rutas que no aportan al diagnóstico
+SKIP_PATH_HINTS = ("login", "cart", "carrito", "checkout", "account", "cuenta", "wp-admin", "privacy", "cookies")
+SKIP_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".pdf", ".zip", ".mp4", ".xml", ".css", ".js")
+
+# Términos que hacen un pasaje más valioso para contrastar con el diagnóstico
+VALUE_TERMS = (
+    "cliente", "servicio", "producto", "envío", "envio", "garantía", "garantia", "pago", "precio",
+    "contacto", "whatsapp", "misión", "mision", "visión", "vision", "experiencia", "calidad",
+    "certific", "testimonio", "opinion", "años", "atención", "atencion", "devolucion", "devolución",
+)
+
+_LOC_RE = re.compile(r"<loc>\s*([^<\s]+)\s*</loc>", re.IGNORECASE)
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _host(url: str) -> str:
+    return (urlsplit(url).hostname or "").lower().removeprefix("www.")
+
+
+def _same_site(url: str, host: str) -> bool:
+    return urlsplit(url).scheme in ("http", "https") and _host(url) == host
+
+
+def _path_score(url: str) -> float:
+    """Prioridad de una URL candidata: rutas cortas y con pistas de contenido de negocio."""
+    path = urlsplit(url).path.lower()
+    depth = len([p for p in path.split("/") if p])
+    score = 1.0 / (1 + depth)
+    if any(h in path for h in PRIORITY_PATH_HINTS):
+        score += 1.0
+    return score
+
+
+def _is_candidate(url: str, host: str) -> bool:
+    path = urlsplit(url).path.lower()
+    return (_same_site(url, host)
+            and not path.endswith(SKIP_EXTENSIONS)
+            and not any(h in path for h in SKIP_PATH_HINTS))
+
+
+def _block_key(block: str) -> str:
+    """Llave para detectar bloques casi idénticos (mayúsculas, cifras y puntuación no cuentan)."""
+    return " ".join(w for w in _WORD_RE.findall(block.lower()) if not w.isdigit())
+
+
+def _passage_score(block: str, keywords: Iterable[str]) -> float:
+    words = block.split()
+    n = len(words)
+    if n < 4:  # menús, botones, migas de pan
+        return 0.0
+    low = block.lower()
+    score = min(n, 80) / 80.0  # pasajes con cuerpo, sin premiar párrafos enormes
+    score += 0.5 * sum(1 for t in VALUE_TERMS if t in low)
+    score += 0.5 * sum(1 for k in keywords if k and k.lower() in low)
+    if any(ch.isdigit() for ch in block):
+        score += 0.2  # cifras concretas (años, clientes, precios)
+    return score
+
+
+def discover_urls(fetcher: SiteFetcher, start_url: str, home_links: List[str],
+                  max_pages: int, timeout: float) -> List[str]:
+    """URLs a descargar (además del home), de sitemap.xml y enlaces del home, ordenadas por prioridad."""
+    start = normalize_url(start_url)
+    host = _host(start)
+    candidates: Dict[str, float] = {}
+    try:
+        parts = urlsplit(start)
+        sitemap = fetcher.fetch_raw(f"{parts.scheme}://{parts.netloc}/sitemap.xml", timeout=timeout)
+        for loc in _LOC_RE.findall(sitemap)[:2000]:
+            if _is_candidate(loc, host):
+                candidates[normalize_url(loc)] = _path_score(loc)
+    except Exception:
+        pass  # sin sitemap: solo enlaces del home
+    for link in home_links:
+        if _is_candidate(link, host):
+            u = normalize_url(link)
+            candidates[u] = max(candidates.get(u, 0.0), _path_score(u) + 0.25)  # enlazado desde el home
+    candidates.pop(start, None)
+    ranked = sorted(candidates, key=lambda u: (-candidates[u], u))
+    return ranked[: max(0, max_pages - 1)]
+
+
+def select_passages(pages: List[dict], budget_chars: int, keywords: Iterable[str] = ()) -> str:
+    """Quita bloques repetidos entre páginas y llena ``budget_chars`` con los mejores pasajes.
+
+    ``pages``: ``[{"url": ..., "blocks": [...]}, ...]`` en orden de prioridad (home primero).
+    El texto resultante conserva el orden original dentro de cada página.
+    """
+    keywords = [k for k in keywords if k]
+    pages_per_key: Dict[str, int] = {}
+    for page in pages:
+        for key in {_block_key(b) for b in page["blocks"]}:
+            pages_per_key[key] = pages_per_key.get(key, 0) + 1
+    boilerplate_min = 2 if len(pages) >= 2 else 10**9
+
+    scored, seen = [], set()
+    for p_idx, page in enumerate(pages):
+        page_weight = 1.0 if p_idx == 0 else 0.9
+        for b_idx, block in enumerate(page["blocks"]):
+            key = _block_key(block)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            score = _passage_score(block, keywords) * page_weight
+            if pages_per_key.get(key, 0) >= boilerplate_min:
+                score *= 0.1  # aparece en varias páginas: menú, footer, banner de cookies…
+            if score > 0:
+                scored.append((score, p_idx, b_idx, block))
+
+    chosen, used = [], 0
+    for score, p_idx, b_idx, block in sorted(scored, key=lambda t: (-t[0], t[1], t[2])):
+        cost = len(block) + 1
+        if used + cost > budget_chars:
+            continue
+        chosen.append((p_idx, b_idx, block))
+        used += cost
+
+    out, current_page = [], None
+    for p_idx, _, block in sorted(chosen):
+        if p_idx != current_page:
+            current_page = p_idx
+            path = urlsplit(pages[p_idx]["url"]).path or "/"
+            out.append(f"[{path}]")
+        out.append(block)
+    return "\n".join(out)[:budget_chars]
+
+
+def crawl_site_text(fetcher: SiteFetcher, start_url: str, max_pages: int = 6, concurrency: int = 4,
+                    per_host: int = 2, deadline_s: float = 5.0, budget_chars: int = 8000,
+                    keywords: Iterable[str] = ()) -> str:
+    """Texto de varias páginas del sitio, ajustado a ``budget_chars``.
+
+    La descarga del home es obligatoria (si falla, se propaga la excepción); las demás
+    páginas se descargan en paralelo y las que no terminen antes del deadline se ignoran.
+    """
+    t0 = time.monotonic()
+    deadline = t0 + deadline_s
+
+    def remaining() -> float:
+        return max(0.1, deadline - time.monotonic())
+
+    start = normalize_url(start_url)
+    home = fetcher.fetch_extract(start, functools.partial(extract_blocks_stream, base_url=start),
+                                 BLOCKS_VERSION, timeout=remaining())
+    pages = [{"url": start, "blocks": home["blocks"]}]
+    urls = discover_urls(fetcher, start, home["links"], max_pages, timeout=min(3.0, remaining()))
+
+    host_slots: Dict[str, threading.Semaphore] = {}
+
+    def fetch_one(url: str) -> dict:
+        sem = host_slots.setdefault(_host(url), threading.Semaphore(per_host))
+        with sem:
+            if time.monotonic() >= deadline:
+                raise TimeoutError("deadline")
+            res = fetcher.fetch_extract(url, functools.partial(extract_blocks_stream, base_url=url),
+                                        BLOCKS_VERSION, timeout=remaining())
+        return {"url": url, "blocks": res["blocks"]}
+
+    results: Dict[str, dict] = {}
+    if urls:
+        pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+        futures = {pool.submit(fetch_one, u): u for u in urls}
+        pending = set(futures)
+        while pending and time.monotonic() < deadline:
+            done, pending = wait(pending, timeout=remaining(), return_when=FIRST_COMPLETED)
+            for fut in done:
+                try:
+                    results[futures[fut]] = fut.result()
+                except Exception as ex:
+                    logger.info("crawl: se omite %s (%s)", futures[fut], ex)
+        # Lo que no terminó a tiempo se abandona sin bloquear la respuesta
+        pool.shutdown(wait=False, cancel_futures=True)
+    pages.extend(results[u] for u in urls if u in results)  # conserva el orden de prioridad
+
+    logger.info("crawl: %d/%d páginas en %.2f s", len(pages), len(urls) + 1, time.monotonic() - t0)
+    return select_passages(pages, budget_chars, keywords)
@@ -0,0 +1,197 @@
+"""Descarga de sitios web con conexiones reutilizables y GET condicional.
+
+Un único ``SiteFetcher`` por proceso mantiene una ``requests.Session`` con pool de
+conexiones keep-alive (evita repetir DNS/TCP/TLS) y una caché acotada en disco del
+texto extraído, indexada por URL normalizada. Si el servidor entrega ETag o
+Last-Modified, las siguientes descargas envían If-None-Match / If-Modified-Since y
+un 304 devuelve el texto guardado sin volver a descargar ni parsear la página.
+
+El HTML se lee por fragmentos (``stream=True``) y el extractor de ``radar.html_text``
+deja de leer en cuanto llena el presupuesto de caracteres, así que en páginas de
+varios MB no se descarga ni se parsea el resto del documento.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Iterable, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from radar import tracing
+from radar.html_text import extract_text_stream
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0"}
+CHUNK_SIZE = 64 * 1024
+
+
+def normalize_url(url: str) -> str:
+    """Forma canónica para usar como llave: esquema y host en minúscula, sin fragmento
+    ni puerto por defecto, y ruta '/' si viene vacía. Agrega https:// si falta el esquema."""
+    url = (url or "").strip()
+    if "://" not in url:
+        url = "https://" + url
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    return urlunsplit((scheme, host, parts.path or "/", parts.query, ""))
+
+
+def extract_text(html: str, max_chars: int = 8000) -> str:
+    """Texto visible del HTML (sin script/style/noscript), con espacios colapsados.
+
+    Implementación de referencia con BeautifulSoup (documento completo en memoria);
+    ``SiteFetcher`` usa por defecto ``extract_text_stream``, que da el mismo resultado.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style", "noscript"]):
+        tag.decompose()
+    text = " ".join(soup.get_text(separator=" ").split())
+    return text[:max_chars]
+
+
+class SiteFetcher:
+    """Cliente HTTP compartido con caché de validadores (ETag/Last-Modified) y de texto.
+
+    ``cache_dir=None`` desactiva la caché en disco (solo queda el pool de conexiones).
+    ``max_entries`` acota el número de URLs guardadas; se descartan las menos usadas.
+    ``extract(chunks, max_chars)`` recibe los fragmentos de HTML ya decodificados.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_entries: int = 500,
+                 pool_maxsize: int = 20, max_chars: int = 8000,
+                 extract: Callable[[Iterable[str], int], str] = extract_text_stream,
+                 extract_version: str = "stream-v2"):
+        self.cache_dir = cache_dir
+        self.max_entries = max(1, int(max_entries))
+        self.max_chars = int(max_chars)
+        self.extract = extract
+        # si cambia el extractor o el presupuesto, el texto guardado no sirve
+        self.extract_version = f"{extract_version}:{self.max_chars}"
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "not_modified": 0, "downloaded": 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    # --- caché en disco ---
+    def _path(self, norm_url: str, version: str) -> str:
+        digest = hashlib.sha256(f"{version}|{norm_url}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest + ".json")
+
+    def _load(self, norm_url: str, version: str) -> Optional[dict]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(norm_url, version), "r", encoding="utf-8") as fh:
+                entry = json.load(fh)
+        except Exception:
+            return None
+        if entry.get("url") != norm_url or entry.get("extract_version") != version:
+            return None
+        return entry
+
+    def _store(self, norm_url: str, version: str, entry: dict) -> None:
+        if not self.cache_dir:
+            return
+        try:
+            path = self._path(norm_url, version)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(entry, fh, ensure_ascii=False)
+            os.replace(tmp, path)
+            self._prune()
+        except Exception:
+            # Silencioso: la caché es una optimización, no debe romper la descarga
+            pass
+
+    def _touch(self, norm_url: str, version: str) -> None:
+        try:
+            os.utime(self._path(norm_url, version))
+        except OSError:
+            pass
+
+    def _prune(self) -> None:
+        with self._lock:
+            files = [os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir) if f.endswith(".json")]
+            if len(files) <= self.max_entries:
+                return
+            files.sort(key=lambda p: os.path.getmtime(p))
+            for p in files[: len(files) - self.max_entries]:
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+
+    # --- API ---
+    def fetch_text(self, url: str, timeout: float = 15) -> str:
+        """Texto extraído de ``url``. Lanza ``requests.RequestException`` si la descarga falla."""
+        return self.fetch_extract(url, self.extract, self.extract_version, timeout=timeout)
+
+    def fetch_extract(self, url: str, extract: Callable, version: str, timeout: float = 15):
+        """Descarga ``url`` y aplica ``extract(chunks, max_chars)``; el resultado (serializable
+        a JSON) se guarda en la caché bajo ``version`` y se reutiliza si el servidor responde 304."""
+        norm_url = normalize_url(url)
+        entry = self._load(norm_url, version)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        with tracing.span("site.get", url=norm_url, conditional=bool(headers)) as sp, \
+                self.session.get(norm_url, timeout=timeout, headers=headers, stream=True) as r:
+            with self._lock:
+                self.stats["requests"] += 1
+            sp.set(http_status=r.status_code, cache_hit=r.status_code == 304 and bool(entry))
+            if r.status_code == 304 and entry:
+                with self._lock:
+                    self.stats["not_modified"] += 1
+                self._touch(norm_url, version)
+                return entry["result"]
+            r.raise_for_status()
+            if r.encoding is None:
+                r.encoding = "utf-8"
+            # Si el extractor se detiene antes del final, el resto del cuerpo no se descarga
+            result = extract(r.iter_content(chunk_size=CHUNK_SIZE, decode_unicode=True), self.max_chars)
+            sp.set(bytes_in=r.raw.tell() if hasattr(r.raw, "tell") else None)
+        with self._lock:
+            self.stats["downloaded"] += 1
+
+        etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+        if etag or last_modified:
+            self._store(norm_url, version, {
+                "url": norm_url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "extract_version": version,
+                "fetched_at": time.time(),
+                "result": result,
+            })
+        return result
+
+    def fetch_raw(self, url: str, timeout: float = 10, max_bytes: int = 2 * 1024 * 1024) -> str:
+        """Cuerpo de ``url`` como texto, truncado a ``max_bytes`` (para sitemap.xml y similares)."""
+        with tracing.span("site.get_raw", url=normalize_url(url)) as sp, \
+                self.session.get(normalize_url(url), timeout=timeout, stream=True) as r:
+            sp.set(http_status=r.status_code)
+            r.raise_for_status()
+            buf = bytearray()
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                buf.extend(chunk)
+                if len(buf) >= max_bytes:
+                    break
+            sp.set(bytes_in=len(buf))
+            return bytes(buf[:max_bytes]).decode(r.encoding or "utf-8", errors="replace")
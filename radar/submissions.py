@@ -0,0 +1,355 @@
+"""Almacén local de envíos (diagnósticos) en SQLite WAL.
+
+Cada envío guarda el vector de calificaciones (int8), los promedios por categoría
+(float32), el promedio general, los datos personales, los análisis GPT y las
+fechas, con índices por empresa y por fecha. Los formularios se guardan aparte, una
+vez por contenido (``form_id`` = hash de categorías, preguntas y pesos), para poder
+leer los vectores como columnas.
+
+Cada escritura actualiza también, en la misma transacción, el histograma de promedios
+por categoría del formulario (``category_hist``): ``peer_stats`` devuelve los
+percentiles de los pares sin recorrer los envíos.
+
+La página no espera a la base: ``submit`` deja el registro en una cola y un hilo
+escritor los inserta por lotes en una sola transacción. ``insert_many`` es el camino
+directo para cargas grandes (modo por lotes), y ``score_matrix`` devuelve las
+calificaciones de muchos envíos como matrices NumPy para analítica.
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from radar.peers import N_BINS, PeerStats, to_bins
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS forms (
+    id          TEXT PRIMARY KEY,
+    n_questions INTEGER NOT NULL,
+    categories  TEXT NOT NULL,
+    questions   TEXT NOT NULL,
+    created     REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    key            TEXT NOT NULL UNIQUE,
+    form_id        TEXT NOT NULL REFERENCES forms(id),
+    source         TEXT,
+    empresa        TEXT,
+    nombre         TEXT,
+    celular        TEXT,
+    ventas_mes     TEXT,
+    site_url       TEXT,
+    habeas         INTEGER NOT NULL DEFAULT 0,
+    scores         BLOB NOT NULL,
+    category_means BLOB NOT NULL,
+    global_mean    REAL,
+    gpt_analysis   TEXT,
+    site_analysis  TEXT,
+    created        REAL NOT NULL,
+    updated        REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS category_hist (
+    form_id  TEXT NOT NULL,
+    category INTEGER NOT NULL,
+    bin      INTEGER NOT NULL,
+    count    INTEGER NOT NULL,
+    PRIMARY KEY (form_id, category, bin)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS submissions_empresa ON submissions (empresa COLLATE NOCASE, created);
+CREATE INDEX IF NOT EXISTS submissions_created ON submissions (created);
+CREATE INDEX IF NOT EXISTS submissions_form ON submissions (form_id, created);
+"""
+
+_UPSERT = """
+INSERT INTO submissions (key, form_id, source, empresa, nombre, celular, ventas_mes, site_url, habeas, scores,
+                         category_means, global_mean, gpt_analysis, site_analysis, created, updated)
+VALUES (:key, :form_id, :source, :empresa, :nombre, :celular, :ventas_mes, :site_url, :habeas, :scores,
+        :category_means, :global_mean, :gpt_analysis, :site_analysis, :created, :updated)
+ON CONFLICT(key) DO UPDATE SET
+    form_id=excluded.form_id, empresa=excluded.empresa, nombre=excluded.nombre, celular=excluded.celular,
+    ventas_mes=excluded.ventas_mes, site_url=excluded.site_url, habeas=excluded.habeas, scores=excluded.scores,
+    category_means=excluded.category_means, global_mean=excluded.global_mean,
+    gpt_analysis=excluded.gpt_analysis, site_analysis=excluded.site_analysis, updated=excluded.updated
+"""
+
+_HIST_ADD = """
+INSERT INTO category_hist (form_id, category, bin, count) VALUES (?, ?, ?, ?)
+ON CONFLICT(form_id, category, bin) DO UPDATE SET count = count + excluded.count
+"""
+
+_META_COLUMNS = ("id", "key", "form_id", "source", "empresa", "nombre", "celular", "ventas_mes", "site_url",
+                 "habeas", "global_mean", "created", "updated")
+
+
+def form_digest(categories: Sequence[str], questions: Sequence[str], weights: Sequence[float]) -> str:
+    """Identificador de un formulario por contenido (mismo formulario = mismo id en cualquier proceso)."""
+    raw = json.dumps([list(map(str, categories)), list(map(str, questions)), [float(w) for w in weights]],
+                     ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+@dataclass
+class SubmissionRecord:
+    """Un envío listo para guardar. ``key`` lo identifica: guardar otra vez la misma llave actualiza."""
+    key: str
+    form_id: str
+    scores: np.ndarray
+    category_means: np.ndarray
+    global_mean: Optional[float] = None
+    empresa: str = ""
+    nombre: str = ""
+    celular: str = ""
+    ventas_mes: str = ""
+    site_url: str = ""
+    habeas: bool = False
+    gpt_analysis: Optional[str] = None
+    site_analysis: Optional[str] = None
+    source: str = "app"
+    created: float = field(default_factory=time.time)
+
+    def to_row(self) -> dict:
+        gm = None if self.global_mean is None or np.isnan(self.global_mean) else float(self.global_mean)
+        return {
+            "key": self.key, "form_id": self.form_id, "source": self.source, "empresa": self.empresa or "",
+            "nombre": self.nombre or "", "celular": self.celular or "", "ventas_mes": str(self.ventas_mes or ""),
+            "site_url": self.site_url or "", "habeas": int(bool(self.habeas)),
+            "scores": np.asarray(self.scores, dtype=np.int8).tobytes(),
+            "category_means": np.asarray(self.category_means, dtype=np.float32).tobytes(),
+            "global_mean": gm, "gpt_analysis": self.gpt_analysis, "site_analysis": self.site_analysis,
+            "created": self.created, "updated": time.time(),
+        }
+
+
+@dataclass(frozen=True)
+class ScoreMatrix:
+    """Calificaciones de muchos envíos de un mismo formulario, fila por envío."""
+    ids: np.ndarray             # (n,) id de cada envío
+    created: np.ndarray         # (n,) timestamp
+    scores: np.ndarray          # (n, preguntas) int8
+    category_means: np.ndarray  # (n, categorías) float32
+    categories: List[str]
+
+
+class SubmissionStore:
+    """Envíos persistentes con escritor en segundo plano; compartido por el proceso."""
+
+    def __init__(self, db_path: str, batch_size: int = 200, flush_s: float = 0.5):
+        self.db_path = db_path
+        self.batch_size = max(1, int(batch_size))
+        self.flush_s = flush_s
+        self._local = threading.local()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._forms_seen = set()
+        self._forms_lock = threading.Lock()
+        self.written = 0
+        self.failed = 0
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+        self._backfill_histograms()
+        self._thread = threading.Thread(target=self._writer, name="radar-submissions", daemon=True)
+        self._thread.start()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # con WAL: durable ante caídas del proceso
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    # --- formularios ---
+    def register_form(self, form_id: str, question_categories: Sequence[str], questions: Sequence[str],
+                      categories: Sequence[str]) -> None:
+        """Guarda (una vez) cómo leer los vectores: categoría y texto por pregunta y orden de categorías."""
+        with self._forms_lock:
+            if form_id in self._forms_seen:
+                return
+        self._conn().execute(
+            "INSERT OR IGNORE INTO forms (id, n_questions, categories, questions, created) VALUES (?, ?, ?, ?, ?)",
+            (form_id, len(questions), json.dumps(list(map(str, categories)), ensure_ascii=False),
+             json.dumps([[str(c), str(q)] for c, q in zip(question_categories, questions)], ensure_ascii=False),
+             time.time()),
+        )
+        with self._forms_lock:
+            self._forms_seen.add(form_id)
+
+    def form_categories(self, form_id: str) -> List[str]:
+        row = self._conn().execute("SELECT categories FROM forms WHERE id=?", (form_id,)).fetchone()
+        return json.loads(row["categories"]) if row else []
+
+    # --- escritura ---
+    def submit(self, record: SubmissionRecord) -> None:
+        """Encola el envío; el hilo escritor lo guarda (no bloquea la página)."""
+        self._queue.put(record.to_row())
+
+    def insert_many(self, records: Iterable[SubmissionRecord]) -> int:
+        """Inserta/actualiza muchos envíos en una transacción (sin pasar por la cola)."""
+        rows = [r.to_row() for r in records]
+        self._write(rows)
+        return len(rows)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Espera a que la cola quede escrita (útil en pruebas y al cerrar)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._queue.unfinished_tasks == 0:
+                return True
+            time.sleep(0.01)
+        return False
+
+    @staticmethod
+    def _hist_delta(deltas: Counter, form_id: str, category_means: bytes, sign: int) -> None:
+        for category, b in enumerate(to_bins(np.frombuffer(category_means, dtype=np.float32))):
+            if b >= 0:
+                deltas[(form_id, category, int(b))] += sign
+
+    def _write(self, rows: List[dict]) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Histogramas: suma el envío y resta la versión que reemplaza (de la base o de este mismo lote)
+            deltas: Counter = Counter()
+            batch = {}
+            for row in rows:
+                prev = batch.get(row["key"]) or conn.execute(
+                    "SELECT form_id, category_means FROM submissions WHERE key=?", (row["key"],)).fetchone()
+                if prev:
+                    self._hist_delta(deltas, prev[0], prev[1], -1)
+                self._hist_delta(deltas, row["form_id"], row["category_means"], 1)
+                batch[row["key"]] = (row["form_id"], row["category_means"])
+            conn.executemany(_UPSERT, rows)
+            conn.executemany(_HIST_ADD, [(*k, d) for k, d in deltas.items() if d])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.written += len(rows)
+
+    def _writer(self) -> None:
+        while True:
+            rows = [self._queue.get()]
+            # Junta lo que llegue en ``flush_s`` (o hasta ``batch_size``) en una sola transacción
+            deadline = time.monotonic() + self.flush_s
+            while len(rows) < self.batch_size:
+                try:
+                    rows.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._write(rows)
+            except sqlite3.Error as ex:
+                self.failed += len(rows)
+                logger.warning("submissions: no se pudieron guardar %d envíos (%s)", len(rows), ex)
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+    def rebuild_histograms(self) -> None:
+        """Recalcula ``category_hist`` desde los envíos (p. ej. si cambió ``peers.STEP``)."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            deltas: Counter = Counter()
+            for form_id, means in conn.execute("SELECT form_id, category_means FROM submissions"):
+                self._hist_delta(deltas, form_id, means, 1)
+            conn.execute("DELETE FROM category_hist")
+            conn.executemany(_HIST_ADD, [(*k, d) for k, d in deltas.items() if d])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _backfill_histograms(self) -> None:
+        conn = self._conn()
+        if (conn.execute("SELECT 1 FROM submissions LIMIT 1").fetchone()
+                and not conn.execute("SELECT 1 FROM category_hist LIMIT 1").fetchone()):
+            self.rebuild_histograms()
+
+    # --- lectura ---
+    @staticmethod
+    def _where(form_id=None, empresa=None, since=None, until=None) -> tuple:
+        clauses, params = [], []
+        if form_id:
+            clauses.append("form_id = ?")
+            params.append(form_id)
+        if empresa:
+            clauses.append("empresa = ? COLLATE NOCASE")
+            params.append(empresa)
+        if since is not None:
+            clauses.append("created >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(self, empresa: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+              form_id: Optional[str] = None, limit: int = 100, with_analyses: bool = False) -> List[dict]:
+        """Envíos más recientes primero (sin los vectores); filtros por empresa, fecha y formulario."""
+        cols = ", ".join(_META_COLUMNS + (("gpt_analysis", "site_analysis") if with_analyses else ()))
+        where, params = self._where(form_id, empresa, since, until)
+        rows = self._conn().execute(f"SELECT {cols} FROM submissions{where} ORDER BY created DESC LIMIT ?",
+                                    params + [int(limit)]).fetchall()
+        return [dict(r) for r in rows]
+
+    def score_matrix(self, form_id: str, empresa: Optional[str] = None, since: Optional[float] = None,
+                     until: Optional[float] = None) -> ScoreMatrix:
+        """Calificaciones y promedios por categoría de los envíos de ``form_id``, como matrices."""
+        where, params = self._where(form_id, empresa, since, until)
+        rows = self._conn().execute(
+            f"SELECT id, created, scores, category_means FROM submissions{where} ORDER BY created", params,
+        ).fetchall()
+        categories = self.form_categories(form_id)
+        n_q = len(rows[0]["scores"]) if rows else 0
+        return ScoreMatrix(
+            ids=np.fromiter((r["id"] for r in rows), dtype=np.int64, count=len(rows)),
+            created=np.fromiter((r["created"] for r in rows), dtype=np.float64, count=len(rows)),
+            scores=np.frombuffer(b"".join(r["scores"] for r in rows), dtype=np.int8).reshape(len(rows), n_q),
+            category_means=np.frombuffer(b"".join(r["category_means"] for r in rows),
+                                         dtype=np.float32).reshape(len(rows), len(categories)),
+            categories=categories,
+        )
+
+    def peer_stats(self, form_id: str, exclude_key: Optional[str] = None) -> PeerStats:
+        """Histogramas por categoría de los envíos de ``form_id`` (categorías × casillas, sin leer envíos).
+
+        Con ``exclude_key`` descuenta ese envío si ya está guardado (la sesión no se compara
+        consigo misma); histograma y envío se leen en la misma transacción.
+        """
+        stats = PeerStats.empty(self.form_categories(form_id))
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            for category, b, count in conn.execute(
+                    "SELECT category, bin, count FROM category_hist WHERE form_id=?", (form_id,)):
+                if category < len(stats.categories) and 0 <= b < N_BINS:
+                    stats.counts[category, b] = count
+            own = conn.execute("SELECT category_means FROM submissions WHERE key=? AND form_id=?",
+                               (exclude_key, form_id)).fetchone() if exclude_key else None
+        finally:
+            conn.execute("COMMIT")
+        if own is not None:
+            means = np.frombuffer(own["category_means"], dtype=np.float32)
+            if len(means) == len(stats.categories):
+                stats = stats.without(means)
+        return stats
+
+    def stats(self) -> dict:
+        row = self._conn().execute("SELECT COUNT(*) AS n, COUNT(DISTINCT empresa) AS empresas FROM submissions").fetchone()
+        return {"submissions": row["n"], "companies": row["empresas"], "pending": self._queue.unfinished_tasks,
+                "written": self.written, "failed": self.failed}
@@ -0,0 +1,87 @@
+"""Conteo y recorte de tokens en local.
+
+Usa ``tiktoken`` si está instalado y su codificación está disponible (la descarga
+la primera vez); si no, una aproximación tipo BPE: cada palabra cuenta
+``ceil(len/5)`` tokens y cada signo de puntuación uno. La aproximación tiende a
+sobrestimar un poco en español, que es lo que se quiere para respetar un presupuesto.
+"""
+import logging
+import math
+import re
+import threading
+from typing import Optional
+
+try:
+    import tiktoken as _tiktoken
+except Exception:
+    _tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_encodings: dict = {}
+_lock = threading.Lock()
+
+
+def _encoding(model: str):
+    """Codificación de tiktoken para el modelo (o None si no se puede cargar)."""
+    if _tiktoken is None:
+        return None
+    with _lock:
+        if model not in _encodings:
+            try:
+                try:
+                    enc = _tiktoken.encoding_for_model(model)
+                except KeyError:
+                    enc = _tiktoken.get_encoding("o200k_base")
+            except Exception as ex:  # sin red para descargar el vocabulario, etc.
+                logger.info("tiktoken no disponible (%s); se usa la aproximación local", ex)
+                enc = None
+            _encodings[model] = enc
+        return _encodings[model]
+
+
+def _piece_tokens(piece: str) -> int:
+    return math.ceil(len(piece) / 5) if piece[0].isalnum() or piece[0] == "_" else 1
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    if not text:
+        return 0
+    enc = _encoding(model)
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    return sum(_piece_tokens(m.group()) for m in _PIECE_RE.finditer(text))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str = "gpt-4o") -> str:
+    """Prefijo de ``text`` con a lo sumo ``max_tokens`` tokens (cortado en un límite de palabra)."""
+    if max_tokens <= 0 or not text:
+        return ""
+    enc = _encoding(model)
+    if enc is not None:
+        ids = enc.encode(text, disallowed_special=())
+        if len(ids) <= max_tokens:
+            return text
+        cut = enc.decode(ids[:max_tokens])
+    else:
+        used, end = 0, None
+        for m in _PIECE_RE.finditer(text):
+            used += _piece_tokens(m.group())
+            if used > max_tokens:
+                break
+            end = m.end()
+        else:
+            return text
+        cut = text[:end] if end is not None else ""
+    # No dejar una palabra partida al final
+    if cut and not cut[-1].isspace():
+        head, sep, _ = cut.rpartition(" ")
+        cut = head if sep and len(head) > len(cut) // 2 else cut
+    return cut.rstrip()
+
+
+def encoding_name(model: str = "gpt-4o") -> Optional[str]:
+    """Nombre de la codificación en uso, o None con la aproximación local."""
+    enc = _encoding(model)
+    return enc.name if enc is not None else None
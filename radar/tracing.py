@@ -0,0 +1,247 @@
+"""Trazas de tiempos por etapa en un archivo JSONL (solo anexar), con muestreo y rotación.
+
+Cada línea es un span: nombre, duración, sesión, traza/padre y atributos (tamaños,
+aciertos de caché, estado HTTP…). Un rerun de la app es una traza cuyas etapas son
+las secciones numeradas; dentro de ellas cuelgan los spans de carga, plotly, GPT,
+descarga del sitio y reporte. El muestreo se decide por traza (todos sus spans se
+guardan o ninguno) y el archivo rota al pasar ``max_bytes``.
+
+Sin ``configure`` (o con ruta vacía) todo es no-op.
+
+Resumen de percentiles por etapa:
+    python -m radar.tracing .cache/traces.jsonl [--since-h 24] [--name gpt]
+"""
+import argparse
+import contextvars
+import glob
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+_current: contextvars.ContextVar = contextvars.ContextVar("radar_span", default=None)
+
+
+class Span:
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent", "session", "sampled", "attrs",
+                 "start", "_t0", "_prev", "_stage", "ended")
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], session: str, sampled: bool,
+                 attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.parent = parent
+        # Sin muestreo no hace falta generar ids: el span no se escribe
+        self.trace_id = parent.trace_id if parent else (uuid.uuid4().hex[:16] if sampled else "")
+        self.span_id = uuid.uuid4().hex[:8] if sampled else ""
+        self.session = session or (parent.session if parent else "")
+        self.sampled = sampled
+        self.attrs = attrs
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self._prev = None
+        self._stage: Optional[Span] = None
+        self.ended = False
+
+    def set(self, **attrs) -> "Span":
+        if self.sampled:
+            self.attrs.update(attrs)
+        return self
+
+    def activate(self) -> "Span":
+        """La vuelve el span actual del hilo (padre de los que se abran después)."""
+        self._prev = _current.get()
+        _current.set(self)
+        return self
+
+    def end(self, status: str = "ok") -> None:
+        if self.ended:
+            return
+        if self._stage is not None:
+            self._stage.end(status)
+        self.ended = True
+        if _current.get() is self:
+            _current.set(self._prev if self._prev is not self else None)
+        if self.sampled:
+            self.tracer._write(self, status, 1000 * (time.perf_counter() - self._t0))
+
+    def stage(self, name: str, **attrs) -> "Span":
+        """Cierra la etapa anterior de esta traza y abre la siguiente (para código secuencial)."""
+        if self._stage is not None:
+            self._stage.end()
+        self._stage = self.tracer.span(name, parent=self, **attrs).activate()
+        return self._stage
+
+    def __enter__(self) -> "Span":
+        return self.activate()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.end()
+        elif not issubclass(exc_type, Exception):
+            self.end("interrupted")  # st.rerun()/st.stop() u otro control de flujo
+        else:
+            self.set(error=f"{exc_type.__name__}: {exc}")
+            self.end("error")
+
+
+class Tracer:
+    """Escritor de spans compartido por el proceso (seguro entre hilos)."""
+
+    def __init__(self, path: Optional[str] = None, sample_rate: float = 1.0, max_bytes: int = 10 * 1024 * 1024,
+                 backups: int = 3):
+        self.path = path or None
+        self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+        self.max_bytes = int(max_bytes)
+        self.backups = max(0, int(backups))
+        self._lock = threading.Lock()
+        self._fh = None
+        if self.path and os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None and self.sample_rate > 0
+
+    def span(self, name: str, parent: Optional[Span] = None, session: str = "", **attrs) -> Span:
+        """Span hijo del actual (o de ``parent``); sin padre es la raíz de una traza nueva y se sortea."""
+        parent = parent if parent is not None else _current.get()
+        if parent is not None and parent.ended:
+            parent = None
+        sampled = parent.sampled if parent is not None else self.enabled and random.random() < self.sample_rate
+        return Span(self, name, parent, session, sampled, attrs)
+
+    def trace(self, name: str, session: str = "", **attrs) -> Span:
+        """Raíz de una traza para código que no cabe en un ``with`` (el script de Streamlit).
+
+        Si el hilo tenía una traza abierta (un rerun cortado por ``st.rerun``/``st.stop``),
+        se cierra como "interrupted" antes de empezar la nueva."""
+        open_span = _current.get()
+        while open_span is not None and open_span.parent is not None:
+            open_span = open_span.parent
+        if open_span is not None and not open_span.ended:
+            open_span.end("interrupted")
+        _current.set(None)
+        return self.span(name, session=session, **attrs).activate()
+
+    # --- escritura ---
+    def _write(self, span: Span, status: str, ms: float) -> None:
+        record = {"ts": round(span.start, 3), "trace": span.trace_id, "span": span.span_id,
+                  "parent": span.parent.span_id if span.parent else None, "name": span.name,
+                  "ms": round(ms, 3), "session": span.session, "status": status}
+        record.update(span.attrs)
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        try:
+            with self._lock:
+                if self._fh is None:
+                    self._fh = open(self.path, "a", encoding="utf-8")
+                self._fh.write(line)
+                self._fh.flush()
+                if self._fh.tell() >= self.max_bytes:
+                    self._rotate()
+        except OSError:
+            pass  # las trazas nunca rompen la app
+
+    def _rotate(self) -> None:
+        self._fh.close()
+        self._fh = None
+        if self.backups == 0:
+            os.remove(self.path)
+            return
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+tracer = Tracer()
+
+
+def configure(path: Optional[str], sample_rate: float = 1.0, max_bytes: int = 10 * 1024 * 1024,
+              backups: int = 3) -> Tracer:
+    """Activa las trazas del proceso (``path`` vacío las desactiva)."""
+    global tracer
+    tracer = Tracer(path, sample_rate, max_bytes, backups)
+    return tracer
+
+
+def span(name: str, **attrs) -> Span:
+    return tracer.span(name, **attrs)
+
+
+def annotate(**attrs) -> None:
+    """Agrega atributos al span actual (p. ej. ``cache_hit=True``), si lo hay."""
+    current = _current.get()
+    if current is not None and not current.ended:
+        current.set(**attrs)
+
+
+# =============================
+# RESUMEN
+# =============================
+def read_spans(path: str, since: Optional[float] = None) -> List[dict]:
+    """Spans de ``path`` y de sus archivos rotados (``path.1``, ``path.2``…)."""
+    spans = []
+    rotated = [p for p in glob.glob(glob.escape(path) + ".*") if p[len(path) + 1:].isdigit()]
+    for p in sorted(rotated, key=lambda p: -int(p[len(path) + 1:])) + [path]:
+        if not os.path.exists(p):
+            continue
+        with open(p, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # línea cortada por una rotación o un cierre abrupto
+                if since is None or rec.get("ts", 0) >= since:
+                    spans.append(rec)
+    return spans
+
+
+def summarize(spans: List[dict]) -> Dict[str, dict]:
+    by_name: Dict[str, list] = defaultdict(list)
+    hits: Dict[str, list] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    for rec in spans:
+        by_name[rec["name"]].append(rec["ms"])
+        if "cache_hit" in rec:
+            hits[rec["name"]].append(bool(rec["cache_hit"]))
+        if rec.get("status") not in (None, "ok"):
+            errors[rec["name"]] += 1
+    out = {}
+    for name, ms in by_name.items():
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        out[name] = {"n": len(ms), "p50": p50, "p95": p95, "p99": p99, "max": max(ms), "not_ok": errors[name],
+                     "cache_hit_rate": sum(hits[name]) / len(hits[name]) if hits[name] else None}
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Percentiles p50/p95/p99 por etapa a partir de las trazas JSONL.")
+    ap.add_argument("path", nargs="?", default=".cache/traces.jsonl")
+    ap.add_argument("--since-h", type=float, help="solo las últimas N horas")
+    ap.add_argument("--name", help="solo spans cuyo nombre contenga este texto")
+    ap.add_argument("--json", action="store_true", help="salida en JSON")
+    args = ap.parse_args()
+
+    since = time.time() - args.since_h * 3600 if args.since_h else None
+    spans = [s for s in read_spans(args.path, since) if not args.name or args.name in s["name"]]
+    stats = summarize(spans)
+    if args.json:
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+        return
+    print(f"{'etapa':<28} {'n':>6} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} {'máx (ms)':>10} "
+          f"{'no ok':>6} {'caché':>6}")
+    for name, s in sorted(stats.items(), key=lambda kv: -kv[1]["p95"]):
+        hit = f"{100 * s['cache_hit_rate']:.0f}%" if s["cache_hit_rate"] is not None else "-"
+        print(f"{name:<28} {s['n']:>6} {s['p50']:>10.1f} {s['p95']:>10.1f} {s['p99']:>10.1f} {s['max']:>10.1f} "
+              f"{s['not_ok']:>6} {hit:>6}")
+
+
+if __name__ == "__main__":
+    main()